@@ -9,15 +9,40 @@ Key Features:
 - Creates a SQLite database with simulated maintenance data
 - Generates sensor events and maintenance tasks
 - Provides cached data generation for demo purposes
+- Scales to realistic volumes (millions of sensor rows) for load tests: data is generated with NumPy in chunks,
+  bulk inserted in one transaction, and indexed after the load.  Generation is deterministic for a given seed.
+
+Usage (load test database):
+    uv run python -m genai_blueprint.demos.maintenance_agent.dummy_data --sensors 50 --frequency 1min --days 90
+With '--parquet', the sensor values are also exported to Parquet files, to be queried with DuckDB by the sensor tool.
+Give '--end-date' to generate the same data whatever the day.
+
+The demo uses the load test data only when told so, by environment variables:
+    MAINTENANCE_DATABASE_URI=sqlite:////tmp/plant_data.db        (instead of generating the default demo database)
+    MAINTENANCE_SENSOR_STORE=parquet:///tmp/plant_data_sensors   (sensor values, default: the database)
 """
 
+import os
+from collections.abc import Iterator
 from datetime import datetime, timedelta
 from pathlib import Path
+from time import perf_counter
 
 import numpy as np
 import pandas as pd
 import streamlit as st
+import typer
 from loguru import logger
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import text
+
+from genai_blueprint.demos.maintenance_agent.sensors import (
+    DATE_FORMAT,
+    PARQUET_SCHEME,
+    create_sensor_indexes,
+    export_sensor_parquet,
+    get_engine,
+)
 
 # Constant for the database table name
 TABLE_NAME = "maintenance_planning"
@@ -25,6 +50,198 @@ TABLE_NAME = "maintenance_planning"
 # Path for caching model-related files
 MODEL_CACHE = Path.cwd() / ".model_cache"
 
+DATABASE_URI = "sqlite:////tmp/demo.db"
+LOAD_TEST_DATABASE = Path("/tmp/plant_data.db")
+SENSOR_PARQUET = Path("/tmp/plant_data_sensors")  # columnar copy of the sensor values
+
+# Environment variables selecting the data used by the demo (see module docstring)
+DATABASE_URI_ENV = "MAINTENANCE_DATABASE_URI"
+SENSOR_STORE_ENV = "MAINTENANCE_SENSOR_STORE"
+
+# Define the process being maintained
+PROCESS = "Power Plant Steam Turbine"
+
+TASK_NAMES = [
+    "Preparations for Maintenance",
+    "Turbine Shutdown",
+    "Rotor Inspection",
+    "Blade Inspection",
+    "Diaphragm Inspection",
+    "Bearing Inspection",
+    "Final Checks and Cleanup",
+]
+PROCEDURE_NAMES = [PROCESS, "Generator Maintenance", "Cooling System Maintenance"]
+WARNING_TYPES = ["High vibration", "Temperature above threshold", "Pressure drop", "Signal lost", "Drift detected"]
+UNITS = ["Volt", "A", "SI", "°C", "bar", "mm/s", "rpm"]
+
+# Predefined IoT warning events with timestamps and sensor information
+DEMO_WARNINGS = [
+    {"timestamp": "2023-01-01 10:00:00", "sensor": "sensor1", "warning": "Event 1"},
+    {"timestamp": "2023-01-02 14:30:00", "sensor": "sensor1", "warning": "Event 2"},
+    {"timestamp": "2023-01-03 09:15:00", "sensor": "sensor2", "warning": "Event 3"},
+    {"timestamp": "2023-09-01 10:00:00", "sensor": "sensor2", "warning": "Event 4"},
+    {"timestamp": "2023-09-02 14:30:00", "sensor": "sensor1", "warning": "Event 5"},
+    {"timestamp": "2023-09-03 09:15:00", "sensor": "sensor2", "warning": "Event 6"},
+    {"timestamp": "2023-10-01 10:00:00", "sensor": "sensor2", "warning": "Event 7"},
+    {"timestamp": "2023-10-02 14:30:00", "sensor": "sensor1", "warning": "Event 8"},
+    {"timestamp": "2023-10-03 09:15:00", "sensor": "sensor2", "warning": "Event 9"},
+]
+
+# Predefined maintenance tasks for employees: (employee, start day, end day, task), days relative to today
+DEMO_TASKS = [
+    ("John Smith", 0, 1, "Preparations for Maintenance"),
+    ("John Smith", 0, 3, "Turbine Shutdown"),
+    ("John Smith", 3, 5, "Rotor Inspection"),
+    ("John Smith", 5, 12, "Blade Inspection"),
+    ("John Smith", 6, 15, "Diaphragm Inspection"),
+    ("John Smith", 8, 13, "Bearing Inspection"),
+    ("John Smith", 10, 12, "Final Checks and Cleanup"),
+    ("John Smith", 12, 14, "Preparations for Maintenance"),
+    ("Alice Johnson", 0, 2, "Turbine Shutdown"),
+    ("Alice Johnson", 2, 4, "Rotor Inspection"),
+    ("Alice Johnson", 4, 7, "Blade Inspection"),
+    ("Alice Johnson", 6, 12, "Diaphragm Inspection"),
+    ("Alice Johnson", 8, 9, "Bearing Inspection"),
+    ("Alice Johnson", 10, 14, "Final Checks and Cleanup"),
+]
+
+# Demo sensors: (name, unit, period in days)
+DEMO_SENSORS = [
+    ("signal_1", "Volt", 30),
+    ("signal_2", "A", 60),
+    ("signal_3", "SI", 90),
+]
+
+
+class PlantDataConfig(BaseModel):
+    """Size and shape of the generated plant data.  The defaults give the demo database."""
+
+    sensors: int = Field(len(DEMO_SENSORS), ge=1)  # the first ones are the demo sensors
+    frequency: str = "1D"  # sampling period, as a fixed pandas frequency ('1D', '1h', '1min', '10s', ...)
+    days: int = Field(90, ge=1)  # history length
+    end_date: str | None = None  # last sampling time (default: now)
+    employees: int = Field(2, ge=1)  # the first ones are the demo employees
+    tasks: int = Field(0, ge=0)  # generated tasks, in addition to the demo ones
+    warnings_per_sensor_day: float = Field(0.0, ge=0)  # mean number of generated warnings, besides the demo ones
+    noise: float = Field(0.0, ge=0)  # standard deviation of the gaussian noise added to the sensor values
+    seed: int = 0
+    chunk_rows: int = Field(500_000, ge=1)  # sensor rows generated and inserted at once
+
+    @field_validator("frequency")
+    @classmethod
+    def _fixed_frequency(cls, value: str) -> str:
+        pd.Timestamp(0).floor(value)  # raise ValueError if the frequency is not fixed (ex: '1ME', 'W')
+        return value
+
+
+def _sensor_specs(config: PlantDataConfig, rng: np.random.Generator) -> pd.DataFrame:
+    """Name, unit and sinusoid parameters of each sensor."""
+    demo = DEMO_SENSORS[: config.sensors]
+    extra = max(0, config.sensors - len(demo))
+    return pd.DataFrame(
+        {
+            "sensor": [name for name, _, _ in demo] + [f"signal_{i}" for i in range(len(demo) + 1, config.sensors + 1)],
+            "unit": [unit for _, unit, _ in demo] + rng.choice(UNITS, extra).tolist(),
+            "period": [float(period) for _, _, period in demo] + rng.uniform(1, 120, extra).tolist(),
+            "amplitude": [1.0] * len(demo) + rng.uniform(0.5, 100, extra).tolist(),
+            "phase": [0.0] * len(demo) + rng.uniform(0, 2 * np.pi, extra).tolist(),
+        }
+    )
+
+
+def _sensor_data(config: PlantDataConfig, specs: pd.DataFrame, rng: np.random.Generator) -> Iterator[pd.DataFrame]:
+    """Sensor values, by chunks of about 'chunk_rows' rows, in date order."""
+    end = pd.Timestamp(config.end_date) if config.end_date else pd.Timestamp.now().floor(config.frequency)
+    dates = pd.date_range(start=end - pd.Timedelta(days=config.days), end=end, freq=config.frequency)
+    step = max(1, config.chunk_rows // max(1, len(specs)))
+    periods, amplitudes, phases = (specs[c].to_numpy() for c in ("period", "amplitude", "phase"))
+    for start in range(0, len(dates), step):
+        chunk = dates[start : start + step]
+        day = chunk.dayofyear.to_numpy() + (chunk - chunk.normalize()).total_seconds().to_numpy() / 86400
+        values = amplitudes * np.sin(2 * np.pi * day[:, None] / periods + phases)
+        if config.noise:
+            values += rng.normal(0, config.noise, values.shape)
+        yield pd.DataFrame(
+            {
+                "date": np.repeat(chunk.strftime(DATE_FORMAT).to_numpy(), len(specs)),
+                "sensor": np.tile(specs["sensor"].to_numpy(), len(chunk)),
+                "value": values.ravel(),
+                "unit": np.tile(specs["unit"].to_numpy(), len(chunk)),
+            }
+        )
+
+
+def _tasks(config: PlantDataConfig, rng: np.random.Generator) -> pd.DataFrame:
+    today = pd.Timestamp(config.end_date).to_pydatetime() if config.end_date else datetime.today()
+    demo = pd.DataFrame(
+        {
+            "employee": employee,
+            "start_date": today + timedelta(days=start),
+            "end_date": today + timedelta(days=end),
+            "procedure": PROCESS,
+            "task": task,
+        }
+        for employee, start, end, task in DEMO_TASKS
+    )
+    employees = list(dict.fromkeys(demo["employee"]))[: max(1, config.employees)]
+    employees += [f"Employee {i:04d}" for i in range(len(employees) + 1, config.employees + 1)]
+    starts = today + pd.to_timedelta(rng.integers(-config.days, 30, config.tasks), unit="D")
+    generated = pd.DataFrame(
+        {
+            "employee": rng.choice(employees, config.tasks),
+            "start_date": starts,
+            "end_date": starts + pd.to_timedelta(rng.integers(1, 10, config.tasks), unit="D"),
+            "procedure": rng.choice(PROCEDURE_NAMES, config.tasks),
+            "task": rng.choice(TASK_NAMES, config.tasks),
+        }
+    )
+    return pd.concat([demo[demo["employee"].isin(employees)], generated], ignore_index=True)
+
+
+def _warnings(config: PlantDataConfig, sensors: list[str], rng: np.random.Generator) -> pd.DataFrame:
+    end = pd.Timestamp(config.end_date) if config.end_date else pd.Timestamp.now().floor("s")
+    count = rng.poisson(config.warnings_per_sensor_day * len(sensors) * config.days)
+    timestamps = end - pd.to_timedelta(np.sort(rng.uniform(0, config.days * 86400, count))[::-1], unit="s")
+    generated = pd.DataFrame(
+        {
+            "timestamp": timestamps.strftime(DATE_FORMAT),
+            "sensor": rng.choice(sensors, count),
+            "warning": rng.choice(WARNING_TYPES, count),
+        }
+    )
+    return pd.concat([pd.DataFrame(DEMO_WARNINGS), generated], ignore_index=True)
+
+
+def generate_plant_data(config: PlantDataConfig, database_uri: str = DATABASE_URI) -> dict[str, int]:
+    """Generate the plant data in the database, replacing its tables, and return the row count of each table.
+
+    Rows are inserted in one transaction, and the indexes are created after the load.
+    """
+    rng = np.random.default_rng(config.seed)
+    specs = _sensor_specs(config, rng)
+    counts = {}
+    t0 = perf_counter()
+    engine = get_engine(database_uri)
+    with engine.begin() as conn:
+        for table in ("sensor_data", "iot_warnings", "tasks"):
+            conn.execute(text(f'DROP TABLE IF EXISTS "{table}"'))
+        counts["sensor_data"] = 0
+        for chunk in _sensor_data(config, specs, rng):
+            chunk.to_sql("sensor_data", conn, if_exists="append", index=False)
+            counts["sensor_data"] += len(chunk)
+        tables = {"iot_warnings": _warnings(config, specs["sensor"].tolist(), rng), "tasks": _tasks(config, rng)}
+        for table, df in tables.items():
+            df.to_sql(table, conn, if_exists="replace", index=False, chunksize=config.chunk_rows)
+            counts[table] = len(df)
+    t1 = perf_counter()
+    create_sensor_indexes(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_iot_warnings ON iot_warnings (sensor, timestamp)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_employee ON tasks (employee, start_date)"))
+    t2 = perf_counter()
+    logger.info("database {}: {} - loaded in {:.1f}s, indexed in {:.1f}s", database_uri, counts, t1 - t0, t2 - t1)
+    return counts
+
 
 @st.cache_data(ttl=3600 * 24)
 def dummy_database() -> str:
@@ -36,161 +253,58 @@ def dummy_database() -> str:
     - Sensor time-series data
 
     Returns:
-        str: SQLAlchemy database URI for the created database
+        str: SQLAlchemy database URI for the created database, or the one set in the MAINTENANCE_DATABASE_URI
+        environment variable (ex: a load test database, see 'generate' command)
     """
-    # Use a persistent file-based SQLite database
-    DATABASE_URI = "sqlite:////tmp/demo.db"
-
-    # Define the process being maintained
-    proc = "Power Plant Steam Turbine"
-
-    # Predefined IoT warning events with timestamps and sensor information
-    iot_warnings = [
-        {"timestamp": "2023-01-01 10:00:00", "sensor": "sensor1", "warning": "Event 1"},
-        {"timestamp": "2023-01-02 14:30:00", "sensor": "sensor1", "warning": "Event 2"},
-        {"timestamp": "2023-01-03 09:15:00", "sensor": "sensor2", "warning": "Event 3"},
-        {"timestamp": "2023-09-01 10:00:00", "sensor": "sensor2", "warning": "Event 4"},
-        {"timestamp": "2023-09-02 14:30:00", "sensor": "sensor1", "warning": "Event 5"},
-        {"timestamp": "2023-09-03 09:15:00", "sensor": "sensor2", "warning": "Event 6"},
-        {"timestamp": "2023-10-01 10:00:00", "sensor": "sensor2", "warning": "Event 7"},
-        {"timestamp": "2023-10-02 14:30:00", "sensor": "sensor1", "warning": "Event 8"},
-        {"timestamp": "2023-10-03 09:15:00", "sensor": "sensor2", "warning": "Event 9"},
-    ]
-
-    # Helper functions to generate relative dates
-    def today_minus(n: int) -> datetime:
-        return datetime.today() - timedelta(days=n)
-
-    def today_plus(n: int) -> datetime:
-        return datetime.today() + timedelta(days=n)
-
-    # Predefined maintenance tasks for employees
-    tasks = [
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(0),
-            "end_date": today_plus(1),
-            "procedure": proc,
-            "task": "Preparations for Maintenance",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(0),
-            "end_date": today_plus(3),
-            "procedure": proc,
-            "task": "Turbine Shutdown",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(3),
-            "end_date": today_plus(5),
-            "procedure": proc,
-            "task": "Rotor Inspection",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(5),
-            "end_date": today_plus(12),
-            "procedure": proc,
-            "task": "Blade Inspection",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(6),
-            "end_date": today_plus(15),
-            "procedure": proc,
-            "task": "Diaphragm Inspection",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(8),
-            "end_date": today_plus(13),
-            "procedure": proc,
-            "task": "Bearing Inspection",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(10),
-            "end_date": today_plus(12),
-            "procedure": proc,
-            "task": "Final Checks and Cleanup",
-        },
-        {
-            "employee": "John Smith",
-            "start_date": today_plus(12),
-            "end_date": today_plus(14),
-            "procedure": proc,
-            "task": "Preparations for Maintenance",
-        },
-        {
-            "employee": "Alice Johnson",
-            "start_date": today_plus(0),
-            "end_date": today_plus(2),
-            "procedure": proc,
-            "task": "Turbine Shutdown",
-        },
-        {
-            "employee": "Alice Johnson",
-            "start_date": today_plus(2),
-            "end_date": today_plus(4),
-            "procedure": proc,
-            "task": "Rotor Inspection",
-        },
-        {
-            "employee": "Alice Johnson",
-            "start_date": today_plus(4),
-            "end_date": today_plus(7),
-            "procedure": proc,
-            "task": "Blade Inspection",
-        },
-        {
-            "employee": "Alice Johnson",
-            "start_date": today_plus(6),
-            "end_date": today_plus(12),
-            "procedure": proc,
-            "task": "Diaphragm Inspection",
-        },
-        {
-            "employee": "Alice Johnson",
-            "start_date": today_plus(8),
-            "end_date": today_plus(9),
-            "procedure": proc,
-            "task": "Bearing Inspection",
-        },
-        {
-            "employee": "Alice Johnson",
-            "start_date": today_plus(10),
-            "end_date": today_plus(14),
-            "procedure": proc,
-            "task": "Final Checks and Cleanup",
-        },
-    ]
-
-    # Define sensor configurations for generating time-series data
-    sensors = [
-        ("signal_1", "Volt", 30),
-        ("signal_2", "A", 60),
-        ("signal_3", "SI", 90),
-    ]
-
-    # Generate synthetic sensor time-series data using sinusoidal patterns
-    dates = pd.date_range(start=today_minus(90), end=today_minus(0))
-    sensor_data = pd.DataFrame(columns=["date", "sensor", "value", "unit"])
-    for name, unit, period in sensors:
-        sensor_values = np.sin(2 * np.pi * (dates.dayofyear / period))
-        sensor_df = pd.DataFrame({"date": dates, "sensor": name, "value": sensor_values, "unit": unit})
-        sensor_data = pd.concat([sensor_data, sensor_df], ignore_index=True)
-
-    # Persist data to SQLite database
-    for name, tables in [("iot_warnings", iot_warnings), ("tasks", tasks)]:
-        df = pd.DataFrame(tables)
-        df.to_sql(name, DATABASE_URI, if_exists="replace", index=False)
-
-    sensor_data.to_sql("sensor_data", DATABASE_URI, if_exists="replace", index=False)
-
-    # Verify data insertion by reading tasks
-    _ = pd.read_sql("""SELECT * FROM "tasks" ;""", DATABASE_URI)
-
-    # Log database creation
-    logger.info("create database {}", DATABASE_URI)
+    if database_uri := os.environ.get(DATABASE_URI_ENV):
+        logger.info("use database {} (set in {})", database_uri, DATABASE_URI_ENV)
+        return database_uri
+    generate_plant_data(PlantDataConfig())
     return DATABASE_URI
+
+
+def sensor_store() -> str:
+    """Source of the sensor values: the one set in the MAINTENANCE_SENSOR_STORE environment variable, else the
+    database."""
+    return os.environ.get(SENSOR_STORE_ENV) or dummy_database()
+
+
+app = typer.Typer()
+
+
+@app.command()
+def generate(
+    sensors: int = typer.Option(len(DEMO_SENSORS), help="number of sensors"),
+    frequency: str = typer.Option("1D", help="sampling period ('1D', '1h', '1min', '10s', ...)"),
+    days: int = typer.Option(90, help="history length, in days"),
+    employees: int = typer.Option(2, help="number of employees"),
+    tasks: int = typer.Option(0, help="generated tasks, in addition to the demo ones"),
+    warnings: float = typer.Option(0.0, help="mean number of generated warnings per sensor and day"),
+    noise: float = typer.Option(0.0, help="standard deviation of the noise added to sensor values"),
+    seed: int = typer.Option(0, help="random seed"),
+    end_date: str | None = typer.Option(None, help="last sampling time (default: now), for reproducible data"),
+    database_uri: str = typer.Option(f"sqlite:///{LOAD_TEST_DATABASE}", help="target database"),
+    parquet: bool = typer.Option(False, help=f"also export the sensor values to Parquet files in {SENSOR_PARQUET}"),
+) -> None:
+    """Generate synthetic plant data, for load tests of the SQL tools and the maintenance agent."""
+    config = PlantDataConfig(
+        sensors=sensors,
+        frequency=frequency,
+        days=days,
+        employees=employees,
+        tasks=tasks,
+        warnings_per_sensor_day=warnings,
+        noise=noise,
+        seed=seed,
+        end_date=end_date,
+    )
+    counts = generate_plant_data(config, database_uri)
+    logger.info("to use it in the demo: export {}={}", DATABASE_URI_ENV, database_uri)
+    if parquet:
+        export_sensor_parquet(database_uri, SENSOR_PARQUET)
+        logger.info("to query the Parquet copy: export {}={}{}", SENSOR_STORE_ENV, PARQUET_SCHEME, SENSOR_PARQUET)
+    print(counts)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,158 @@
+"""Question answering on the maintenance procedures, with chain reuse and a semantic answer cache.
+
+The chain (prompt, LLM, output parser) is built once per procedure index version and LLM id, instead of at each
+call.  The question is embedded once: its vector is used both to look up the answer cache and to retrieve the
+procedure chunks.  A cached answer is returned when a previous question of the same index version is close enough
+(cosine similarity above a threshold) and young enough; the cache is emptied when the procedure index or the LLM
+changes.  The cache is set in 'maintenance_agent.answer_cache' (see 'config/demos/maintenance_agent.yaml'), where
+it can be disabled.
+"""
+
+import threading
+import time
+from functools import cache
+
+import numpy as np
+from genai_tk.core.llm_factory import get_llm
+from genai_tk.core.prompts import def_prompt
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+from loguru import logger
+from pydantic import BaseModel
+
+from genai_blueprint.demos.maintenance_agent.procedures import ProcedureIndex, get_procedure_index
+
+# Answer cache defaults, when not set in configuration
+ANSWER_CACHE_THRESHOLD = 0.95
+ANSWER_CACHE_TTL = 3600  # seconds
+ANSWER_CACHE_SIZE = 512
+RETRIEVED_CHUNKS = 4
+
+SYSTEM_PROMPT = (
+    "Use the given context to answer the question. If you don't know the answer, say you don't know. "
+    "Use three sentence maximum and keep the answer concise. \n"
+    "Context: {context}"
+)
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+
+class SemanticAnswerCache:
+    """Answers of previous questions, found by similarity of the question embeddings."""
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL,
+        size: int = ANSWER_CACHE_SIZE,
+    ) -> None:
+        self.threshold, self.ttl, self.size = threshold, ttl, size
+        self.version = ""
+        self.vectors = np.empty((0, 0), dtype=np.float32)  # normalized question embeddings
+        self.answers: list[str] = []
+        self.created = np.empty(0)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def _clear(self) -> None:
+        self.vectors, self.answers, self.created = np.empty((0, 0), dtype=np.float32), [], np.empty(0)
+
+    def check_version(self, version: str) -> None:
+        """Empty the cache if the answers were computed on another version (of the procedure index and LLM)."""
+        with self._lock:
+            if version != self.version:
+                if self.answers:
+                    logger.info("procedure index or LLM changed - clear {} cached answers", len(self.answers))
+                    self.stats.invalidations += 1
+                self._clear()
+                self.version = version
+
+    def lookup(self, vector: np.ndarray) -> tuple[str, float] | None:
+        """Answer of the most similar cached question, and its similarity, if it's above the threshold."""
+        with self._lock:
+            # answers are added in time order: the expired ones are first
+            expired = int(np.searchsorted(self.created, time.monotonic() - self.ttl, side="right"))
+            if expired:
+                self.vectors, self.created = self.vectors[expired:], self.created[expired:]
+                self.answers = self.answers[expired:]
+            if self.answers:
+                similarities = self.vectors @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.stats.hits += 1
+                    return self.answers[best], float(similarities[best])
+            self.stats.misses += 1
+            return None
+
+    def add(self, vector: np.ndarray, answer: str) -> None:
+        with self._lock:
+            vectors = self.vectors if len(self.answers) else np.empty((0, len(vector)), dtype=np.float32)
+            self.vectors = np.vstack([vectors, vector[None, :]])[-self.size :]
+            self.answers = (self.answers + [answer])[-self.size :]
+            self.created = np.append(self.created, time.monotonic())[-self.size :]
+
+
+def _format_context(docs: list[Document]) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+class ProcedureQA:
+    """Answer questions on the maintenance procedures, with an answer cache (None to disable it)."""
+
+    def __init__(self, index: ProcedureIndex, cache: SemanticAnswerCache | None = None) -> None:
+        self.index = index
+        self.cache = cache
+        self._chains: dict[tuple[str, str], Runnable] = {}
+        self._lock = threading.Lock()
+
+    def chain(self, version: str, llm_id: str) -> Runnable:
+        """Chain of the given index version and LLM, built at first use.  Only the last one is kept."""
+        with self._lock:
+            key = (version, llm_id)
+            if key not in self._chains:
+                self._chains = {key: def_prompt(SYSTEM_PROMPT, "{input}") | get_llm(llm=llm_id) | StrOutputParser()}
+            return self._chains[key]
+
+    def answer(self, question: str) -> str:
+        self.index.refresh()  # cheap when no procedure file changed
+        version = self.index.version
+        llm_id = global_config().get_str("llm.models.default")
+        vectorstore = self.index.store.get()
+        vector = np.asarray(vectorstore.embeddings.embed_query(question), dtype=np.float32)  # type: ignore
+        normalized = vector / (np.linalg.norm(vector) or 1.0)
+        if self.cache:
+            self.cache.check_version(f"{version}:{llm_id}")
+            if (cached := self.cache.lookup(normalized)) is not None:
+                answer, similarity = cached
+                logger.info("cached answer for '{}' (similarity {:.3f})", question, similarity)
+                return answer
+        docs = vectorstore.similarity_search_by_vector(vector.tolist(), k=RETRIEVED_CHUNKS)
+        answer = self.chain(version, llm_id).invoke({"context": _format_context(docs), "input": question})
+        if self.cache:
+            self.cache.add(normalized, answer)
+        return answer
+
+
+def answer_cache_from_config() -> SemanticAnswerCache | None:
+    """Answer cache set in 'maintenance_agent.answer_cache', or None if it's disabled."""
+    config, prefix = global_config(), "maintenance_agent.answer_cache"
+    if not config.get_bool(f"{prefix}.enabled", default=True):
+        logger.info("procedure answer cache disabled")
+        return None
+    return SemanticAnswerCache(
+        threshold=float(config.get_str(f"{prefix}.threshold", default=str(ANSWER_CACHE_THRESHOLD))),
+        ttl=float(config.get_str(f"{prefix}.ttl", default=str(ANSWER_CACHE_TTL))),
+        size=int(config.get_str(f"{prefix}.size", default=str(ANSWER_CACHE_SIZE))),
+    )
+
+
+@cache
+def get_procedure_qa() -> ProcedureQA:
+    """Question answering shared by the process, with its answer cache."""
+    return ProcedureQA(get_procedure_index(), answer_cache_from_config())
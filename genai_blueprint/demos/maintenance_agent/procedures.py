@@ -0,0 +1,173 @@
+"""Persistent index of the maintenance procedures.
+
+All the text files under 'DATA_PATH' are split into chunks and embedded in the 'maintenance_procedures'
+embeddings store (see 'baseline.yaml').  A state file next to the vector store records, for each procedure file, its
+size, modification time, content hash and the ids of its chunks.  On refresh:
+- files whose size and modification time are unchanged are not even read
+- files whose content changed are split again, and only the chunks not already in the store are embedded
+  (chunk ids are made of the file name and a hash of the chunk content); chunks that disappeared are deleted
+- chunks of removed files are deleted
+
+The index doesn't depend on Streamlit.  It can be refreshed from the command line:
+    uv run python -m genai_blueprint.demos.maintenance_agent.procedures [--full]
+"""
+
+import hashlib
+import threading
+from functools import cache
+from pathlib import Path
+
+import typer
+from genai_tk.core.embeddings_store import EmbeddingsStore
+from genai_tk.utils.config_mngr import global_config
+from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from langchain_core.vectorstores.base import VectorStoreRetriever
+from loguru import logger
+from pydantic import BaseModel
+
+DATA_PATH = Path(global_config().get_str("documents.base")) / "maintenance"
+PROCEDURE_STORE = "maintenance_procedures"
+PROCEDURE_SUFFIXES = {".txt", ".md"}
+CHUNK_SIZE = 1000
+
+
+class FileState(BaseModel):
+    size: int
+    mtime_ns: int
+    sha256: str
+    chunk_ids: list[str]
+
+
+class ProcedureState(BaseModel):
+    files: dict[str, FileState] = {}
+
+    @property
+    def version(self) -> str:
+        """Hash of the indexed file contents, which changes whenever the index content changes."""
+        h = hashlib.sha256()
+        for name in sorted(self.files):
+            h.update(f"{name}:{self.files[name].sha256}\n".encode())
+        return h.hexdigest()[:16]
+
+
+class RefreshStats(BaseModel):
+    files: int = 0
+    changed_files: int = 0
+    added_chunks: int = 0
+    deleted_chunks: int = 0
+
+
+def procedure_state_file() -> Path:
+    return Path(global_config().get_str("vector_store.path")) / "manifests" / f"{PROCEDURE_STORE}.json"
+
+
+def procedure_files(data_path: Path = DATA_PATH) -> list[Path]:
+    return sorted(p for p in data_path.rglob("*") if p.is_file() and p.suffix in PROCEDURE_SUFFIXES)
+
+
+def split_procedure(name: str, content: str) -> list[Document]:
+    """Chunks of a procedure file, with an id made of the file name and of a hash of their content."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=0)
+    chunks = {}
+    for text in splitter.split_text(content):
+        chunk_id = f"{name}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+        chunks[chunk_id] = Document(id=chunk_id, page_content=text, metadata={"source": name})
+    return list(chunks.values())
+
+
+class ProcedureIndex:
+    """Procedure chunks in an embeddings store, refreshed incrementally from the procedure files."""
+
+    def __init__(self, store: EmbeddingsStore, state_file: Path, data_path: Path = DATA_PATH) -> None:
+        self.store = store
+        self.state_file = state_file
+        self.data_path = data_path
+        self._lock = threading.Lock()
+        self.state = ProcedureState()
+        if state_file.exists():
+            self.state = ProcedureState.model_validate_json(state_file.read_text())
+        if self.state.files and store.document_count() == 0:  # store emptied, or not persistent
+            logger.info("procedure store is empty - index all procedures")
+            self.state = ProcedureState()
+
+    @property
+    def version(self) -> str:
+        return self.state.version
+
+    def _save(self) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_name(self.state_file.name + ".tmp")
+        tmp_file.write_text(self.state.model_dump_json(indent=1))
+        tmp_file.replace(self.state_file)
+
+    def refresh(self) -> RefreshStats:
+        """Embed the chunks of new or modified procedure files, and delete those no longer in the files."""
+        with self._lock:
+            stats = RefreshStats()
+            files = {str(p.relative_to(self.data_path)): p for p in procedure_files(self.data_path)}
+            stats.files = len(files)
+            for name, path in files.items():
+                stat = path.stat()
+                previous = self.state.files.get(name)
+                if previous and (previous.size, previous.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                content = path.read_bytes()
+                sha256 = hashlib.sha256(content).hexdigest()
+                if previous and previous.sha256 == sha256:  # touched, but not modified
+                    self.state.files[name] = previous.model_copy(update={"mtime_ns": stat.st_mtime_ns})
+                    continue
+                chunks = split_procedure(name, content.decode("utf-8", errors="replace"))
+                known = set(previous.chunk_ids) if previous else set()
+                new_chunks = [c for c in chunks if c.id not in known]
+                if new_chunks:
+                    self.store.add_documents(new_chunks)
+                stale = known - {c.id for c in chunks}
+                if stale:
+                    self.store.get().delete(ids=list(stale))
+                self.state.files[name] = FileState(
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    sha256=sha256,
+                    chunk_ids=[c.id for c in chunks if c.id],
+                )
+                self._save()  # after each file, so an interrupted refresh doesn't embed it again
+                stats.changed_files += 1
+                stats.added_chunks += len(new_chunks)
+                stats.deleted_chunks += len(stale)
+            for name in set(self.state.files) - set(files):
+                removed = self.state.files.pop(name)
+                if removed.chunk_ids:
+                    self.store.get().delete(ids=removed.chunk_ids)
+                stats.deleted_chunks += len(removed.chunk_ids)
+            self._save()
+            if stats.changed_files or stats.deleted_chunks:
+                logger.info("procedure index refreshed (version {}): {}", self.version, stats)
+            return stats
+
+    def retriever(self, k: int = 4) -> VectorStoreRetriever:
+        return self.store.get().as_retriever(search_kwargs={"k": k})
+
+
+@cache
+def get_procedure_index() -> ProcedureIndex:
+    """Procedure index shared by the process, refreshed when first used."""
+    index = ProcedureIndex(EmbeddingsStore.create_from_config(PROCEDURE_STORE), procedure_state_file())
+    index.refresh()
+    return index
+
+
+app = typer.Typer()
+
+
+@app.command()
+def refresh(full: bool = typer.Option(False, help="discard the state file and embed everything again")) -> None:
+    """Index new or modified maintenance procedures."""
+    if full:
+        procedure_state_file().unlink(missing_ok=True)
+    index = ProcedureIndex(EmbeddingsStore.create_from_config(PROCEDURE_STORE), procedure_state_file())
+    print(index.refresh())
+
+
+if __name__ == "__main__":
+    app()
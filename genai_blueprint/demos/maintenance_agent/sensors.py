@@ -0,0 +1,300 @@
+"""Sensor time-series access for the maintenance tools.
+
+Sensor values are read through a backend selected by the 'source' string:
+- a SQLAlchemy URI (e.g. 'sqlite:////tmp/demo.db'): queries go through one pooled engine per database, with bound
+  parameters, on the 'sensor_data' table indexed by (sensor, date)
+- 'parquet://<directory>': a columnar copy of the table (see 'export_sensor_parquet'), partitioned by month and
+  sorted by sensor and date, queried with DuckDB.  Filters on month, sensor and date are pushed down to the
+  Parquet scan (partition pruning and row group statistics), so long multi-sensor aggregations stay fast.
+
+The answer is meant to be read by an LLM, so it stays compact whatever the time span:
+- up to MAX_POINTS values per sensor are returned as is
+- up to LTTB_MAX_ROWS values are fetched and downsampled to MAX_POINTS with LTTB (Largest Triangle Three
+  Buckets), which keeps the shape of the curve (peaks, drops)
+- beyond, values are aggregated in the database, in MAX_POINTS time buckets of min / mean / max, the bucket
+  width being computed from the requested time span.  In SQL, buckets are assigned by comparing the dates with
+  the bucket bounds (a CASE expression), so it works on any database storing dates as sortable strings
+"""
+
+import shutil
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import Engine, TextClause, bindparam, create_engine, inspect, text
+
+MAX_POINTS = 50
+LTTB_MAX_ROWS = 5_000
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+PARQUET_SCHEME = "parquet://"
+EXPORT_CHUNK_ROWS = 1_000_000
+
+# Statistics of a sensor on a time range: unit, count, first date, last date, min, mean, max
+SensorStats = tuple[str, int, datetime, datetime, float, float, float]
+
+
+@cache
+def get_engine(database_uri: str) -> Engine:
+    """Engine (and connection pool) shared by all the queries on a database."""
+    return create_engine(database_uri, pool_pre_ping=True)
+
+
+def create_sensor_indexes(engine: Engine) -> None:
+    """Index of the 'sensor_data' table used by the queries.  Created by the data generator, not by the tools."""
+    with engine.begin() as conn:
+        if inspect(conn).has_table("sensor_data"):
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sensor_data_sensor_date ON sensor_data (sensor, date)"))
+
+
+def _duckdb() -> Any:
+    try:
+        import duckdb
+    except ImportError as ex:
+        raise ImportError("Parquet sensor store requires the 'duckdb' package") from ex
+    return duckdb
+
+
+def _parse_time(value: str, name: str) -> pd.Timestamp:
+    try:
+        time = pd.Timestamp(value)
+    except ValueError:
+        time = pd.NaT
+    if pd.isna(time):
+        raise ValueError(f"invalid {name} time '{value}': expected 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM'")
+    return time
+
+
+def parse_time_range(start_time: str, end_time: str) -> tuple[datetime, datetime]:
+    """Start and (exclusive) end of a time range.  An end given as a date only includes the whole day.
+
+    Raise a ValueError with a readable message if a time is not valid, or if the range is empty.
+    """
+    start, end = _parse_time(start_time, "start"), _parse_time(end_time, "end")
+    if ":" not in end_time and end == end.normalize():
+        end += pd.Timedelta(days=1)
+    if end <= start:
+        raise ValueError(f"empty time range: end time '{end_time}' is not after start time '{start_time}'")
+    return start.to_pydatetime(), end.to_pydatetime()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the 'n' points kept by the Largest Triangle Three Buckets downsampling."""
+    if n >= len(x) or n < 3:
+        return np.arange(len(x))
+    edges = np.append(np.linspace(1, len(x) - 1, n - 1).astype(int), len(x))
+    selected = [0]
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_x, next_y = x[hi : edges[i + 2]].mean(), y[hi : edges[i + 2]].mean()
+        a = selected[-1]
+        areas = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        selected.append(lo + int(np.argmax(areas)))
+    selected.append(len(x) - 1)
+    return np.array(selected)
+
+
+class SensorBackend(ABC):
+    """Queries on the sensor time-series needed by 'sensor_summary'.  Time ranges include start, exclude end."""
+
+    @abstractmethod
+    def stats(self, sensors: list[str], start: datetime, end: datetime) -> dict[str, SensorStats]:
+        """Statistics of the sensors having values in the time range."""
+
+    @abstractmethod
+    def values(self, sensor: str, start: datetime, end: datetime) -> tuple[pd.DatetimeIndex, np.ndarray]:
+        """Dates and values of a sensor, in date order."""
+
+    @abstractmethod
+    def buckets(self, sensor: str, start: datetime, end: datetime, width: float) -> list[tuple]:
+        """First date, min, mean and max of the values in each time bucket of 'width' seconds."""
+
+    @abstractmethod
+    def known_sensors(self, limit: int = 50) -> list[str]: ...
+
+
+_STATS_SQL = text(
+    """SELECT sensor, MIN(unit), COUNT(*), MIN(date), MAX(date), MIN(value), AVG(value), MAX(value)
+       FROM sensor_data WHERE sensor IN :sensors AND date >= :start AND date < :end GROUP BY sensor"""
+).bindparams(bindparam("sensors", expanding=True))
+
+_VALUES_SQL = text(
+    """SELECT date, value FROM sensor_data
+       WHERE sensor = :sensor AND date >= :start AND date < :end ORDER BY date"""
+)
+
+
+def _buckets_sql(count: int) -> TextClause:
+    """Aggregation of a sensor values in 'count' time buckets, with bounds ':b1' to ':b<count-1>'."""
+    whens = " ".join(f"WHEN date < :b{i} THEN {i - 1}" for i in range(1, count))
+    return text(
+        f"""SELECT bucket, MIN(date), MIN(value), AVG(value), MAX(value)
+            FROM (SELECT CASE {whens} ELSE {count - 1} END AS bucket, date, value FROM sensor_data
+                  WHERE sensor = :sensor AND date >= :start AND date < :end) AS v
+            GROUP BY bucket ORDER BY bucket"""
+    )
+
+
+class SqlSensorBackend(SensorBackend):
+    """'sensor_data' table of a SQL database, with dates stored as 'YYYY-MM-DD HH:MM:SS' strings."""
+
+    def __init__(self, database_uri: str) -> None:
+        self.engine = get_engine(database_uri)
+
+    @staticmethod
+    def _params(start: datetime, end: datetime) -> dict[str, str]:
+        return {"start": start.strftime(DATE_FORMAT), "end": end.strftime(DATE_FORMAT)}
+
+    def stats(self, sensors: list[str], start: datetime, end: datetime) -> dict[str, SensorStats]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(_STATS_SQL, self._params(start, end) | {"sensors": sensors}).all()
+        return {r[0]: (r[1], r[2], pd.Timestamp(r[3]), pd.Timestamp(r[4]), *r[5:]) for r in rows}
+
+    def values(self, sensor: str, start: datetime, end: datetime) -> tuple[pd.DatetimeIndex, np.ndarray]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(_VALUES_SQL, self._params(start, end) | {"sensor": sensor}).all()
+        return pd.to_datetime([r[0] for r in rows]), np.array([r[1] for r in rows], dtype=float)
+
+    def buckets(self, sensor: str, start: datetime, end: datetime, width: float) -> list[tuple]:
+        count = max(1, int(np.ceil((end - start).total_seconds() / width)))
+        bounds = {f"b{i}": (start + pd.Timedelta(seconds=i * width)).strftime(DATE_FORMAT) for i in range(1, count)}
+        with self.engine.connect() as conn:
+            params = self._params(start, end) | {"sensor": sensor} | bounds
+            return [(pd.Timestamp(r[1]), *r[2:]) for r in conn.execute(_buckets_sql(count), params)]
+
+    def known_sensors(self, limit: int = 50) -> list[str]:
+        with self.engine.connect() as conn:
+            return list(conn.execute(text("SELECT DISTINCT sensor FROM sensor_data LIMIT :n"), {"n": limit}).scalars())
+
+
+class ParquetSensorBackend(SensorBackend):
+    """Parquet files of a directory partitioned by month ('month=YYYY-MM/*.parquet'), queried with DuckDB."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.conn = _duckdb().connect()
+        pattern = str(directory / "*" / "*.parquet").replace("'", "''")
+        self.conn.execute(
+            f"""CREATE VIEW sensor_data AS SELECT * FROM read_parquet('{pattern}',
+                hive_partitioning = true, hive_types = {{'month': VARCHAR}})"""
+        )
+
+    def _query(self, sql: str, params: list) -> list[tuple]:
+        # a cursor is a connection of its own to the same database: the backend can be shared by threads
+        with self.conn.cursor() as cursor:
+            return cursor.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _range(start: datetime, end: datetime) -> tuple[str, list]:
+        """Filter on a time range, with the month bounds used for partition pruning."""
+        condition = "month >= ? AND month <= ? AND date >= ? AND date < ?"
+        return condition, [f"{start:%Y-%m}", f"{end:%Y-%m}", start, end]
+
+    def stats(self, sensors: list[str], start: datetime, end: datetime) -> dict[str, SensorStats]:
+        condition, params = self._range(start, end)
+        rows = self._query(
+            f"""SELECT sensor, MIN(unit), COUNT(*), MIN(date), MAX(date), MIN(value), AVG(value), MAX(value)
+                FROM sensor_data WHERE {condition} AND list_contains(?, sensor) GROUP BY sensor""",
+            params + [sensors],
+        )
+        return {r[0]: (r[1], r[2], pd.Timestamp(r[3]), pd.Timestamp(r[4]), *r[5:]) for r in rows}
+
+    def values(self, sensor: str, start: datetime, end: datetime) -> tuple[pd.DatetimeIndex, np.ndarray]:
+        condition, params = self._range(start, end)
+        with self.conn.cursor() as cursor:
+            result = cursor.execute(
+                f"SELECT date, value FROM sensor_data WHERE {condition} AND sensor = ? ORDER BY date",
+                params + [sensor],
+            ).fetchnumpy()
+        return pd.DatetimeIndex(result["date"]), np.asarray(result["value"], dtype=float)
+
+    def buckets(self, sensor: str, start: datetime, end: datetime, width: float) -> list[tuple]:
+        condition, params = self._range(start, end)
+        rows = self._query(
+            f"""SELECT CAST(floor(date_diff('second', ?::TIMESTAMP, date) / ?) AS BIGINT) AS bucket,
+                       MIN(date), MIN(value), AVG(value), MAX(value)
+                FROM sensor_data WHERE {condition} AND sensor = ? GROUP BY bucket ORDER BY bucket""",
+            [start, width] + params + [sensor],
+        )
+        return [(pd.Timestamp(r[1]), *r[2:]) for r in rows]
+
+    def known_sensors(self, limit: int = 50) -> list[str]:
+        return [r[0] for r in self._query("SELECT DISTINCT sensor FROM sensor_data LIMIT ?", [limit])]
+
+
+@cache
+def get_sensor_backend(source: str) -> SensorBackend:
+    """Backend of a sensor store: 'parquet://<directory>', or a SQLAlchemy database URI."""
+    if source.startswith(PARQUET_SCHEME):
+        return ParquetSensorBackend(Path(source.removeprefix(PARQUET_SCHEME)))
+    return SqlSensorBackend(source)
+
+
+def export_sensor_parquet(database_uri: str, directory: Path) -> int:
+    """Copy the 'sensor_data' table of a database to Parquet files partitioned by month, and return the row count.
+
+    Rows are sorted by sensor and date in each partition, so the row group statistics skip most of the file when
+    filtering on a sensor.  The directory is replaced once the export is complete.
+    """
+    conn = _duckdb().connect()
+    conn.execute("CREATE TABLE staging (date TIMESTAMP, sensor VARCHAR, value DOUBLE, unit VARCHAR)")
+    count = 0
+    with get_engine(database_uri).connect() as db:
+        sql = text("SELECT date, sensor, value, unit FROM sensor_data")
+        for chunk in pd.read_sql(sql, db, chunksize=EXPORT_CHUNK_ROWS):
+            conn.register("chunk", chunk)
+            conn.execute("INSERT INTO staging SELECT CAST(date AS TIMESTAMP), sensor, value, unit FROM chunk")
+            conn.unregister("chunk")
+            count += len(chunk)
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.parent.mkdir(parents=True, exist_ok=True)
+    conn.execute(
+        f"""COPY (SELECT *, strftime(date, '%Y-%m') AS month FROM staging ORDER BY month, sensor, date)
+            TO '{str(tmp_dir).replace("'", "''")}' (FORMAT parquet, PARTITION_BY (month), COMPRESSION zstd)"""
+    )
+    conn.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    tmp_dir.replace(directory)
+    get_sensor_backend.cache_clear()
+    logger.info("{} sensor values exported to {}", count, directory)
+    return count
+
+
+def sensor_summary(source: str, sensors: list[str], start_time: str, end_time: str) -> str:
+    """Compact text description of the values of sensors during a time range.
+
+    'source' is the sensor store: a SQLAlchemy database URI, or 'parquet://<directory>'.
+    """
+    backend = get_sensor_backend(source)
+    start, end = parse_time_range(start_time, end_time)
+    lines = []
+    stats = backend.stats(sensors, start, end)
+    for sensor in sensors:
+        if sensor not in stats:
+            lines.append(f"{sensor}: no values between {start:{DATE_FORMAT}} and {end:{DATE_FORMAT}}")
+            continue
+        unit, count, first, last, min_value, mean_value, max_value = stats[sensor]
+        lines.append(
+            f"{sensor} ({unit}): {count} values from {first:%Y-%m-%d %H:%M} to {last:%Y-%m-%d %H:%M}; "
+            f"min {min_value:.4g}, mean {mean_value:.4g}, max {max_value:.4g}"
+        )
+        if count <= LTTB_MAX_ROWS:
+            dates, values = backend.values(sensor, start, end)
+            keep = lttb(dates.asi8.astype(float), values, MAX_POINTS)
+            if len(keep) < count:
+                lines.append(f"  downsampled to {len(keep)} points (date: value):")
+            lines.extend(f"  {dates[i]:%Y-%m-%d %H:%M}: {values[i]:.4g}" for i in keep)
+        else:
+            width = max(1.0, (end - start).total_seconds() / MAX_POINTS)
+            rows = backend.buckets(sensor, start, end, width)
+            lines.append(f"  in {len(rows)} periods of {pd.Timedelta(seconds=width)} (start: min / mean / max):")
+            lines.extend(f"  {r[0]:%Y-%m-%d %H:%M}: {r[1]:.4g} / {r[2]:.4g} / {r[3]:.4g}" for r in rows)
+    if not stats:
+        lines.append(f"known sensors: {', '.join(backend.known_sensors())}")
+    logger.debug("sensor values of {} from {} to {}: {} lines", sensors, start, end, len(lines))
+    return "\n".join(lines)
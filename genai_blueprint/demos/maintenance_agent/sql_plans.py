@@ -0,0 +1,242 @@
+"""Cache of SQL query plans for the natural language questions on the planning database.
+
+Questions are normalized into a template: dates and values found in the planning tables (employee names,
+procedures, tasks, ...) are replaced by placeholders and extracted as parameters.  "Tasks assigned to John Smith between
+2024-05-02 and 2024-05-10" becomes "tasks assigned to <tasks.employee> between <date> and <date>".
+
+On a miss, the SQL query is generated by the LLM and executed on the database, opened read-only.  If each parameter
+appears as a literal in the query, the literals are replaced by bound parameters and the query is kept as the plan
+of the template: next questions of the same template are answered without LLM call.  Queries that can't be
+generated or executed are delegated to a fallback (the SQL agent tool).
+
+Plans are persisted in a JSON file, with a fingerprint of the database schema: they are discarded when the schema
+changes.
+"""
+
+import hashlib
+import re
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from genai_tk.core.llm_factory import get_llm
+from genai_tk.core.prompts import def_prompt
+from langchain_core.output_parsers import StrOutputParser
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import Engine, create_engine, inspect, make_url, text
+
+DATE_RE = r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?"
+MAX_ENTITY_VALUES = 1000  # text columns with more distinct values are not used to extract parameters
+MAX_RESULT_ROWS = 200
+PLANNING_TABLES = ("tasks",)  # tables the questions are about: their schema is given to the LLM
+
+SQL_PROMPT = """Given the SQLite database schema below, write one SQL query answering the question.
+Answer with the SQL query only, without explanation nor markdown.
+
+{schema}
+
+Examples:
+{examples}"""
+
+
+class SqlPlan(BaseModel):
+    sql: str  # with ':p0', ':p1'... bound parameters
+    params: list[str]  # placeholder of each parameter, in order
+
+
+class PlanCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    fallbacks: int = 0
+
+
+class PlanFile(BaseModel):
+    schema_hash: str
+    plans: dict[str, SqlPlan] = {}
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _words(text: str) -> str:
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+def read_only_engine(database_uri: str) -> Engine:
+    """Engine on a SQLite database opened in read-only mode: generated queries can't modify it."""
+    url = make_url(database_uri)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        raise ValueError(f"SQL plans need a SQLite database file, not '{database_uri}'")
+    return create_engine(f"sqlite:///file:{Path(url.database).resolve()}?mode=ro&uri=true")
+
+
+def extract_sql(answer: str) -> str:
+    """SQL query of an LLM answer, without markdown fences nor trailing semicolon."""
+    if match := re.search(r"```(?:sql)?\s*(.*?)```", answer, re.DOTALL | re.IGNORECASE):
+        answer = match.group(1)
+    return answer.strip().rstrip(";").strip()
+
+
+class SqlPlanCache:
+    """Answer questions on a SQL database, from cached query plans or with the LLM."""
+
+    def __init__(
+        self,
+        database_uri: str,
+        file: Path,
+        examples: list[dict[str, str]] | None = None,
+        tables: tuple[str, ...] = PLANNING_TABLES,
+    ) -> None:
+        self.engine = read_only_engine(database_uri)
+        self.file = file
+        self.tables = tables
+        self.examples = examples or []
+        self.stats = PlanCacheStats()
+        self._lock = threading.Lock()
+        self._schema_hash = ""
+        self._schema = ""
+        self._tables: dict[str, list[tuple[str, str]]] = {}
+        self._entities: list[tuple[str, str]] = []  # (value, placeholder), longest values first
+        self._data_version: tuple = ()
+        self.plans: dict[str, SqlPlan] = {}
+        if file.exists():
+            try:
+                saved = PlanFile.model_validate_json(file.read_text())
+                self._schema_hash, self.plans = saved.schema_hash, saved.plans
+            except ValueError as ex:
+                logger.warning("cannot read SQL plans from {}: {}", file, ex)
+
+    def _check_schema(self) -> None:
+        """Load the schema, and discard the plans if it changed since they were made."""
+        with self.engine.connect() as conn:
+            inspector = inspect(conn)
+            tables = {
+                table: [(c["name"], str(c["type"])) for c in inspector.get_columns(table)]
+                for table in inspector.get_table_names()
+                if table in self.tables
+            }
+        schema = "\n".join(f"{t}({', '.join(f'{c} {ty}' for c, ty in cols)})" for t, cols in sorted(tables.items()))
+        schema_hash = hashlib.sha256(schema.encode()).hexdigest()[:16]
+        if schema != self._schema:
+            self._schema, self._tables, self._data_version = schema, tables, ()
+            self._load_entities()
+        if schema_hash != self._schema_hash:
+            if self.plans:
+                logger.info("planning database schema changed - discard {} SQL plans", len(self.plans))
+            self._schema_hash, self.plans = schema_hash, {}
+            self._save()
+
+    def _load_entities(self) -> None:
+        """Values of the text columns with few distinct values, which are the parameters of the questions.
+
+        They're loaded again only if the content of the tables changed (row count or last rowid).
+        """
+        entities: dict[str, str] = {}
+        with self.engine.connect() as conn:
+            version = tuple(
+                tuple(conn.execute(text(f'SELECT COUNT(*), MAX(rowid) FROM "{table}"')).one()) for table in self._tables
+            )
+            if version == self._data_version:
+                return
+            for table, columns in self._tables.items():
+                for column, type_ in columns:
+                    if "CHAR" not in type_.upper() and "TEXT" not in type_.upper():
+                        continue
+                    sql = f'SELECT DISTINCT "{column}" FROM "{table}" LIMIT {MAX_ENTITY_VALUES + 1}'
+                    values = [v for v in conn.execute(text(sql)).scalars() if isinstance(v, str) and v.strip()]
+                    if len(values) <= MAX_ENTITY_VALUES:
+                        placeholder = f"<{table}.{column}>"
+                        entities.update((v, placeholder) for v in values if not re.fullmatch(DATE_RE + r".*", v))
+        self._entities = sorted(entities.items(), key=lambda e: -len(e[0]))
+        self._data_version = version
+
+    def normalize(self, question: str) -> tuple[str, list[tuple[str, str]]]:
+        """Template of a question, and its parameters: (value, placeholder) in order of appearance."""
+        patterns = [(rf"(?<!\w){re.escape(v)}(?!\w)", v, p) for v, p in self._entities] + [(DATE_RE, None, "<date>")]
+        spans: list[tuple[int, int, str, str]] = []
+        masked = question  # found values are masked, so they're not found again by a shorter pattern
+        for pattern, value, placeholder in patterns:
+            for m in re.finditer(pattern, masked, re.IGNORECASE):
+                spans.append((m.start(), m.end(), value or m.group(), placeholder))
+                masked = masked[: m.start()] + "\0" * (m.end() - m.start()) + masked[m.end() :]
+        spans.sort()
+        words, position = [], 0
+        for start, end, _, placeholder in spans:
+            words += [_words(question[position:start]), placeholder]
+            position = end
+        template = " ".join(w for w in [*words, _words(question[position:])] if w)
+        return template, [(value, placeholder) for _, _, value, placeholder in spans]
+
+    def _generate_sql(self, question: str) -> str:
+        examples = "\n".join(f"Question: {e['input']}\nSQL: {e['query']}" for e in self.examples)
+        prompt = def_prompt(SQL_PROMPT, "Question: {question}\nSQL:")
+        chain = prompt | get_llm() | StrOutputParser()
+        return extract_sql(chain.invoke({"schema": self._schema, "examples": examples, "question": question}))
+
+    def _run(self, sql: str, params: dict[str, str] | None = None) -> str:
+        # the database is opened read-only: this check only rejects obvious non-queries early
+        if not re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+            raise ValueError(f"not a query: {sql}")
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), params or {}).fetchmany(MAX_RESULT_ROWS + 1)
+        result = str([tuple(row) for row in rows[:MAX_RESULT_ROWS]])
+        if len(rows) > MAX_RESULT_ROWS:
+            result += f" … (truncated to the first {MAX_RESULT_ROWS} rows)"
+        return result
+
+    @staticmethod
+    def _make_plan(sql: str, params: list[tuple[str, str]]) -> SqlPlan | None:
+        """Plan with the parameter values of the query replaced by bound parameters, if each is found once."""
+        for i, (value, _) in enumerate(params):
+            literal = _quote(value)
+            if sql.count(literal) != 1:
+                return None
+            sql = sql.replace(literal, f":p{i}")
+        return SqlPlan(sql=sql, params=[placeholder for _, placeholder in params])
+
+    def _save(self) -> None:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.file.with_name(self.file.name + ".tmp")
+        tmp_file.write_text(PlanFile(schema_hash=self._schema_hash, plans=self.plans).model_dump_json(indent=1))
+        tmp_file.replace(self.file)
+
+    def answer(self, question: str, fallback: Callable[[str], str]) -> str:
+        """Answer from the plan of the question template if any, else with a SQL query generated by the LLM."""
+        with self._lock:
+            self._check_schema()
+            template, params = self.normalize(question)
+            plan = self.plans.get(template)
+        bound = {f"p{i}": value for i, (value, _) in enumerate(params)}
+        if plan and plan.params == [placeholder for _, placeholder in params]:
+            try:
+                result = self._run(plan.sql, bound)
+                with self._lock:
+                    self.stats.hits += 1
+                logger.debug("SQL plan of '{}' reused", template)
+                return result
+            except Exception as ex:
+                logger.warning("cannot run SQL plan of '{}' - {}", template, ex)
+                with self._lock:
+                    self.plans.pop(template, None)
+        with self._lock:  # the question may hold values added to the database since they were loaded
+            self.stats.misses += 1
+            self._load_entities()
+            template, params = self.normalize(question)
+        bound = {f"p{i}": value for i, (value, _) in enumerate(params)}
+        try:
+            sql = self._generate_sql(question)
+            result = self._run(sql)
+        except Exception as ex:
+            logger.info("generated SQL failed for '{}' ({}) - use SQL agent", question, ex)
+            with self._lock:
+                self.stats.fallbacks += 1
+            return fallback(question)
+        plan = self._make_plan(sql, params)
+        if plan is not None and self._run(plan.sql, bound) == result:  # same result with bound parameters
+            with self._lock:
+                self.plans[template] = plan
+                self._save()
+            logger.info("new SQL plan for '{}': {}", template, plan.sql)
+        return result
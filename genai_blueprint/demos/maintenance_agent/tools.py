@@ -15,22 +15,17 @@ from functools import cache
 from pathlib import Path
 from textwrap import dedent
 
-import streamlit as st
-from genai_tk.core.embeddings_store import EmbeddingsStore
 from genai_tk.core.llm_factory import get_llm
-from genai_tk.core.prompts import dedent_ws, def_prompt
+from genai_tk.core.prompts import dedent_ws
 from genai_tk.tools.langchain.sql_tool_factory import SQLToolConfig, SQLToolFactory
 from genai_tk.utils.config_mngr import global_config
 from langchain.tools import BaseTool, tool
-from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_community.utilities import SQLDatabase
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.vectorstores.base import VectorStore
 from loguru import logger
 
-from genai_blueprint.demos.maintenance_agent.dummy_data import dummy_database
+from genai_blueprint.demos.maintenance_agent.dummy_data import dummy_database, sensor_store
+from genai_blueprint.demos.maintenance_agent.procedure_qa import get_procedure_qa
+from genai_blueprint.demos.maintenance_agent.sensors import sensor_summary
+from genai_blueprint.demos.maintenance_agent.sql_plans import SqlPlanCache
 
 # Tools setup
 PROCEDURES = [
@@ -39,37 +34,6 @@ PROCEDURES = [
     "procedure_cooling_system.txt",
 ]
 
-DATA_PATH = Path(global_config().get_str("documents.base")) / "maintenance"
-
-VECTOR_STORE_ID = "InMemory"
-
-
-@st.cache_resource(show_spinner=True)
-def maintenance_procedure_vectors(text: str) -> VectorStore:
-    """Create vector store from maintenance procedure documents.
-
-    Args:
-        text: Name of the text file containing maintenance procedures
-
-    Returns:
-        VectorStore: Configured vector store with indexed documents
-
-    The procedure documents are:
-    1. Loaded from the specified text file
-    2. Split into chunks for efficient retrieval
-    3. Embedded using configured embeddings
-    4. Stored in the vector store
-    """
-    embeddings_store = EmbeddingsStore.create_from_config("in_memory")
-
-    loader = TextLoader(str(DATA_PATH / text))
-    documents = loader.load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    texts = text_splitter.split_documents(documents)
-    embeddings_store.add_documents(texts)
-    return embeddings_store.get()
-
-
 examples = [
     {
         "input": "Tasks assigned to employee 'employee_name' between '2023-10-22' and '2023-10-28'.",
@@ -100,7 +64,7 @@ def create_maintenance_tools() -> list[BaseTool]:
     """
     logger.info("create tools")
 
-    # Create planning info tool using the factory constructor
+    # Create planning info tool: cached SQL plans, and the SQL tool of the factory as fallback
     config = SQLToolConfig(
         database_uri=dummy_database(),
         tool_name="get_planning_info",
@@ -108,7 +72,20 @@ def create_maintenance_tools() -> list[BaseTool]:
         examples=examples[:5],
     )
     factory = SQLToolFactory(get_llm())
-    get_planning_info = factory.create_tool(config)
+    sql_agent = factory.create_tool(config)
+    plans_file = Path(global_config().get_str("vector_store.path")) / "manifests" / "planning_sql_plans.json"
+    try:
+        sql_plans = SqlPlanCache(config.database_uri, plans_file, examples=examples[:5])
+    except ValueError as ex:  # not a SQLite file: questions all go to the SQL agent
+        logger.info("SQL plan cache disabled - {}", ex)
+        sql_plans = None
+
+    @tool
+    def get_planning_info(question: str) -> str:
+        """Useful for when you need to answer questions about tasks assigned to employees."""
+        if sql_plans is None:
+            return sql_agent.invoke(question)
+        return sql_plans.answer(question, fallback=sql_agent.invoke)
 
     @tool
     def get_maintenance_times(area: str) -> str:
@@ -131,16 +108,7 @@ def create_maintenance_tools() -> list[BaseTool]:
     @tool
     def maintenance_procedure_retriever(full_query: str) -> str:
         """Answer to any questions about maintenance procedures, such as tasks, prerequisite, spare parts, required tools etc."""
-        system_prompt = (
-            "Use the given context to answer the question. If you don't know the answer, say you don't know. "
-            "Use three sentence maximum and keep the answer concise. \n"
-            "Context: {context}"
-        )
-        prompt = def_prompt(system_prompt, "{input}")
-        retriever = maintenance_procedure_vectors(PROCEDURES[0]).as_retriever()
-        llm = get_llm()
-        chain = {"context": retriever, "input": RunnablePassthrough()} | prompt | llm | StrOutputParser()
-        return chain.invoke(full_query)
+        return get_procedure_qa().answer(full_query)
 
     @tool
     def get_info_from_erp(tools_name: list[str], time: str) -> str:
@@ -155,15 +123,14 @@ def create_maintenance_tools() -> list[BaseTool]:
 
     @tool
     def get_sensor_values(sensor_name: list[str], start_time: str, end_time: str) -> str:
-        """Useful to know the values of a given sensor during a time range."""
-        print(sensor_name, start_time, end_time)
-        ls = ",".join([f"'{n}'" for n in sensor_name])
-        db = SQLDatabase.from_uri(dummy_database())
-        sql = f"""SELECT date, sensor, value, unit FROM  sensor_data
-                  WHERE  sensor IN ({ls}) and date >= '{start_time}' and date <= '{end_time}'"""
-        print(sql)
-        result = db.run(sql)
-        return str(result)
+        """Useful to know the values of given sensors during a time range (dates as 'YYYY-MM-DD [HH:MM]').
+
+        Long ranges are summarized: downsampled values, or min / mean / max per period.
+        """
+        try:
+            return sensor_summary(sensor_store(), sensor_name, start_time, end_time)
+        except ValueError as ex:
+            return f"Error: {ex}"
 
     return [
         get_maintenance_times,
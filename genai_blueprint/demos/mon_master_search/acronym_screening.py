@@ -0,0 +1,120 @@
+"""Screening of candidate acronyms found in the corpus.
+
+A candidate (upper case word) is kept as a possible acronym if it's neither a French nor an English word,
+and if it's not a misspelling of a French word.  The latter check relies on 'enchant' suggestions, which
+are slow : they run in a pool of processes.  Verdicts are kept in a SQLite cache, keyed by token and
+dictionaries version, so only new tokens are screened after a corpus refresh.
+"""
+
+# cSpell: disable
+
+import re
+import sqlite3
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from langchain_core.documents import Document
+from loguru import logger
+from unidecode import unidecode
+
+from genai_blueprint.demos.mon_master_search.acronyms import REGEXP_ACRONYMS
+
+try:
+    import enchant
+except ImportError as ex:
+    raise ImportError("enchant package is required. Install with: uv add enchant --group demos") from ex
+
+DICT_LANGUAGES = ("fr", "en")
+
+_french_dict: "enchant.Dict | None" = None
+
+
+def dictionaries_version() -> str:
+    """Identify the spell checker and dictionaries used, so verdicts are invalidated when they change."""
+    parts = [enchant.get_enchant_version()]
+    for lang in DICT_LANGUAGES:
+        d = enchant.Dict(lang)
+        parts += [d.tag, d.provider.name, d.provider.file]
+    return "|".join(parts)
+
+
+def _init_worker() -> None:
+    global _french_dict
+    _french_dict = enchant.Dict("fr")
+
+
+def _is_not_misspelled(word: str) -> bool:
+    """True if the word is not a (non accentuated, ...) variant of a French word."""
+    assert _french_dict is not None
+    suggested = [unidecode(w).lower() for w in _french_dict.suggest(word)]
+    return unidecode(word).lower() not in suggested
+
+
+class VerdictCache:
+    """Persistent 'is acronym' verdicts, keyed by token and dictionaries version."""
+
+    def __init__(self, path: Path, version: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.version = version
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts "
+            "(token TEXT NOT NULL, version TEXT NOT NULL, acronym INTEGER NOT NULL, PRIMARY KEY (token, version))"
+        )
+
+    def get_many(self, tokens: Iterable[str]) -> dict[str, bool]:
+        tokens = list(tokens)
+        result = {}
+        for i in range(0, len(tokens), 500):  # stay below SQLite max number of parameters
+            chunk = tokens[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT token, acronym FROM verdicts WHERE version = ? AND token IN ({placeholders})",
+                [self.version, *chunk],
+            )
+            result.update({token: bool(acronym) for token, acronym in rows})
+        return result
+
+    def put_many(self, verdicts: dict[str, bool]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?)",
+                [(token, self.version, int(v)) for token, v in verdicts.items()],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def find_candidates(docs: Iterable[Document]) -> set[str]:
+    """Collect the upper case words of the documents, read one at a time (ex: streamed from the corpus file)."""
+    pattern = re.compile(REGEXP_ACRONYMS)
+    candidates: set[str] = set()
+    for doc in docs:
+        candidates.update(pattern.findall(doc.page_content))
+    return candidates
+
+
+def screen_candidates(candidates: set[str], cache_file: Path, max_workers: int | None = None) -> set[str]:
+    """Return the candidates that are likely acronyms."""
+    cache = VerdictCache(cache_file, dictionaries_version())
+    try:
+        verdicts = cache.get_many(candidates)
+        new_tokens = [w for w in candidates if w not in verdicts]
+        logger.info("{} candidates, {} not in cache", len(candidates), len(new_tokens))
+
+        french_dict, english_dict = (enchant.Dict(lang) for lang in DICT_LANGUAGES)
+        new_verdicts = {w: False for w in new_tokens if french_dict.check(w) or english_dict.check(w)}
+        to_suggest = [w for w in new_tokens if w not in new_verdicts]
+        if to_suggest:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+                for word, verdict in zip(
+                    to_suggest, pool.map(_is_not_misspelled, to_suggest, chunksize=32), strict=True
+                ):
+                    new_verdicts[word] = verdict
+        cache.put_many(new_verdicts)
+        verdicts |= new_verdicts
+    finally:
+        cache.close()
+    return {w for w, is_acronym in verdicts.items() if is_acronym}
@@ -0,0 +1,62 @@
+"""Expansion of known acronyms in formation titles and user queries.
+
+The expander is built once from 'ACRONYMS' : a single compiled regexp matching only known acronyms, and the
+expansions with their token sets.  The (slow) Schwartz-Hearst extraction of acronyms defined in the text
+itself only runs when the text contains a parenthesis.
+"""
+
+# cSpell: disable
+
+import re
+from collections.abc import Iterable
+from functools import cache, lru_cache
+
+try:
+    from abbreviations import schwartz_hearst
+except ImportError as ex:
+    raise ImportError("abbreviations package is required. Install with: uv add abbreviations --group demos") from ex
+
+from genai_blueprint.demos.mon_master_search.model_subset import ACRONYMS
+
+REGEXP_ACRONYMS = r"(?<!\()\b[A-Z]{2,}\b(?!\))"
+
+
+class AcronymExpander:
+    """Append the expansion of known acronyms found in a text, ex: 'MIAGE' => 'MIAGE (Méthodes ...)'.
+
+    An acronym is not expanded if it's defined in the text, or if the text already contains a word of
+    its expansion.
+    """
+
+    def __init__(self, acronyms: dict[str, str], cache_size: int = 4096) -> None:
+        known = [a for a in acronyms if re.fullmatch(r"[A-Z]{2,}", a)]
+        self._expansions = {a: (f" ({acronyms[a]})", frozenset(acronyms[a].split(" "))) for a in known}
+        alternatives = "|".join(sorted(known, key=len, reverse=True))
+        self._regexp = re.compile(rf"(?<!\()\b(?:{alternatives})\b(?!\))") if known else None
+        self.expand = lru_cache(maxsize=cache_size)(self._expand)
+
+    def _expand(self, s: str) -> str:
+        if self._regexp is None:
+            return s
+        found = dict.fromkeys(self._regexp.findall(s))  # unique, in order of appearance
+        if not found:
+            return s
+        defined = schwartz_hearst.extract_abbreviation_definition_pairs(doc_text=s) if "(" in s else {}
+        words = set(s.split(" "))
+        result = s
+        for acronym in found:
+            if acronym in defined:
+                continue
+            suffix, tokens = self._expansions[acronym]
+            if tokens.isdisjoint(words):
+                result += suffix
+        return result
+
+    def expand_many(self, texts: Iterable[str]) -> list[str]:
+        """Expand a batch of texts. Repeated texts (frequent among titles) are expanded once."""
+        return [self.expand(s) for s in texts]
+
+
+@cache
+def get_acronym_expander() -> AcronymExpander:
+    return AcronymExpander(ACRONYMS)
@@ -0,0 +1,339 @@
+"""Compact, memory-mapped vector index for the masters corpus.
+
+Embeddings are L2-normalized and stored quantized (float16, or int8) in a raw memory-mapped matrix; documents
+are stored in a JSONL side file with an offsets array.  In int8, each row is scaled by its own max absolute value
+(kept in a side file), so that all the quantization levels are used whatever the embedding dimension.  Several
+processes (ex: Streamlit workers) opening the same index share its pages through the OS cache instead of loading
+each a full copy.
+
+Search is exact (brute-force cosine similarity by batched matrix products over blocks of rows), or approximate
+with an optional IVF (inverted file) index : rows are clustered by spherical k-means, and only the clusters
+closest to the query are scanned.
+
+The index is read-only : it's built offline (see 'loader.py create-mmap-index') and exposed as a LangChain
+VectorStore.
+"""
+
+# cSpell: disable
+
+import json
+import mmap
+import shutil
+import tempfile
+from collections.abc import Callable, Iterable
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+from pydantic import BaseModel
+
+QuantizationType = Literal["float16", "int8"]
+INT8_SCALE = 127.0
+BLOCK_ROWS = 65536
+
+VECTORS_FILE = "vectors.bin"
+SCALES_FILE = "scales.bin"
+DOCS_FILE = "docs.jsonl"
+DOC_OFFSETS_FILE = "doc_offsets.npy"
+META_FILE = "meta.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ORDER_FILE = "ivf_order.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+
+
+class AnnIndexMeta(BaseModel):
+    embeddings_id: str
+    dim: int
+    count: int
+    dtype: QuantizationType
+    ivf_lists: int = 0
+    collapsed: bool = False  # one document per group of near-duplicates (see 'dedup.py')
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _quantize(vectors: np.ndarray, dtype: QuantizationType) -> tuple[np.ndarray, np.ndarray | None]:
+    """Quantized rows and, in int8, the scale of each row (its max absolute value maps to 127)."""
+    if dtype == "int8":
+        scales = (np.maximum(np.abs(vectors).max(axis=1), 1e-12) / INT8_SCALE).astype(np.float32)
+        return np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8), scales
+    return vectors.astype(np.float16), None
+
+
+def _dequantize(rows: np.ndarray, scales: np.ndarray | None = None) -> np.ndarray:
+    if rows.dtype == np.int8:
+        if scales is None:  # index built before per-row scales
+            return rows.astype(np.float32) / INT8_SCALE
+        return rows.astype(np.float32) * scales[:, None]
+    return rows.astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Best 'k' scores (and matching ids) of each row of 'scores', sorted."""
+    k = min(k, scores.shape[1])
+    rows = np.arange(len(scores))[:, None]
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = part[rows, np.argsort(-scores[rows, part], axis=1)]
+    return scores[rows, top], ids[rows, top]
+
+
+def _spherical_kmeans(sample: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def replace_dir(new_dir: Path, directory: Path) -> None:
+    """Replace a directory by a new one built next to it.
+
+    The old directory is moved away then deleted: processes having its files memory-mapped keep reading them.  If
+    a concurrent build replaced it meanwhile, the new directory is discarded.
+    """
+    trash = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}.old."))
+    try:
+        directory.rename(trash / directory.name)
+    except FileNotFoundError:
+        pass
+    try:
+        new_dir.rename(directory)
+    except OSError:
+        if not directory.exists():
+            raise
+        logger.info("{} was rebuilt by another process", directory)
+        shutil.rmtree(new_dir, ignore_errors=True)
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def build_ann_index(
+    docs: Iterable[Document],
+    embeddings: Embeddings,
+    embeddings_id: str,
+    index_dir: Path,
+    dtype: QuantizationType = "int8",
+    batch_size: int = 64,
+    ivf_lists: int = 0,
+    collapsed: bool = False,
+) -> AnnIndexMeta:
+    """Embed documents in batches and write the index.  Set 'ivf_lists' > 0 to build an IVF index too.
+
+    Set 'collapsed' if the documents are only the representatives of the near-duplicate groups.  The index is
+    written in a temporary directory next to 'index_dir', which then replaces it: processes using the previous
+    index are not disturbed.
+    """
+    final_dir = index_dir
+    final_dir.parent.mkdir(parents=True, exist_ok=True)
+    index_dir = Path(tempfile.mkdtemp(dir=final_dir.parent, prefix=f".{final_dir.name}.tmp."))
+    try:
+        meta = _write_ann_index(docs, embeddings, embeddings_id, index_dir, dtype, batch_size, ivf_lists, collapsed)
+    except BaseException:
+        shutil.rmtree(index_dir, ignore_errors=True)
+        raise
+    replace_dir(index_dir, final_dir)
+    logger.info("index of {} documents ({}, dim={}) written in {}", meta.count, dtype, meta.dim, final_dir)
+    return meta
+
+
+def _write_ann_index(
+    docs: Iterable[Document],
+    embeddings: Embeddings,
+    embeddings_id: str,
+    index_dir: Path,
+    dtype: QuantizationType,
+    batch_size: int,
+    ivf_lists: int,
+    collapsed: bool,
+) -> AnnIndexMeta:
+    offsets = [0]
+    dim = 0
+    batch: list[Document] = []
+
+    with (
+        (index_dir / VECTORS_FILE).open("wb") as vf,
+        (index_dir / DOCS_FILE).open("wb") as df,
+        (index_dir / SCALES_FILE).open("wb") if dtype == "int8" else nullcontext() as sf,
+    ):
+
+        def flush() -> None:
+            nonlocal dim
+            vectors = _normalize(np.array(embeddings.embed_documents([d.page_content for d in batch])))
+            dim = vectors.shape[1]
+            quantized, scales = _quantize(vectors, dtype)
+            quantized.tofile(vf)
+            if sf and scales is not None:
+                scales.tofile(sf)
+            for doc in batch:
+                line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False)
+                offsets.append(offsets[-1] + df.write((line + "\n").encode("utf-8")))
+            logger.debug("{} documents embedded", len(offsets) - 1)
+            batch.clear()
+
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    count = len(offsets) - 1
+    np.save(index_dir / DOC_OFFSETS_FILE, np.array(offsets, dtype=np.int64))
+    meta = AnnIndexMeta(embeddings_id=embeddings_id, dim=dim, count=count, dtype=dtype, collapsed=collapsed)
+
+    if ivf_lists and count > ivf_lists:
+        matrix = np.memmap(index_dir / VECTORS_FILE, dtype=np.dtype(dtype), mode="r", shape=(count, dim))
+        scales = np.fromfile(index_dir / SCALES_FILE, dtype=np.float32) if dtype == "int8" else None
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(count, size=min(count, 256 * ivf_lists), replace=False))
+        centroids = _spherical_kmeans(
+            _dequantize(matrix[sample_ids], None if scales is None else scales[sample_ids]), ivf_lists
+        )
+        assign = np.concatenate(
+            [
+                np.argmax(
+                    _dequantize(matrix[i : i + BLOCK_ROWS], None if scales is None else scales[i : i + BLOCK_ROWS])
+                    @ centroids.T,
+                    axis=1,
+                )
+                for i in range(0, count, BLOCK_ROWS)
+            ]
+        )
+        order = np.argsort(assign, kind="stable")
+        list_offsets = np.searchsorted(assign[order], np.arange(ivf_lists + 1))
+        np.save(index_dir / IVF_CENTROIDS_FILE, centroids)
+        np.save(index_dir / IVF_ORDER_FILE, order.astype(np.int64))
+        np.save(index_dir / IVF_OFFSETS_FILE, list_offsets.astype(np.int64))
+        meta.ivf_lists = ivf_lists
+
+    (index_dir / META_FILE).write_text(meta.model_dump_json())  # written last : an index without meta is incomplete
+    return meta
+
+
+class AnnIndex:
+    """Read-only access to an index built by 'build_ann_index'."""
+
+    def __init__(self, index_dir: Path) -> None:
+        self.meta = AnnIndexMeta.model_validate_json((index_dir / META_FILE).read_text())
+        m = self.meta
+        if m.count:
+            self.matrix = np.memmap(index_dir / VECTORS_FILE, dtype=np.dtype(m.dtype), mode="r", shape=(m.count, m.dim))
+        else:  # an empty file can't be memory-mapped
+            self.matrix = np.zeros((0, m.dim), dtype=np.dtype(m.dtype))
+        self.scales: np.ndarray | None = None
+        if m.count and (index_dir / SCALES_FILE).exists():
+            self.scales = np.memmap(index_dir / SCALES_FILE, dtype=np.float32, mode="r", shape=(m.count,))
+        self.doc_offsets = np.load(index_dir / DOC_OFFSETS_FILE, mmap_mode="r")
+        with (index_dir / DOCS_FILE).open("rb") as f:  # the mapping stays valid after the file is closed
+            self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if m.count else b""
+        if m.ivf_lists:
+            self.centroids = np.load(index_dir / IVF_CENTROIDS_FILE)
+            self.ivf_order = np.load(index_dir / IVF_ORDER_FILE, mmap_mode="r")
+            self.ivf_offsets = np.load(index_dir / IVF_OFFSETS_FILE)
+
+    def _vectors(self, rows: slice | np.ndarray) -> np.ndarray:
+        """Dequantized rows of the matrix."""
+        return _dequantize(self.matrix[rows], None if self.scales is None else self.scales[rows])
+
+    def document(self, row: int) -> Document:
+        start, end = int(self.doc_offsets[row]), int(self.doc_offsets[row + 1])
+        return Document(**json.loads(self._docs[start:end]))
+
+    def _search_exact(
+        self, queries: np.ndarray, k: int, rows: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.meta.count if rows is None else len(rows), BLOCK_ROWS):
+            if rows is None:
+                block_ids = np.arange(start, min(start + BLOCK_ROWS, self.meta.count))
+                block = self._vectors(slice(start, start + BLOCK_ROWS))
+            else:
+                block_ids = np.asarray(rows[start : start + BLOCK_ROWS], dtype=np.int64)
+                block = self._vectors(block_ids)
+            scores = queries @ block.T
+            ids = np.broadcast_to(block_ids, scores.shape)
+            scores, ids = _top_k(np.hstack([best_scores, scores]), np.hstack([best_ids, ids]), k)
+            best_scores, best_ids = scores, ids
+        return best_scores, best_ids
+
+    def _search_ivf(self, query: np.ndarray, k: int, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]
+        rows = np.sort(np.concatenate([self.ivf_order[self.ivf_offsets[c] : self.ivf_offsets[c + 1]] for c in lists]))
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        scores = self._vectors(rows) @ query
+        best_scores, best_ids = _top_k(scores[None, :], rows[None, :], k)
+        return best_scores[0], best_ids[0]
+
+    def search(
+        self, queries: np.ndarray, k: int, nprobe: int = 0, rows: np.ndarray | None = None
+    ) -> list[list[tuple[int, float]]]:
+        """Search a batch of query vectors. Return, for each, the (row, cosine similarity) of the 'k' best rows.
+
+        If 'rows' is given, search is exact and restricted to these rows.  Otherwise, IVF search is used if the
+        index has one and 'nprobe' > 0.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        if self.meta.count == 0:
+            return [[] for _ in queries]
+        if self.meta.ivf_lists and nprobe > 0 and rows is None:
+            results = [self._search_ivf(q, k, nprobe) for q in queries]
+        else:
+            scores, ids = self._search_exact(queries, k, rows)
+            results = list(zip(scores, ids, strict=True))
+        return [[(int(i), float(s)) for s, i in zip(sc, ids, strict=True)] for sc, ids in results]
+
+
+class MmapVectorStore(VectorStore):
+    """LangChain read-only VectorStore over an 'AnnIndex'."""
+
+    def __init__(self, index_dir: Path, embeddings: Embeddings, nprobe: int = 0) -> None:
+        self.index = AnnIndex(index_dir)
+        self._embeddings = embeddings
+        self.nprobe = nprobe
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    @classmethod
+    def from_texts(
+        cls, texts: list[str], embedding: Embeddings, metadatas: list[dict] | None = None, **kwargs: Any
+    ) -> "MmapVectorStore":
+        raise NotImplementedError("read-only index: build it with 'build_ann_index'")
+
+    def add_texts(self, texts: Iterable[str], metadatas: list[dict] | None = None, **kwargs: Any) -> list[str]:
+        raise NotImplementedError("read-only index: build it with 'build_ann_index'")
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: min(1.0, max(0.0, (score + 1.0) / 2.0))  # cosine similarity to [0, 1]
+
+    def search_by_vectors(
+        self, vectors: list[list[float]], k: int = 4, rows: np.ndarray | None = None
+    ) -> list[list[tuple[Document, float]]]:
+        """Batch search, optionally restricted to some rows of the index."""
+        hits = self.index.search(np.array(vectors, dtype=np.float32), k, self.nprobe, rows)
+        return [[(self.index.document(row), score) for row, score in query_hits] for query_hits in hits]
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.search_by_vectors([embedding], k, kwargs.get("rows"))[0]]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> list[tuple[Document, float]]:
+        return self.search_by_vectors([self._embeddings.embed_query(query)], k, kwargs.get("rows"))[0]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
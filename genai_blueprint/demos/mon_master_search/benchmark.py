@@ -0,0 +1,201 @@
+"""Latency and relevance benchmark of mon_master search.
+
+Run the example queries (and optionally a file of judged queries) in Vector, Keyword and Hybrid modes, and
+report as JSON:
+- index load (or build) time, of the BM25 index and of the vector index
+- cold (first pass) and warm (next passes) latency percentiles
+- recall@k and MRR, for judged queries, on the k first hits before deduplication (the page shows one hit per
+  formation and establishment, which would hide relevant parcours of a formation already shown)
+- peak RSS of the process
+
+Judged queries are in a JSONL file, one '{"query": "...", "relevant": ["<source>", ...]}' per line, where
+sources are the 'metadata["source"]' (INM) of relevant documents.
+
+Vector searches use the configured vector store or, with '--embeddings', the namespace (memory-mapped index) of
+that model.  With '--rebuild-bm25' and '--rebuild-vector', the index is built in a temporary directory, to time it
+without replacing the one used by the application (the vector index build embeds the whole corpus).
+
+Example:
+    uv run python -m genai_blueprint.demos.mon_master_search.benchmark --judged judged.jsonl --out bench.json
+"""
+
+# cSpell: disable
+
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Annotated, TypeVar
+
+import numpy as np
+import typer
+from loguru import logger
+from pydantic import BaseModel
+
+app = typer.Typer()
+
+T = TypeVar("T")
+
+LOCAL_PROVIDERS = {"local", "huggingface", "ollama", "fake"}  # suffix of the ids of models not calling a remote API
+
+
+class JudgedQuery(BaseModel):
+    query: str
+    relevant: list[str] = []
+
+
+class LatencyStats(BaseModel):
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class RunReport(BaseModel):
+    cold: LatencyStats
+    warm: LatencyStats | None = None
+    recall_at_k: float | None = None
+    mrr: float | None = None
+
+
+def latency_stats(durations: list[float]) -> LatencyStats:
+    ms = np.array(durations) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return LatencyStats(
+        count=len(ms), mean_ms=float(ms.mean()), p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99)
+    )
+
+
+def relevance(results: list[list[str]], judged: list[JudgedQuery]) -> tuple[float, float]:
+    """Mean recall@k and MRR, over queries having relevant documents."""
+    recalls, reciprocal_ranks = [], []
+    for found, j in zip(results, judged, strict=True):
+        if not j.relevant:
+            continue
+        relevant = set(j.relevant)
+        recalls.append(len(relevant.intersection(found)) / len(relevant))
+        rank = next((i for i, source in enumerate(found, start=1) if source in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    if not recalls:
+        return 0.0, 0.0
+    return float(np.mean(recalls)), float(np.mean(reciprocal_ranks))
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB on Linux
+
+
+def _timed(fn: Callable[..., T], *args, **kwargs) -> tuple[float, T]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+@app.command()
+def run(
+    judged: Annotated[Path | None, typer.Option(help="JSONL file of judged queries")] = None,
+    k: int = 20,
+    ratios: Annotated[
+        list[int] | None, typer.Option(help="hybrid ratios (vector weight, in percent) [default: 30 50 70]")
+    ] = None,
+    warm_passes: int = 3,
+    embeddings: Annotated[
+        str | None, typer.Option(help="embeddings model whose namespace is searched (default: the vector store)")
+    ] = None,
+    rebuild_bm25: bool = typer.Option(False, help="time a full BM25 index build instead of a load"),
+    rebuild_vector: bool = typer.Option(False, help="time a full vector index build (in a temporary directory)"),
+    offline: bool = typer.Option(True, help="forbid model downloads from Hugging Face hub, and remote models"),
+    out: Annotated[Path | None, typer.Option(help="JSON report file (default: stdout)")] = None,
+) -> None:
+    from genai_tk.utils.config_mngr import global_config
+
+    embeddings_id = embeddings or global_config().get_str("embeddings.models.default")
+    if offline and embeddings_id.rsplit("_", 1)[-1] not in LOCAL_PROVIDERS:
+        raise typer.BadParameter(f"'{embeddings_id}' is a remote model: use '--no-offline'", param_hint="--embeddings")
+    if offline:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    # imported here so environment is set before models are loaded
+    from genai_tk.core.embeddings_factory import get_embeddings
+
+    from genai_blueprint.demos.mon_master_search import search as master_search
+    from genai_blueprint.demos.mon_master_search.ann_index import build_ann_index
+    from genai_blueprint.demos.mon_master_search.bm25_index import build_bm25_index
+    from genai_blueprint.demos.mon_master_search.loader import FILES, iter_documents_jsonl
+    from genai_blueprint.demos.mon_master_search.model_subset import EXAMPLE_QUERIES
+    from genai_blueprint.demos.mon_master_search.search import SearchMode
+
+    queries = [JudgedQuery(query=q) for q in EXAMPLE_QUERIES]
+    if judged:
+        with judged.open(encoding="utf-8") as f:
+            queries += [JudgedQuery.model_validate_json(line) for line in f if line.strip()]
+
+    index: dict[str, float] = {}
+    if rebuild_bm25:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index["bm25_build_s"], _ = _timed(build_bm25_index, FILES, Path(tmp_dir) / "bm25")
+    index["bm25_load_s"], _ = _timed(master_search.get_bm25_retriever)
+    if rebuild_vector:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model = get_embeddings(embeddings=embeddings_id)
+            docs = iter_documents_jsonl(FILES)
+            index["vector_build_s"], _ = _timed(build_ann_index, docs, model, embeddings_id, Path(tmp_dir))
+    index["vector_load_s"], _ = _timed(master_search.get_sparse_retriever, embeddings)
+
+    ratios = ratios or [30, 50, 70]
+    runs = [(SearchMode.VECTOR, 0), (SearchMode.KEYWORD, 0)] + [(SearchMode.HYBRID, r) for r in ratios]
+    reports: dict[str, RunReport] = {}
+    for mode, ratio in runs:
+        name = master_search.run_name(mode, ratio)
+        logger.info("benchmark {}", name)
+        retriever = master_search.get_retriever(mode, ratio, embeddings_id=embeddings)
+
+        passes: list[list[float]] = []
+        for _ in range(1 + warm_passes):
+            durations = []
+            for q in queries:
+                duration, _ = _timed(master_search.retrieve_unique, retriever, "query : " + q.query, limit=k)
+                durations.append(duration)
+            passes.append(durations)
+
+        report = RunReport(
+            cold=latency_stats(passes[0]),
+            warm=latency_stats([d for p in passes[1:] for d in p]) if warm_passes else None,
+        )
+        if judged:
+            found = [
+                [doc.metadata.get("source") for doc in master_search.invoke_with_k(retriever, "query : " + q.query, k)]
+                for q in queries
+            ]
+            report.recall_at_k, report.mrr = relevance(found, queries)  # type: ignore
+        reports[name] = report
+
+    result = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "corpus_version": master_search.index_version(),
+        "queries": len(queries),
+        "judged_queries": sum(1 for q in queries if q.relevant),
+        "k": k,
+        "embeddings": embeddings_id,
+        "index": index,
+        "runs": {name: r.model_dump() for name, r in reports.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if out:
+        out.write_text(text, encoding="utf-8")
+        logger.info("benchmark report written to {}", out)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,157 @@
+"""Persisted BM25 index for keyword search over the masters corpus.
+
+The index is built offline (see 'loader.py create-bm25-index') and stamped with the hash of the source JSONL
+file, of the stop-word list and the preprocessing version.  At load time, it is rebuilt only if one of them
+changed.  Texts are preprocessed by 'text_preprocess.SpacyPreprocessor', in batches and with a token cache.
+"""
+
+# cSpell: disable
+
+import hashlib
+import importlib.util
+import json
+import shutil
+import tempfile
+import uuid
+from functools import cache
+from pathlib import Path
+
+from genai_tk.extra.retrievers.bm25s_retriever import BM25FastRetriever
+from genai_tk.utils.config_mngr import global_config
+from loguru import logger
+from pydantic import BaseModel
+
+from genai_blueprint.demos.mon_master_search.ann_index import replace_dir
+from genai_blueprint.demos.mon_master_search.model_subset import STOP_WORDS
+from genai_blueprint.demos.mon_master_search.text_preprocess import PREPROCESS_VERSION, SpacyPreprocessor
+
+SPACY_MODEL = "fr_core_news_sm"
+STAMP_FILE = "index_stamp.json"
+TOKEN_CACHE_FILE = "mon_master_tokens.db"
+
+
+class IndexStamp(BaseModel):
+    source_size: int
+    source_mtime_ns: int
+    source_sha256: str
+    stop_words_sha256: str
+    preprocess_version: str = ""
+
+
+def bm25_index_dir() -> Path:
+    return Path(global_config().get_str("vector_store.path")) / "bm25"
+
+
+@cache
+def get_preprocessor(stop_words: tuple[str, ...] = tuple(STOP_WORDS)) -> SpacyPreprocessor:
+    """Text preprocessor of the BM25 index, shared by index build and search."""
+    token_cache = Path(global_config().get_str("vector_store.path")) / TOKEN_CACHE_FILE
+    return SpacyPreprocessor(SPACY_MODEL, stop_words, cache_file=token_cache)
+
+
+def spacy_model_available(model: str = SPACY_MODEL) -> bool:
+    """Check that spaCy and the given model are installed, without loading them."""
+    if importlib.util.find_spec("spacy") is None:
+        return False
+    import spacy.util
+
+    return spacy.util.is_package(model)
+
+
+def file_sha256(file: Path) -> str:
+    h = hashlib.sha256()
+    with file.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_stamp(index_dir: Path) -> IndexStamp | None:
+    try:
+        return IndexStamp.model_validate_json((index_dir / STAMP_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def compute_stamp(source: Path, stop_words: list[str], previous: IndexStamp | None = None) -> IndexStamp:
+    """Compute the stamp of an index.  The source file is re-hashed only if its size or mtime changed."""
+    stat = source.stat()
+    if previous and (previous.source_size, previous.source_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        source_sha = previous.source_sha256
+    else:
+        source_sha = file_sha256(source)
+    return IndexStamp(
+        source_size=stat.st_size,
+        source_mtime_ns=stat.st_mtime_ns,
+        source_sha256=source_sha,
+        stop_words_sha256=hashlib.sha256(json.dumps(sorted(stop_words)).encode()).hexdigest(),
+    )
+
+
+def _bm25_stamp(source: Path, stop_words: list[str], previous: IndexStamp | None = None) -> IndexStamp:
+    stamp = compute_stamp(source, stop_words, previous)
+    stamp.preprocess_version = f"{SPACY_MODEL}-{PREPROCESS_VERSION}"
+    return stamp
+
+
+def _same_content(a: IndexStamp, b: IndexStamp) -> bool:
+    return (a.source_sha256, a.stop_words_sha256, a.preprocess_version) == (
+        b.source_sha256,
+        b.stop_words_sha256,
+        b.preprocess_version,
+    )
+
+
+def build_bm25_index(
+    source: Path,
+    index_dir: Path | None = None,
+    stop_words: list[str] = STOP_WORDS,
+    k: int = 20,
+    workers: int = 1,
+) -> BM25FastRetriever:
+    """Build the BM25 index of the documents in the given JSONL file, and stamp it.
+
+    Texts are preprocessed beforehand in batches, by 'workers' processes, using the token cache.  The index is
+    written in a temporary directory next to 'index_dir', which then replaces it: processes (ex: Streamlit
+    workers) rebuilding it at the same time don't write in the same files.
+    """
+    index_dir = index_dir or bm25_index_dir()
+    stamp = _bm25_stamp(source, stop_words)
+    index_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=index_dir.parent, prefix=f".{index_dir.name}.tmp."))
+
+    from genai_blueprint.demos.mon_master_search.doc_store import iter_documents
+
+    logger.info("create BM25 index in {}", index_dir)
+    try:
+        docs = list(iter_documents(source))  # the BM25 retriever keeps the documents
+        fn = get_preprocessor(tuple(stop_words))
+        fn.preprocess_many([doc.page_content for doc in docs], n_process=workers)
+        retriever = BM25FastRetriever.from_documents(documents=docs, preprocess_func=fn, k=k, cache_dir=tmp_dir)
+        fn.clear_memo()
+        (tmp_dir / STAMP_FILE).write_text(stamp.model_dump_json())  # written last: a partial build has no stamp
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    replace_dir(tmp_dir, index_dir)
+    return retriever
+
+
+def load_bm25_index(
+    source: Path, index_dir: Path | None = None, stop_words: list[str] = STOP_WORDS, k: int = 20
+) -> BM25FastRetriever:
+    """Load the prebuilt BM25 index, or rebuild it if it's missing or outdated."""
+    index_dir = index_dir or bm25_index_dir()
+    previous = _read_stamp(index_dir)
+    current = _bm25_stamp(source, stop_words, previous)
+    if previous is None or not _same_content(previous, current):
+        logger.info("BM25 index missing or outdated - rebuild it")
+        return build_bm25_index(source, index_dir, stop_words, k)
+    if previous != current:  # same content, but file touched : avoid re-hashing it next time
+        tmp_file = index_dir / f"{STAMP_FILE}.{uuid.uuid4().hex}.tmp"
+        tmp_file.write_text(current.model_dump_json())
+        tmp_file.replace(index_dir / STAMP_FILE)
+
+    fn = get_preprocessor(tuple(stop_words))
+    logger.info("load BM25 index from {}", index_dir)
+    return BM25FastRetriever.from_cache(preprocess_func=fn, k=k, cache_dir=index_dir)
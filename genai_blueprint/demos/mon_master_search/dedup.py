@@ -0,0 +1,198 @@
+"""Near-duplicate grouping of the masters corpus documents.
+
+Many documents differ only by their establishment: same national master title, and near identical parcours and
+disciplines.  They are grouped with MinHash signatures over word shingles and LSH banding, among documents having
+the same title.  The first document (row) of each group is its representative: only representatives need to be
+embedded, and search results are expanded back to all the group members.
+
+Groups are computed offline (see 'loader.py create-duplicate-groups') and stamped with the corpus hash.  Members
+are read from the document store (see 'doc_store.py'), without loading the corpus.
+"""
+
+# cSpell: disable
+
+import re
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.documents import Document
+from loguru import logger
+from unidecode import unidecode
+
+from genai_blueprint.demos.mon_master_search.bm25_index import IndexStamp, compute_stamp
+from genai_blueprint.demos.mon_master_search.doc_store import DocumentStore, iter_documents, load_document_store
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows : pairs with a Jaccard similarity above ~0.75 are likely candidates
+SIMILARITY_THRESHOLD = 0.85
+SHINGLE_SIZE = 3
+GROUPS_FILE = "mon_master_duplicates.npz"
+
+_PRIME = 4294967311  # > 2**32, so (a * x + b) does not overflow uint64 for 32 bits a, b and x
+
+
+def duplicate_groups_file() -> Path:
+    return Path(global_config().get_str("vector_store.path")) / GROUPS_FILE
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """CRC32 hashes of the word n-grams of a normalized text."""
+    words = re.findall(r"\w+", unidecode(text).lower())
+    grams = [" ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1))]
+    return np.unique(np.array([zlib.crc32(g.encode()) for g in grams], dtype=np.uint64))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**32, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, 2**32, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text)[None, :]
+        return ((self.a * hashes + self.b) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = np.arange(n)
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return int(i)
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)  # root is the smallest row
+
+
+def near_duplicate_groups(
+    docs: Iterable[Document], threshold: float = SIMILARITY_THRESHOLD, bands: int = BANDS
+) -> np.ndarray:
+    """Group near-duplicate documents.  Return, for each document, the row of its group representative."""
+    hasher = MinHasher()
+    titles, signatures = [], []
+    for doc in docs:
+        titles.append(doc.metadata.get("for_intitule", ""))
+        signatures.append(hasher.signature(doc.page_content))
+    uf = _UnionFind(len(signatures))
+    if not signatures:
+        return uf.parent.astype(np.int32)
+    sigs = np.stack(signatures)
+    band_size = sigs.shape[1] // bands
+
+    # identical signatures are grouped first, so LSH buckets stay small
+    distinct: dict[tuple[str, bytes], int] = {}
+    for row, (title, sig) in enumerate(zip(titles, sigs, strict=True)):
+        first = distinct.setdefault((title, sig.tobytes()), row)
+        if first != row:
+            uf.union(first, row)
+
+    buckets: dict[tuple[str, int, bytes], list[int]] = defaultdict(list)
+    for row in distinct.values():
+        for band in range(bands):
+            buckets[(titles[row], band, sigs[row, band * band_size : (band + 1) * band_size].tobytes())].append(row)
+
+    for rows in buckets.values():
+        if len(rows) < 2:
+            continue
+        bucket = sigs[rows]
+        similarity = (bucket[:, None, :] == bucket[None, :, :]).mean(axis=2)
+        for i, j in zip(*np.nonzero(np.triu(similarity >= threshold, k=1)), strict=True):
+            uf.union(rows[i], rows[j])
+    return np.array([uf.find(i) for i in range(len(signatures))], dtype=np.int32)
+
+
+class DuplicateGroups:
+    """Near-duplicate groups of the corpus, with access to the member documents."""
+
+    def __init__(self, store: DocumentStore, group_of: np.ndarray) -> None:
+        self.store = store
+        self.group_of = group_of
+        self._order = np.argsort(group_of, kind="stable")
+        self._sorted_groups = group_of[self._order]
+
+    @property
+    def representatives(self) -> np.ndarray:
+        return np.flatnonzero(self.group_of == np.arange(len(self.group_of)))
+
+    def members(self, representative: int) -> np.ndarray:
+        start, end = np.searchsorted(self._sorted_groups, [representative, representative + 1])
+        return self._order[start:end]
+
+    def representatives_of(self, rows: np.ndarray) -> np.ndarray:
+        return np.unique(self.group_of[rows])
+
+    def collapse(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """Yield the representatives of the corpus documents, with their row and group size in metadata."""
+        for row, doc in enumerate(docs):
+            if self.group_of[row] == row:
+                meta = doc.metadata | {"row": row, "duplicates": len(self.members(row))}
+                yield Document(id=doc.id, page_content=doc.page_content, metadata=meta)
+
+    def expand(self, docs: Iterable[Document], rows: np.ndarray | None = None) -> list[Document]:
+        """Replace representatives (documents with a 'row' metadata) by the members of their group, in place.
+
+        If 'rows' is given, only members in it are kept.
+        """
+        result = []
+        for doc in docs:
+            row = doc.metadata.get("row")
+            if row is None:
+                result.append(doc)
+                continue
+            members = self.members(row)
+            if rows is not None:
+                members = members[np.isin(members, rows)]
+            for member in members:
+                result.append(doc if member == row else self.store.document(member))
+        return result
+
+    def save(self, file: Path, stamp: IndexStamp) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file.with_name(file.name + ".tmp.npz")
+        np.savez(tmp_file, group_of=self.group_of, stamp=np.array(stamp.model_dump_json()))
+        tmp_file.replace(file)
+
+    @classmethod
+    def load(cls, store: DocumentStore, file: Path) -> tuple["DuplicateGroups", IndexStamp]:
+        with np.load(file) as data:
+            groups = cls(store, data["group_of"])
+            return groups, IndexStamp.model_validate_json(str(data["stamp"]))
+
+
+def build_duplicate_groups(
+    source: Path, file: Path | None = None, threshold: float = SIMILARITY_THRESHOLD, store: DocumentStore | None = None
+) -> DuplicateGroups:
+    """Group the near-duplicate documents of the given JSONL file, and save the groups."""
+    file = file or duplicate_groups_file()
+    stamp = compute_stamp(source, [])
+    group_of = near_duplicate_groups(iter_documents(source), threshold)
+    groups = DuplicateGroups(store or load_document_store(source), group_of)
+    groups.save(file, stamp)
+    logger.info("{} documents in {} groups of near-duplicates", len(groups.group_of), len(groups.representatives))
+    return groups
+
+
+def load_duplicate_groups(
+    source: Path, file: Path | None = None, store: DocumentStore | None = None
+) -> DuplicateGroups:
+    """Load the near-duplicate groups, or rebuild them if they're missing or outdated."""
+    file = file or duplicate_groups_file()
+    store = store or load_document_store(source)
+    try:
+        groups, previous = DuplicateGroups.load(store, file)
+    except (OSError, ValueError, KeyError):
+        logger.info("near-duplicate groups missing or unreadable - build them")
+        return build_duplicate_groups(source, file, store=store)
+    if compute_stamp(source, [], previous).source_sha256 != previous.source_sha256:
+        logger.info("near-duplicate groups outdated - rebuild them")
+        return build_duplicate_groups(source, file, store=store)
+    return groups
@@ -0,0 +1,242 @@
+"""Document store over the masters corpus JSONL file, with random access by row or by source.
+
+A sidecar index ('<file>.idx.npz') holds the position of each document (non-empty line) and the rows sorted by
+'metadata["source"]', so single documents are read from a memory-mapped file without parsing the others:
+retrieval paths can keep rows or sources, and hydrate only the documents they show.  Iteration streams the file.
+
+The file can be compressed with zstd ('.zst' suffix, needs the 'zstandard' package): it's then written as a
+sequence of independent frames of FRAME_ROWS documents, so a random access decompresses only one frame.
+
+The sidecar index is stamped with the file hash, and rebuilt when the file changes.
+"""
+
+# cSpell: disable
+
+import json
+import mmap
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+from genai_blueprint.demos.mon_master_search.bm25_index import IndexStamp, compute_stamp
+
+FRAME_ROWS = 256
+INDEX_SUFFIX = ".idx.npz"
+CACHED_FRAMES = 8
+
+
+def _zstd() -> Any:
+    try:
+        import zstandard
+    except ImportError as ex:
+        raise ImportError("zstd compressed corpus requires the 'zstandard' package") from ex
+    return zstandard
+
+
+def is_compressed(file: Path) -> bool:
+    return file.suffix == ".zst"
+
+
+def index_file(file: Path) -> Path:
+    return file.with_name(file.name + INDEX_SUFFIX)
+
+
+def _frames(file: Path) -> Iterator[tuple[int, bytes | mmap.mmap]]:
+    """Yield the position in the file and the content of each frame (the whole file if not compressed)."""
+    if not is_compressed(file):
+        if file.stat().st_size:
+            with file.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield 0, data
+        return
+    decompressor = _zstd().ZstdDecompressor()
+    with file.open("rb") as f:
+        position = 0
+        while True:
+            frame, chunks, fed = decompressor.decompressobj(), [], 0
+            f.seek(position)
+            while not frame.eof:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    if fed == 0:
+                        return
+                    raise ValueError(f"truncated zstd frame at {position} in {file}")
+                fed += len(chunk)
+                chunks.append(frame.decompress(chunk))
+            yield position, b"".join(chunks)
+            position += fed - len(frame.unused_data)
+
+
+def _lines(data: bytes | mmap.mmap) -> Iterator[tuple[int, int]]:
+    """Start and end positions of the non-empty lines."""
+    start, size = 0, len(data)
+    while start < size:
+        end = data.find(b"\n", start)
+        end = size if end < 0 else end
+        if data[start:end].strip():
+            yield start, end
+        start = end + 1
+
+
+def iter_documents(file: Path) -> Iterator[Document]:
+    """Stream the Documents of a (possibly compressed) JSONL file."""
+    for _, data in _frames(file):
+        for start, end in _lines(data):
+            yield Document.model_validate_json(data[start:end])
+
+
+def write_documents(docs: Iterable[Document], file: Path, level: int = 3) -> int:
+    """Write Documents to a JSONL file, compressed if its suffix is '.zst', and return their count.
+
+    Written to a temporary file first, so readers never see a partially written corpus.
+    """
+    tmp_file = file.with_name(file.name + ".tmp")
+    count = 0
+    with tmp_file.open("wb") as f:
+        compressor = _zstd().ZstdCompressor(level=level) if is_compressed(file) else None
+        block: list[bytes] = []
+        for doc in docs:
+            line = doc.model_dump_json().encode("utf-8") + b"\n"
+            count += 1
+            if compressor is None:
+                f.write(line)
+                continue
+            block.append(line)
+            if len(block) == FRAME_ROWS:
+                f.write(compressor.compress(b"".join(block)))
+                block.clear()
+        if compressor and block:
+            f.write(compressor.compress(b"".join(block)))
+    tmp_file.replace(file)
+    return count
+
+
+class DocumentStore:
+    """Random access to the documents of a JSONL file, by row (position of the document) or by source."""
+
+    def __init__(
+        self,
+        file: Path,
+        frame_offsets: np.ndarray,
+        row_frames: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        sources: np.ndarray,
+    ) -> None:
+        self.file = file
+        self.frame_offsets, self.row_frames, self.starts, self.ends = frame_offsets, row_frames, starts, ends
+        self._source_order = np.argsort(sources, kind="stable")
+        self._sorted_sources = sources[self._source_order]
+        self._frames: OrderedDict[int, bytes] = OrderedDict()
+        self._frames_lock = threading.Lock()
+        self._data: Any = b""
+        if not is_compressed(file) and len(starts):
+            with file.open("rb") as f:  # the mapping stays valid after the file is closed
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def scan(cls, file: Path) -> "DocumentStore":
+        """Index the documents of a file."""
+        frame_offsets, row_frames, starts, ends, sources = [], [], [], [], []
+        for frame, (offset, data) in enumerate(_frames(file)):
+            frame_offsets.append(offset)
+            for start, end in _lines(data):
+                row_frames.append(frame)
+                starts.append(start)
+                ends.append(end)
+                sources.append(json.loads(data[start:end]).get("metadata", {}).get("source") or "")
+        frame_offsets.append(file.stat().st_size)
+        return cls(
+            file,
+            np.array(frame_offsets, dtype=np.int64),
+            np.array(row_frames, dtype=np.int32),
+            np.array(starts, dtype=np.int64),
+            np.array(ends, dtype=np.int64),
+            np.array(sources, dtype=np.str_),
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Document]:
+        return iter_documents(self.file)
+
+    def _frame(self, frame: int) -> bytes:
+        """Decompressed frame, from a small LRU cache."""
+        with self._frames_lock:
+            if frame in self._frames:
+                self._frames.move_to_end(frame)
+                return self._frames[frame]
+        with self.file.open("rb") as f:
+            f.seek(int(self.frame_offsets[frame]))
+            compressed = f.read(int(self.frame_offsets[frame + 1] - self.frame_offsets[frame]))
+        data = _zstd().ZstdDecompressor().decompress(compressed)
+        with self._frames_lock:
+            self._frames[frame] = data
+            if len(self._frames) > CACHED_FRAMES:
+                self._frames.popitem(last=False)
+        return data
+
+    def document(self, row: int) -> Document:
+        data = self._frame(int(self.row_frames[row])) if is_compressed(self.file) else self._data
+        return Document.model_validate_json(data[int(self.starts[row]) : int(self.ends[row])])
+
+    def documents(self, rows: Iterable[int]) -> list[Document]:
+        return [self.document(row) for row in rows]
+
+    def rows_of(self, source: str) -> np.ndarray:
+        """Rows of the documents having the given source."""
+        start = np.searchsorted(self._sorted_sources, source, side="left")
+        end = np.searchsorted(self._sorted_sources, source, side="right")
+        return np.sort(self._source_order[start:end])
+
+    def get(self, source: str) -> Document | None:
+        """First document having the given source, or None."""
+        rows = self.rows_of(source)
+        return self.document(int(rows[0])) if len(rows) else None
+
+    def save(self, file: Path, stamp: IndexStamp) -> None:
+        tmp_file = file.with_name(file.name + ".tmp.npz")
+        np.savez(
+            tmp_file,
+            frame_offsets=self.frame_offsets,
+            row_frames=self.row_frames,
+            starts=self.starts,
+            ends=self.ends,
+            sources=self._sorted_sources[np.argsort(self._source_order)],
+            stamp=np.array(stamp.model_dump_json()),
+        )
+        tmp_file.replace(file)
+
+    @classmethod
+    def load(cls, file: Path, index: Path) -> tuple["DocumentStore", IndexStamp]:
+        with np.load(index) as data:
+            store = cls(file, data["frame_offsets"], data["row_frames"], data["starts"], data["ends"], data["sources"])
+            return store, IndexStamp.model_validate_json(str(data["stamp"]))
+
+
+def build_document_store(file: Path) -> DocumentStore:
+    """Index the documents of a JSONL file, and save the sidecar index."""
+    stamp = compute_stamp(file, [])
+    store = DocumentStore.scan(file)
+    store.save(index_file(file), stamp)
+    logger.info("document store index of {} documents written in {}", len(store), index_file(file))
+    return store
+
+
+def load_document_store(file: Path) -> DocumentStore:
+    """Load the document store of a JSONL file, or rebuild its index if it's missing or outdated."""
+    try:
+        store, previous = DocumentStore.load(file, index_file(file))
+    except (OSError, ValueError, KeyError):
+        logger.info("document store index missing or unreadable - build it")
+        return build_document_store(file)
+    if compute_stamp(file, [], previous).source_sha256 != previous.source_sha256:
+        logger.info("document store index outdated - rebuild it")
+        return build_document_store(file)
+    return store
@@ -0,0 +1,205 @@
+"""Inverted index over the facet metadata of the masters corpus.
+
+Each value of the facet fields is mapped to the rows (position in the corpus JSONL file) of the documents having
+it.  The index gives facet counts, and the documents matching filters, so searches can be restricted to them
+before scoring instead of over-fetching and filtering the results.
+
+Like the BM25 index, it's built offline (see 'loader.py create-facet-index') and stamped with the corpus hash.
+"""
+
+# cSpell: disable
+
+import json
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import InMemoryVectorStore, VectorStore
+from loguru import logger
+from pydantic import ConfigDict
+
+from genai_blueprint.demos.mon_master_search.ann_index import MmapVectorStore
+from genai_blueprint.demos.mon_master_search.bm25_index import IndexStamp, compute_stamp
+
+FACET_FIELDS = ("eta_uai", "eta_name", "modalite_enseignement", "licences_conseillees")
+MULTI_VALUED_FIELDS = ("modalite_enseignement", "licences_conseillees")  # values joined with ';'
+FACET_FILE = "mon_master_facets.json"
+
+FacetFilters = dict[str, list[str]]
+"""Filters on facet fields.  A document matches if, for each field, it has one of the given values."""
+
+
+def facet_index_file() -> Path:
+    return Path(global_config().get_str("vector_store.path")) / FACET_FILE
+
+
+def facet_values(doc: Document, field: str) -> list[str]:
+    value = doc.metadata.get(field) or ""
+    if field in MULTI_VALUED_FIELDS:
+        return [v for v in value.split(";") if v]
+    return [value] if value else []
+
+
+def matches(doc: Document, filters: FacetFilters) -> bool:
+    return all(set(facet_values(doc, field)) & set(values) for field, values in filters.items() if values)
+
+
+class FacetIndex:
+    """Facet value to document rows postings, with the source of each row."""
+
+    def __init__(self, sources: list[str], postings: dict[str, dict[str, np.ndarray]]) -> None:
+        self.sources = sources
+        self.postings = postings
+
+    @property
+    def count(self) -> int:
+        return len(self.sources)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Document]) -> "FacetIndex":
+        sources = []
+        postings: dict[str, dict[str, list[int]]] = {field: defaultdict(list) for field in FACET_FIELDS}
+        for row, doc in enumerate(docs):
+            sources.append(doc.metadata.get("source", ""))
+            for field in FACET_FIELDS:
+                for value in facet_values(doc, field):
+                    postings[field][value].append(row)
+        return cls(sources, {f: {v: np.array(r, dtype=np.int32) for v, r in p.items()} for f, p in postings.items()})
+
+    def match(self, filters: FacetFilters) -> np.ndarray:
+        """Sorted rows of the documents matching the filters."""
+        rows = None
+        for field, values in filters.items():
+            if not values:
+                continue
+            if field not in self.postings:
+                raise ValueError(f"unknown facet '{field}' - should be in {FACET_FIELDS}")
+            arrays = [self.postings[field][v] for v in values if v in self.postings[field]]
+            field_rows = np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, dtype=np.int32)
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        return np.arange(self.count, dtype=np.int32) if rows is None else rows
+
+    def sources_of(self, rows: np.ndarray) -> set[str]:
+        return {self.sources[row] for row in rows}
+
+    def facet_counts(self, rows: np.ndarray | None = None) -> dict[str, dict[str, int]]:
+        """Number of documents having each facet value, among the given rows (all by default), most frequent first."""
+        mask = None
+        if rows is not None:
+            mask = np.zeros(self.count, dtype=bool)
+            mask[rows] = True
+        result = {}
+        for field, field_postings in self.postings.items():
+            counts = {v: int(mask[r].sum()) if mask is not None else len(r) for v, r in field_postings.items()}
+            result[field] = dict(sorted(((v, c) for v, c in counts.items() if c), key=lambda vc: (-vc[1], vc[0])))
+        return result
+
+    def save(self, file: Path, stamp: IndexStamp) -> None:
+        data = {
+            "stamp": stamp.model_dump(),
+            "sources": self.sources,
+            "postings": {f: {v: r.tolist() for v, r in p.items()} for f, p in self.postings.items()},
+        }
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file.with_name(file.name + ".tmp")
+        tmp_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp_file.replace(file)
+
+    @classmethod
+    def load(cls, file: Path) -> tuple["FacetIndex", IndexStamp]:
+        data = json.loads(file.read_text(encoding="utf-8"))
+        postings = {f: {v: np.array(r, dtype=np.int32) for v, r in p.items()} for f, p in data["postings"].items()}
+        return cls(data["sources"], postings), IndexStamp.model_validate(data["stamp"])
+
+
+def build_facet_index(source: Path, file: Path | None = None) -> FacetIndex:
+    """Build the facet index of the documents in the given JSONL file, and save it."""
+    from genai_blueprint.demos.mon_master_search.loader import iter_documents_jsonl
+
+    file = file or facet_index_file()
+    stamp = compute_stamp(source, [])
+    index = FacetIndex.from_documents(iter_documents_jsonl(source))
+    index.save(file, stamp)
+    logger.info("facet index of {} documents written in {}", index.count, file)
+    return index
+
+
+def load_facet_index(source: Path, file: Path | None = None) -> FacetIndex:
+    """Load the facet index, or rebuild it if it's missing or outdated."""
+    file = file or facet_index_file()
+    try:
+        index, previous = FacetIndex.load(file)
+    except (OSError, ValueError, KeyError):
+        logger.info("facet index missing or unreadable - build it")
+        return build_facet_index(source, file)
+    current = compute_stamp(source, [], previous)
+    if current.source_sha256 != previous.source_sha256:
+        logger.info("facet index outdated - rebuild it")
+        return build_facet_index(source, file)
+    return index
+
+
+def vector_search_kwargs(
+    vectorstore: VectorStore, index: FacetIndex, rows: np.ndarray, representatives: np.ndarray | None = None
+) -> dict[str, Any]:
+    """Vector store search arguments restricting the search to the given rows.
+
+    'representatives' are the (sorted) rows of the documents in the vector store, if it does not hold the whole
+    corpus (see 'dedup.py').
+    """
+    if isinstance(vectorstore, MmapVectorStore):
+        expected = index.count if representatives is None else len(representatives)
+        if vectorstore.index.meta.count != expected:
+            raise ValueError("vector index and facet index are not built from the same corpus - rebuild them")
+        return {"rows": rows if representatives is None else np.searchsorted(representatives, rows)}
+    sources = index.sources_of(rows)
+    if isinstance(vectorstore, InMemoryVectorStore):
+        return {"filter": lambda doc: doc.metadata.get("source") in sources}
+    return {"filter": {"source": {"$in": sorted(sources)}}}  # Chroma and PgVector syntax
+
+
+class PrefilteredKeywordRetriever(BaseRetriever):
+    """BM25 search restricted to given rows of the corpus.
+
+    With a 'bm25s' based retriever ('vectorizer', 'docs' and 'preprocess_func' attributes, as in LangChain
+    'BM25Retriever'), only the rows are ranked.  Otherwise, results are fetched in proportion of the rows
+    selectivity, and filtered.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    keyword: BaseRetriever
+    index: FacetIndex
+    rows: np.ndarray
+    k: int = 20
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        if len(self.rows) == 0:
+            return []
+        vectorizer, docs = getattr(self.keyword, "vectorizer", None), getattr(self.keyword, "docs", None)
+        if vectorizer is None or docs is None or len(docs) != self.index.count:
+            return self._fetch_and_filter(query)
+
+        scores = np.asarray(vectorizer.get_scores(self.keyword.preprocess_func(query)))[self.rows]  # type: ignore
+        k = min(self.k, len(self.rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        hits = []
+        for i in top:
+            if scores[i] > 0:
+                doc = docs[self.rows[i]]
+                metadata = doc.metadata | {"score": float(scores[i])}
+                hits.append(Document(page_content=doc.page_content, metadata=metadata))
+        return hits
+
+    def _fetch_and_filter(self, query: str) -> list[Document]:
+        fetch = min(self.index.count, self.k * self.index.count // len(self.rows) + self.k)
+        sources = self.index.sources_of(self.rows)
+        docs = self.keyword.model_copy(update={"k": fetch}).invoke(query)
+        return [doc for doc in docs if doc.metadata.get("source") in sources][: self.k]
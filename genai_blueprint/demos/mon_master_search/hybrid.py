@@ -0,0 +1,119 @@
+"""Hybrid (keyword + vector) retrieval with score fusion.
+
+Unlike LangChain 'EnsembleRetriever', both searches run concurrently, their raw scores are kept, and the
+keyword / vector ratio is given at fusion time : candidates found once can be re-ranked for any ratio
+without searching again.
+"""
+
+# cSpell: disable
+
+from collections import defaultdict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Literal
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import BaseModel, ConfigDict
+
+FusionMethod = Literal["rrf", "score"]
+RRF_C = 60
+
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid_search")
+
+
+def content_key(doc: Document) -> Hashable:
+    return doc.page_content
+
+
+def weighted_rrf(
+    legs: list[list[Document]], weights: list[float], key: Callable[[Document], Hashable] = content_key, c: int = RRF_C
+) -> list[Document]:
+    """Weighted Reciprocal Rank Fusion of ranked lists, as done by LangChain EnsembleRetriever."""
+    scores: dict[Hashable, float] = defaultdict(float)
+    docs: dict[Hashable, Document] = {}
+    for leg, weight in zip(legs, weights, strict=True):
+        for rank, doc in enumerate(leg, start=1):
+            k = key(doc)
+            scores[k] += weight / (rank + c)
+            docs.setdefault(k, doc)
+    return [docs[k] for k in sorted(scores, key=scores.__getitem__, reverse=True)]
+
+
+def _min_max(hits: list[tuple[Document, float]]) -> list[float]:
+    if not hits:
+        return []
+    scores = [s for _, s in hits]
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(s - low) / (high - low) for s in scores]
+
+
+class HybridCandidates(BaseModel):
+    """Keyword and vector hits of a query, with their raw scores (higher is better), best first."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    keyword: list[tuple[Document, float]]
+    vector: list[tuple[Document, float]]
+
+    def fuse(
+        self, ratio: float, method: FusionMethod = "rrf", key: Callable[[Document], Hashable] = content_key
+    ) -> list[Document]:
+        """Rank the union of both hit lists. 'ratio' is the weight of the vector search, in [0, 1]."""
+        keyword_docs = [doc for doc, _ in self.keyword]
+        vector_docs = [doc for doc, _ in self.vector]
+        if method == "rrf":
+            return weighted_rrf([keyword_docs, vector_docs], [1.0 - ratio, ratio], key=key)
+
+        scores: dict[Hashable, float] = defaultdict(float)
+        docs: dict[Hashable, Document] = {}
+        for leg, hits, weight in ((keyword_docs, self.keyword, 1.0 - ratio), (vector_docs, self.vector, ratio)):
+            seen = set()
+            for doc, score in zip(leg, _min_max(hits), strict=True):
+                k = key(doc)
+                if k in seen:  # hits are sorted : keep the best score of a key
+                    continue
+                seen.add(k)
+                scores[k] += weight * score
+                docs.setdefault(k, doc)
+        return [docs[k] for k in sorted(scores, key=scores.__getitem__, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever combining a keyword retriever and a vector store.
+
+    The keyword retriever should have a 'k' field. If it does not put a score in the documents metadata
+    (key 'score'), a rank-based score is used instead.  'vector_search_kwargs' are passed to the vector store
+    search (ex: a filter).
+    """
+
+    keyword: BaseRetriever
+    vectorstore: VectorStore
+    k: int = 20
+    ratio: float = 0.5
+    method: FusionMethod = "rrf"
+    vector_search_kwargs: dict[str, Any] = {}
+
+    def _keyword_hits(self, query: str, k: int) -> list[tuple[Document, float]]:
+        docs = self.keyword.model_copy(update={"k": k}).invoke(query)
+        return [(doc, float(doc.metadata.get("score", 1.0 / rank))) for rank, doc in enumerate(docs, start=1)]
+
+    def _vector_hits(self, query: str, k: int) -> list[tuple[Document, float]]:
+        try:
+            return self.vectorstore.similarity_search_with_relevance_scores(query, k=k, **self.vector_search_kwargs)
+        except NotImplementedError:  # no relevance function (ex: InMemoryVectorStore) : scores are similarities
+            return self.vectorstore.similarity_search_with_score(query, k=k, **self.vector_search_kwargs)
+
+    def candidates(self, query: str, k: int | None = None) -> HybridCandidates:
+        """Run both searches concurrently, and return their hits."""
+        k = k or self.k
+        keyword = _POOL.submit(self._keyword_hits, query, k)
+        vector = _POOL.submit(self._vector_hits, query, k)
+        return HybridCandidates(keyword=keyword.result(), vector=vector.result())
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return self.candidates(query).fuse(self.ratio, self.method)[: self.k]
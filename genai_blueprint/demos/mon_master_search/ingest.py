@@ -0,0 +1,172 @@
+"""Incremental, batched ingestion of Documents into an embeddings store.
+
+Documents are identified by 'metadata["source"]' and a hash of their content.  Identifiers of documents
+already embedded are kept in a manifest file next to the vector store, one per store and embeddings model, so
+unchanged documents are skipped on the next run.  The manifest is append-only and flushed after each batch : a
+crashed run resumes where it stopped.  A small JSON file next to it describes the store content (ex: whether
+near-duplicates were collapsed).
+"""
+
+# cSpell: disable
+
+import hashlib
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import batched
+from pathlib import Path
+
+from genai_tk.core.embeddings_store import EmbeddingsStore
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.documents import Document
+from loguru import logger
+from pydantic import BaseModel
+
+
+class StoreInfo(BaseModel):
+    collapsed: bool = False  # one document per group of near-duplicates (see 'dedup.py')
+
+
+def manifest_file(store_name: str, embeddings_id: str) -> Path:
+    """Manifest of the corpus documents added to an embeddings store with an embeddings model."""
+    name = f"mon_master_{store_name}_{embeddings_id}.txt"
+    return Path(global_config().get_str("vector_store.path")) / "manifests" / name
+
+
+def save_store_info(manifest_path: Path, info: StoreInfo) -> None:
+    file = manifest_path.with_suffix(".json")
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = file.with_name(file.name + ".tmp")
+    tmp_file.write_text(info.model_dump_json())
+    tmp_file.replace(file)
+
+
+def load_store_info(manifest_path: Path) -> StoreInfo:
+    """Information saved with the manifest, or the defaults if there's none."""
+    file = manifest_path.with_suffix(".json")
+    return StoreInfo.model_validate_json(file.read_text()) if file.exists() else StoreInfo()
+
+
+def doc_key(doc: Document) -> str:
+    """Return a stable identifier made of the document source and a hash of what is embedded (source and content).
+
+    Metadata are not hashed: their serialization may vary between runs without changing the embedding.  The
+    exception is the group metadata of collapsed documents ('row' and 'duplicates', see 'dedup.py'), which search
+    relies on: a representative whose row or group changed is added again, and documents of a store ingested with
+    and without collapsing have different keys.
+    """
+    source = doc.metadata["source"]
+    group = f"\n{doc.metadata['row']}:{doc.metadata['duplicates']}" if "row" in doc.metadata else ""
+    h = hashlib.sha1(f"{source}\n{doc.page_content}{group}".encode())
+    return f"{source}:{h.hexdigest()}"
+
+
+class EmbeddingsManifest:
+    """Append-only set of document keys already added to a vector store."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.keys: set[str] = set()
+        if path.exists():
+            self.keys = {line for line in path.read_text(encoding="utf-8").splitlines() if line}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys
+
+    def record(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.writelines(k + "\n" for k in keys)
+            f.flush()
+            os.fsync(f.fileno())
+        self.keys.update(keys)
+
+    def compact(self, keep: set[str]) -> None:
+        """Keep only the given keys, and rewrite the file."""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("".join(k + "\n" for k in sorted(keep & self.keys)), encoding="utf-8")
+        tmp.replace(self.path)
+        self.keys &= keep
+
+
+class IngestStats(BaseModel):
+    total: int = 0
+    skipped: int = 0
+    added: int = 0
+    failed: int = 0
+    deleted: int = 0
+
+
+class EmbeddingsIngester:
+    """Add Documents to an EmbeddingsStore in batches, skipping those already in the manifest.
+
+    Documents are given their key as 'id', so re-adding a document is an upsert, and stale documents
+    (whose content changed or which disappeared from the corpus) can be deleted from the store.
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingsStore,
+        manifest_path: Path,
+        batch_size: int = 64,
+        max_workers: int = 2,
+    ) -> None:
+        self.store = store
+        self.manifest = EmbeddingsManifest(manifest_path)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def _new_documents(self, docs: Iterable[Document], stats: IngestStats, seen: set[str]) -> Iterator[Document]:
+        for doc in docs:
+            key = doc_key(doc)
+            stats.total += 1
+            if key in seen:
+                stats.skipped += 1
+                continue
+            seen.add(key)
+            if key in self.manifest:
+                stats.skipped += 1
+                continue
+            yield Document(id=key, page_content=doc.page_content, metadata=doc.metadata)
+
+    def _add_batch(self, batch: tuple[Document, ...]) -> list[str]:
+        self.store.add_documents(list(batch))
+        return [doc.id for doc in batch if doc.id]
+
+    def run(self, docs: Iterable[Document], delete_stale: bool = True) -> IngestStats:
+        stats = IngestStats()
+        seen: set[str] = set()
+        pending: dict[Future[list[str]], int] = {}
+
+        def collect(done: set[Future[list[str]]]) -> None:
+            for fut in done:
+                size = pending.pop(fut)
+                try:
+                    keys = fut.result()
+                except Exception as ex:
+                    logger.warning("cannot add batch of {} documents - {}", size, ex)
+                    stats.failed += size
+                    continue
+                self.manifest.record(keys)
+                stats.added += len(keys)
+            logger.info("{} documents added, {} skipped", stats.added, stats.skipped)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in batched(self._new_documents(docs, stats, seen), self.batch_size):
+                if len(pending) >= 2 * self.max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[pool.submit(self._add_batch, batch)] = len(batch)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if delete_stale and stats.failed == 0:
+            stale = self.manifest.keys - seen
+            if stale:
+                logger.info("delete {} stale documents", len(stale))
+                self.store.get().delete(ids=list(stale))
+                stats.deleted = len(stale)
+            self.manifest.compact(keep=seen)
+        return stats
@@ -1,37 +1,52 @@
 # cSpell: disable
 import codecs
 import fnmatch
-import re
+import os
 import tarfile
-from collections.abc import Iterator
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 
 import json_repair
 import pandas as pd
 import typer
 from genai_tk.utils.config_mngr import global_config
-from genai_tk.utils.pydantic_utils.jsonl_store import load_objects_from_jsonl, store_objects_to_jsonl
 
 try:
     from abbreviations import schwartz_hearst
 except ImportError as ex:
     raise ImportError("abbreviations package is required. Install with: uv add abbreviations --group demos") from ex
+from genai_tk.core.embeddings_factory import get_embeddings
 from genai_tk.core.embeddings_store import EmbeddingsStore
 from genai_tk.core.llm_factory import get_llm
 from genai_tk.core.prompts import def_prompt
-from genai_tk.extra.retrievers.bm25s_retriever import BM25FastRetriever, get_spacy_preprocess_fn
 from langchain_community.document_loaders.base import BaseLoader
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from loguru import logger
-from pydantic import BaseModel
-from unidecode import unidecode
-
-from genai_blueprint.demos.mon_master_search.model_subset import (
-    ACRONYMS,
-    STOP_WORDS,
-    ParcoursFormations,
+from pydantic import BaseModel, ValidationError
+
+from genai_blueprint.demos.mon_master_search.acronyms import get_acronym_expander
+from genai_blueprint.demos.mon_master_search.ann_index import build_ann_index
+from genai_blueprint.demos.mon_master_search.bm25_index import build_bm25_index, load_bm25_index
+from genai_blueprint.demos.mon_master_search.dedup import (
+    SIMILARITY_THRESHOLD,
+    build_duplicate_groups,
+    load_duplicate_groups,
+)
+from genai_blueprint.demos.mon_master_search.doc_store import build_document_store, iter_documents, write_documents
+from genai_blueprint.demos.mon_master_search.facets import build_facet_index
+from genai_blueprint.demos.mon_master_search.ingest import (
+    EmbeddingsIngester,
+    StoreInfo,
+    manifest_file,
+    save_store_info,
 )
+from genai_blueprint.demos.mon_master_search.model_manager import mmap_index_dir
+from genai_blueprint.demos.mon_master_search.model_subset import LieuxItem, ParcoursFormations
+from genai_blueprint.demos.mon_master_search.spatial_index import build_spatial_index
+from genai_blueprint.demos.mon_master_search.suggest import build_suggestion_index
 
 app = typer.Typer()
 
@@ -48,22 +63,16 @@ class Description(BaseModel):
     metiers: set[str] = set()
     autre: set[str] = set()
     lien_fiche: set[str] = set()
+    lieux: dict[tuple[str, str, str], LieuxItem] = {}  # missing fields are empty strings in the key
 
-
-REGEXP_ACRONYMS = r"(?<!\()\b[A-Z]{2,}\b(?!\))"
+    def add_lieux(self, lieux: list[LieuxItem] | None) -> None:
+        for lieu in lieux or []:
+            if lieu.site or lieu.ville or lieu.geo:
+                self.lieux.setdefault((lieu.site or "", lieu.ville or "", lieu.geo or ""), lieu)
 
 
 def add_accronym(s: str) -> str:
-    accronyms = re.findall(REGEXP_ACRONYMS, s)
-    result = s
-
-    pairs = schwartz_hearst.extract_abbreviation_definition_pairs(doc_text=s)
-    for a in accronyms:
-        if pairs.get(a) is None:
-            if found := ACRONYMS.get(a):
-                if set(found.split(" ")).isdisjoint(set(s.split(" "))):
-                    result += f" ({found})"
-    return result
+    return get_acronym_expander().expand(s)
 
 
 def process_json(source: str, formation: ParcoursFormations) -> Iterator[Document]:
@@ -90,14 +99,17 @@ def process_json(source: str, formation: ParcoursFormations) -> Iterator[Documen
             desc.secteurs.update(info_pedago.mot_cle_sectoriel or {})
             desc.autre.update(info_pedago.mot_cle_libre or {})
             desc.lien_fiche.update([info_pedago.lien_fiche] or {})
+        desc.add_lieux(dmn.lieux)
 
-        for parcours in dmn.parcours or []:
+        all_parcours = dmn.parcours or []
+        expanded_intitules = get_acronym_expander().expand_many(p.intitule_parcours for p in all_parcours)
+        for parcours, intitule_p in zip(all_parcours, expanded_intitules, strict=True):
             desc.intitule_parcours.update([parcours.intitule_parcours] or {})
             desc.modalite_enseignement.update(parcours.modalite_enseignement or {})
             desc.licences_conseillees.update(parcours.licences_conseillees or {})
+            desc.add_lieux(parcours.lieux)
 
             if info_pedago := parcours.informations_pedagogiques:
-                intitule_p = add_accronym(parcours.intitule_parcours)
                 desc.intitule_parcours.update([intitule_p])
                 desc.disciplines.update(info_pedago.mot_cle_disciplinaire or [])
                 desc.metiers.update(info_pedago.mot_cle_metier or [])
@@ -125,28 +137,79 @@ def process_json(source: str, formation: ParcoursFormations) -> Iterator[Documen
             "for_intitule": desc.for_intitule,
             "modalite_enseignement": ";".join(desc.modalite_enseignement),
             "licences_conseillees": ";".join(desc.licences_conseillees),
+            # aligned lists of the formation sites (an empty item for a missing field keeps them aligned)
+            "sites": ";".join(site for site, _, _ in desc.lieux),
+            "villes": ";".join(ville for _, ville, _ in desc.lieux),
+            "geo": ";".join(geo for _, _, geo in desc.lieux),
         }
         doc = Document(page_content=content_str, metadata=meta)
         yield doc
 
 
+def parse_offre(name: str, data: bytes) -> list[Document]:
+    """Parse one 'Offre_*.json' archive member into Documents.
+
+    Use the strict (and fast) pydantic JSON parser, and fall back to 'json_repair' only when the file is
+    malformed. Top-level function so it can run in a worker process.
+    """
+    try:
+        parcours = ParcoursFormations.model_validate_json(data)
+    except ValidationError as ex:
+        if not any(err["type"] == "json_invalid" for err in ex.errors()):
+            raise
+        logger.debug("malformed JSON in {} - use json_repair", name)
+        parcours = ParcoursFormations.model_validate(json_repair.loads(data.decode("utf-8")))
+    return list(process_json(name, parcours))
+
+
 class offre_formation_loader(BaseLoader):
-    def __init__(self, doc_list: Path) -> None:
-        self.parcours_json_archive = doc_list
+    """Load formation offers from the 'Offres_XXX.tgz' archive.
 
-    def lazy_load(self) -> Iterator[Document]:
-        with tarfile.open(self.parcours_json_archive, "r:gz") as tar:
-            for member in tar.getmembers():
-                if not member.isfile() and fnmatch.fnmatch(member.name, "Offre_*.json"):
-                    raise Exception("incorrect file in archive: {member}")
+    The archive is read sequentially by a single reader.  If 'workers' > 1, members are parsed and validated
+    in a process pool, with a bounded number of pending files so memory stays flat.  Documents are yielded
+    in archive order in both modes.
+    """
+
+    def __init__(self, doc_list: Path, workers: int = 1, max_pending: int = 0) -> None:
+        self.parcours_json_archive = doc_list
+        self.workers = workers
+        self.max_pending = max_pending or 4 * workers
+
+    def _iter_members(self) -> Iterator[tuple[str, bytes]]:
+        with tarfile.open(self.parcours_json_archive, "r|gz") as tar:  # streaming mode
+            for member in tar:
+                if not member.isfile():
+                    if fnmatch.fnmatch(member.name, "Offre_*.json"):
+                        raise Exception(f"incorrect file in archive: {member}")
+                    continue
                 file_obj = tar.extractfile(member)
                 assert file_obj
+                yield member.name, file_obj.read()
+
+    def lazy_load(self) -> Iterator[Document]:
+        if self.workers <= 1:
+            for name, data in self._iter_members():
+                yield from parse_offre(name, data)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending: deque[Future[list[Document]]] = deque()
+            for name, data in self._iter_members():
+                pending.append(pool.submit(parse_offre, name, data))
+                if len(pending) >= self.max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
 
-                json_file = file_obj.read().decode("utf-8")
-                json_obj = json_repair.loads(json_file)
-                parcours = ParcoursFormations(**json_obj)  # type: ignore
 
-                yield from process_json(str(member.name), parcours)
+def iter_documents_jsonl(file: Path) -> Iterator[Document]:
+    """Iterate over the Documents of a JSONL file (possibly zstd compressed), without loading them all."""
+    return iter_documents(file)
+
+
+def write_documents_jsonl(docs: Iterable[Document], file: Path) -> int:
+    """Stream Documents to a JSONL file, one per line, and return their count (see 'doc_store.write_documents')."""
+    return write_documents(docs, file)
 
 
 REPO = global_config().get_dir_path("external_data", create_if_not_exists=False)
@@ -159,32 +222,89 @@ EMBEDDINGS_MODEL = "solon_large_local"
 
 
 @app.command()
-def create_embeddings(embeddings: str = EMBEDDINGS_MODEL) -> None:
+def create_embeddings(
+    embeddings: str | None = None,
+    batch_size: int = 64,
+    workers: int = 2,
+    full: bool = False,
+    collapse: bool = False,
+) -> None:
+    """Add new or modified documents to the vector store, embedded with the given model (default: the configured one).
+
+    Unchanged documents are skipped thanks to a manifest stored next to the vector store. Use '--full' to
+    discard it and re-embed everything.  With '--collapse', only one document per group of near-duplicates is
+    embedded; this is recorded with the manifest, so search expands results to all the group members.
+    """
+    if embeddings:
+        global_config().set("embeddings.models.default", embeddings)  # used by the 'default' store
+    embeddings_id = global_config().get_str("embeddings.models.default")
     vector_factory = EmbeddingsStore.create_from_config("default")
-    docs = list(load_objects_from_jsonl(FILES, Document))
+    manifest = manifest_file("default", embeddings_id)
+    if full:
+        manifest.unlink(missing_ok=True)
 
     logger.info("There are {} documents in  vector store", vector_factory.document_count())
+    logger.info("add documents to vector store: {}", vector_factory.description)
+    ingester = EmbeddingsIngester(vector_factory, manifest, batch_size=batch_size, max_workers=workers)
+    docs = iter_documents_jsonl(FILES)
+    if collapse:
+        docs = load_duplicate_groups(FILES).collapse(docs)
+    stats = ingester.run(docs)
+    if stats.failed:  # stale documents are kept: the store may mix collapsed and non collapsed documents
+        logger.warning("{} documents not added - run the command again", stats.failed)
+    else:
+        save_store_info(manifest, StoreInfo(collapsed=collapse))
+    logger.info("done: {}", stats)
+
+
+@app.command()
+def create_mmap_index(
+    embeddings: str = EMBEDDINGS_MODEL,
+    dtype: str = "int8",
+    batch_size: int = 64,
+    ivf_lists: int = 0,
+    collapse: bool = False,
+) -> None:
+    """Build the local memory-mapped vector index (alternative to the vector store) for the given embeddings.
+
+    With '--collapse', only one document per group of near-duplicates is embedded.
+    """
+    docs = iter_documents_jsonl(FILES)
+    if collapse:
+        docs = load_duplicate_groups(FILES).collapse(docs)
+    build_ann_index(
+        docs,
+        get_embeddings(embeddings=embeddings),
+        embeddings,
+        mmap_index_dir(embeddings),
+        dtype=dtype,  # type: ignore
+        batch_size=batch_size,
+        ivf_lists=ivf_lists,
+        collapsed=collapse,
+    )
+
 
-    logger.info("add {} documents to vector store: {}", len(docs), vector_factory.description)
-    # vector_factory.get()
-    for doc in docs:
-        try:
-            print(".", end="", flush=True)
-            vector_factory.add_documents([doc])
-        except Exception as ex:
-            logger.warning("cannot add {} - {}", doc.metadata["source"], ex)
-    print("done")
+@app.command()
+def create_namespaces(
+    embeddings: list[str],
+    dtype: str = "int8",
+    batch_size: int = 64,
+    ivf_lists: int = 0,
+    collapse: bool = False,
+) -> None:
+    """Build the per-model namespaces of the corpus: one memory-mapped vector index per given embeddings model.
+
+    They're loaded on demand by the model manager of 'search.py', when the model is selected.
+    """
+    for embeddings_id in embeddings:
+        logger.info("build namespace of embeddings '{}'", embeddings_id)
+        create_mmap_index(embeddings_id, dtype=dtype, batch_size=batch_size, ivf_lists=ivf_lists, collapse=collapse)
 
 
 @app.command()
-def create_bm25_index(k: int = 20):
-    logger.info("create BM25 index")
-    docs_for_bm25 = list(load_objects_from_jsonl(FILES, Document))
-    docs = docs_for_bm25
-    path = Path(global_config().get_str("vector_store.path")) / "bm25"
-    fn = get_spacy_preprocess_fn(model="fr_core_news_sm", more_stop_words=STOP_WORDS)  # noqa: F821
-    retriever = BM25FastRetriever.from_documents(documents=docs, preprocess_func=fn, k=k, cache_dir=path)
-    return retriever
+def create_bm25_index(k: int = 20, workers: int = os.cpu_count() or 1):
+    """Build the BM25 index used for keyword search, and stamp it with the corpus and stop-words hashes."""
+    return build_bm25_index(FILES, k=k, workers=workers)
 
 
 @app.command()
@@ -196,32 +316,69 @@ def bm25_index_search(query: str, k: int = 20) -> None:
 
 @app.command()
 def bm25_search(query: str, k: int = 10) -> None:
-    path = Path(global_config().get_str("vector_store.path")) / "bm25"
+    retriever = load_bm25_index(FILES, k=k)
+    print(retriever.invoke(query))
 
-    fn = get_spacy_preprocess_fn(model="fr_core_news_sm", more_stop_words=STOP_WORDS)  # noqa: F821
-    retriever = BM25FastRetriever.from_cache(preprocess_func=fn, k=k, cache_dir=path)
-    retriever.invoke(query)
+
+@app.command()
+def save_to_jsonl(workers: int = os.cpu_count() or 1) -> None:
+    loader = offre_formation_loader(REPO / "Offres_2024.tgz", workers=workers)
+    count = write_documents_jsonl(loader.lazy_load(), FILES)
+    logger.info("{} documents written to {}", count, FILES)
+    build_document_store(FILES)
+    build_facet_index(FILES)
+    build_spatial_index(FILES)
+    build_duplicate_groups(FILES)
+    build_suggestion_index(FILES)
 
 
 @app.command()
-def save_to_jsonl() -> None:
-    loader = offre_formation_loader(REPO / "Offres_2024.tgz")
-    processed = list(loader.load())
-    store_objects_to_jsonl(processed, FILES)
+def create_document_store() -> None:
+    """Build the sidecar index of the corpus, for random access to documents by row or source."""
+    build_document_store(FILES)
 
 
 @app.command()
-def find_acronyms():
-    acronyms = set()
-    candidates = set()
+def compress_corpus(level: int = 9) -> None:
+    """Write a zstd compressed copy of the corpus (in independent frames, for random access), and its index."""
+    file = FILES.with_name(FILES.name + ".zst")
+    count = write_documents(iter_documents(FILES), file, level=level)
+    build_document_store(file)
+    logger.info("{} documents compressed in {}: {} -> {} bytes", count, file, FILES.stat().st_size, file.stat().st_size)
+
+
+@app.command()
+def create_duplicate_groups(threshold: float = SIMILARITY_THRESHOLD) -> None:
+    """Group near-duplicate documents (same title, near identical content), to embed them only once."""
+    build_duplicate_groups(FILES, threshold=threshold)
 
-    try:
-        import enchant
-    except ImportError as ex:
-        raise ImportError("enchant package is required. Install with: uv add enchant --group demos") from ex
 
-    french_dict = enchant.Dict("fr")
-    english_dict = enchant.Dict("en")
+@app.command()
+def create_spatial_index() -> None:
+    """Build the index of the formation sites used for proximity search."""
+    build_spatial_index(FILES)
+
+
+@app.command()
+def create_suggestion_index() -> None:
+    """Build the typeahead suggestion index (formation and parcours titles, disciplines, acronyms)."""
+    index = build_suggestion_index(FILES)
+    for query in ["MIAGE", "data sc"]:
+        logger.info("{} => {}", query, [s.text for s in index.suggest(query, k=5)])
+
+
+@app.command()
+def create_facet_index() -> None:
+    """Build the index of facet values (establishment, teaching modality, advised licences) used by filters."""
+    index = build_facet_index(FILES)
+    for field, counts in index.facet_counts().items():
+        logger.info("{}: {} values", field, len(counts))
+
+
+@app.command()
+def find_acronyms(workers: int = os.cpu_count() or 1):
+    """Extract possible acronyms from the corpus, with their definition if found, into an Excel file."""
+    from genai_blueprint.demos.mon_master_search.acronym_screening import find_candidates, screen_candidates
 
     logger.info("extract abbreviations defintion fom text")
 
@@ -229,17 +386,10 @@ def find_acronyms():
     known_abbrev = {codecs.decode(k, "unicode_escape"): codecs.decode(v, "unicode_escape") for k, v in pairs.items()}
 
     logger.info("extract possible abbreviations")
-    docs = load_objects_from_jsonl(FILES)
-    for doc in docs:
-        candidates.update(re.findall(REGEXP_ACRONYMS, doc.page_content))
-        # print(candidates)
-    for word in candidates:
-        if not french_dict.check(word) and not english_dict.check(word):
-            suggested = [unidecode(w).lower() for w in french_dict.suggest(word)]
-            if unidecode(word).lower() not in suggested:
-                acronyms.add(word)
-
-    d = {token: known_abbrev.get(token) or "" for token in acronyms}
+    candidates = find_candidates(iter_documents_jsonl(FILES))
+    acronyms = screen_candidates(candidates, REPO / "acronym_verdicts.db", max_workers=workers)
+
+    d = {token: known_abbrev.get(token) or "" for token in sorted(acronyms)}
     df = pd.DataFrame.from_dict(d, orient="index")
     logger.info("save to Excel")
     df.to_excel(REPO / "abbreviations.xlsx", sheet_name="extracted")
@@ -0,0 +1,163 @@
+"""Per-embeddings-model namespaces of the masters corpus, loaded lazily under a RAM budget.
+
+Each embeddings model has its own namespace: a memory-mapped vector index of the same corpus, precomputed offline
+(see 'loader.py create-namespaces') in 'mon_master_mmap/<embeddings id>'.  The manager loads a namespace (the
+model and its index) on first use, keeps the loaded ones in LRU order, and unloads the least recently used ones
+when the memory they take exceeds a budget.  Loads, hits and unloads are counted, and logged with their duration
+and size.
+
+Model sizes are estimated from the parameters and buffers of the (torch) model, which, unlike the process memory,
+is not skewed by other loads running at the same time.  Remote models (API based) take almost no memory, so they're
+rarely unloaded.  An unloaded model is checked to be actually freed: a model still referenced elsewhere (ex: by an
+embeddings factory cache) keeps its memory, which is logged.
+"""
+
+# cSpell: disable
+
+import gc
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from weakref import ref
+
+from genai_tk.core.embeddings_factory import get_embeddings
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.vectorstores import VectorStore
+from loguru import logger
+from pydantic import BaseModel
+
+from genai_blueprint.demos.mon_master_search.ann_index import META_FILE, AnnIndexMeta, MmapVectorStore
+
+MMAP_DIR = "mon_master_mmap"
+
+
+class ModelMetrics(BaseModel):
+    loads: int = 0
+    unloads: int = 0
+    hits: int = 0
+    load_seconds: float = 0.0
+    size_mb: float = 0.0
+    loaded: bool = False
+
+
+def mmap_index_dir(embeddings_id: str) -> Path:
+    return Path(global_config().get_str("vector_store.path")) / MMAP_DIR / embeddings_id
+
+
+def available_namespaces() -> list[str]:
+    """Embeddings models having a precomputed index of the corpus."""
+    root = Path(global_config().get_str("vector_store.path")) / MMAP_DIR
+    return sorted(d.name for d in root.glob("*") if (d / META_FILE).exists())
+
+
+def load_namespace(embeddings_id: str, nprobe: int = 0) -> VectorStore:
+    """Vector store of the precomputed index of the corpus for an embeddings model."""
+    index_dir = mmap_index_dir(embeddings_id)
+    try:
+        meta = AnnIndexMeta.model_validate_json((index_dir / META_FILE).read_text())
+    except OSError as ex:
+        raise ValueError(f"no index of the corpus for embeddings '{embeddings_id}' - run 'create-namespaces'") from ex
+    return MmapVectorStore(index_dir, get_embeddings(embeddings=meta.embeddings_id), nprobe=nprobe)
+
+
+def _torch_model(embeddings: Any) -> Any | None:
+    """The (torch) model wrapped by an embeddings object, or None (ex: remote model)."""
+    for name in ("client", "_client", "model"):
+        model = getattr(embeddings, name, None)
+        if model is not None and hasattr(model, "parameters"):
+            return model
+    return None
+
+
+def _model_bytes(embeddings: Any) -> int:
+    """Size of the parameters and buffers of the model of an embeddings object, or 0."""
+    model = _torch_model(embeddings)
+    if model is None:
+        return 0
+    tensors = [*model.parameters(), *(model.buffers() if hasattr(model, "buffers") else [])]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelManager:
+    """Load namespaces on demand, and unload the least recently used ones to stay within a RAM budget."""
+
+    def __init__(self, budget_mb: float, loader: Callable[[str], VectorStore] = load_namespace) -> None:
+        self.budget_bytes = int(budget_mb * 2**20)
+        self.loader = loader
+        self.metrics: dict[str, ModelMetrics] = {}
+        self._loaded: OrderedDict[str, tuple[VectorStore, int]] = OrderedDict()
+        self._lock = threading.Lock()  # held briefly, to access the loaded namespaces and the metrics
+        self._load_lock = threading.Lock()  # loads are serialized, so two large models are not loaded at once
+
+    @property
+    def loaded_bytes(self) -> int:
+        return sum(size for _, size in self._loaded.values())
+
+    def is_loaded(self, embeddings_id: str) -> bool:
+        return embeddings_id in self._loaded
+
+    def _hit(self, embeddings_id: str) -> VectorStore | None:
+        with self._lock:
+            metrics = self.metrics.setdefault(embeddings_id, ModelMetrics())
+            if embeddings_id not in self._loaded:
+                return None
+            self._loaded.move_to_end(embeddings_id)
+            metrics.hits += 1
+            return self._loaded[embeddings_id][0]
+
+    def get(self, embeddings_id: str) -> VectorStore:
+        """Vector store of a namespace, loaded if needed.  Loaded namespaces are served while another one loads."""
+        if (vectorstore := self._hit(embeddings_id)) is not None:
+            return vectorstore
+        with self._load_lock:
+            if (vectorstore := self._hit(embeddings_id)) is not None:  # loaded meanwhile by another thread
+                return vectorstore
+            metrics = self.metrics[embeddings_id]
+            with self._lock:  # make room beforehand when the size is known from a previous load
+                self._evict(self.budget_bytes - int(metrics.size_mb * 2**20))
+            start = time.perf_counter()
+            vectorstore = self.loader(embeddings_id)
+            vectorstore.embeddings.embed_query("query : warmup")  # type: ignore # local models load lazily
+            size = _model_bytes(vectorstore.embeddings)
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._loaded[embeddings_id] = (vectorstore, size)
+                metrics.loads += 1
+                metrics.load_seconds += duration
+                metrics.size_mb, metrics.loaded = size / 2**20, True
+                self._evict(self.budget_bytes, keep=embeddings_id)
+            logger.info("embeddings '{}' loaded in {:.1f}s ({:.0f} MB)", embeddings_id, duration, metrics.size_mb)
+            return vectorstore
+
+    def _evict(self, budget_bytes: int, keep: str | None = None) -> None:
+        """Unload least recently used namespaces until the loaded ones fit in 'budget_bytes'."""
+        evicted: dict[str, ref] = {}
+        for embeddings_id in list(self._loaded):
+            if self.loaded_bytes <= budget_bytes:
+                break
+            if embeddings_id == keep:
+                continue
+            vectorstore, size = self._loaded.pop(embeddings_id)
+            if (model := _torch_model(vectorstore.embeddings)) is not None:
+                evicted[embeddings_id] = ref(model)
+            del vectorstore, model
+            metrics = self.metrics[embeddings_id]
+            metrics.unloads += 1
+            metrics.loaded = False
+            logger.info("embeddings '{}' unloaded ({:.0f} MB) to stay within RAM budget", embeddings_id, size / 2**20)
+        if evicted:
+            gc.collect()  # free the model memory now, not at next collection
+            still_referenced = any(model_ref() is not None for model_ref in evicted.values())
+            if still_referenced and hasattr(get_embeddings, "cache_clear"):
+                get_embeddings.cache_clear()  # the embeddings factory keeps the models it created
+                gc.collect()
+            for embeddings_id, model_ref in evicted.items():
+                if model_ref() is not None:
+                    logger.warning("embeddings '{}' unloaded, but still referenced: memory not freed", embeddings_id)
+
+    def unload_all(self) -> None:
+        with self._lock:
+            self._evict(-1)
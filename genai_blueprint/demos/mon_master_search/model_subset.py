@@ -19,9 +19,9 @@ class Etab(JsonModel):
 
 
 class LieuxItem(JsonModel):
-    site: str
-    ville: str
-    geo: str
+    site: str | None = None
+    ville: str | None = None
+    geo: str | None = None
 
 
 class InformationsPedagogiques(JsonModel):
@@ -38,6 +38,7 @@ class Parcour(JsonModel):
     informations_pedagogiques: InformationsPedagogiques | None = None
     licences_conseillees: Optional[list[str]] = None
     modalite_enseignement: list[str] | None = None
+    lieux: list[LieuxItem] | None = None
 
 
 class Dnm(JsonModel):
@@ -48,6 +49,7 @@ class Dnm(JsonModel):
     parcours: Optional[list[Parcour]] = None
     licences_conseillees: Optional[list[str]] = None
     modalite_enseignement: list[str] | None = None
+    lieux: list[LieuxItem] | None = None
 
 
 class ParcoursFormations(JsonModel):
@@ -1,18 +1,43 @@
+import hashlib
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from functools import cache
+from functools import cache, lru_cache
+from pathlib import Path
+from typing import Any, Literal
 
+import numpy as np
 import pandas as pd
 from genai_tk.core.embeddings_store import EmbeddingsStore
-from genai_tk.extra.retrievers.bm25s_retriever import get_spacy_preprocess_fn
-from genai_tk.utils.pydantic_utils.jsonl_store import load_objects_from_jsonl
-from langchain_classic.retrievers import EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
+from genai_tk.extra.retrievers.bm25s_retriever import BM25FastRetriever
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
-from langchain_core.runnables import Runnable
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 from loguru import logger
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from pydantic import ConfigDict
 
-from genai_blueprint.demos.mon_master_search.loader import FILES
+from genai_blueprint.demos.mon_master_search.ann_index import META_FILE, MmapVectorStore
+from genai_blueprint.demos.mon_master_search.bm25_index import STAMP_FILE, bm25_index_dir, file_sha256, load_bm25_index
+from genai_blueprint.demos.mon_master_search.dedup import DuplicateGroups, duplicate_groups_file, load_duplicate_groups
+from genai_blueprint.demos.mon_master_search.doc_store import DocumentStore, load_document_store
+from genai_blueprint.demos.mon_master_search.facets import (
+    FacetFilters,
+    FacetIndex,
+    PrefilteredKeywordRetriever,
+    load_facet_index,
+    vector_search_kwargs,
+)
+from genai_blueprint.demos.mon_master_search.hybrid import HybridRetriever, weighted_rrf
+from genai_blueprint.demos.mon_master_search.ingest import load_store_info, manifest_file
+from genai_blueprint.demos.mon_master_search.loader import FILES, REPO
+from genai_blueprint.demos.mon_master_search.model_manager import ModelManager, load_namespace, mmap_index_dir
 from genai_blueprint.demos.mon_master_search.model_subset import EXAMPLE_QUERIES
+from genai_blueprint.demos.mon_master_search.spatial_index import GeoFilter, SpatialIndex, load_spatial_index
+from genai_blueprint.demos.mon_master_search.suggest import SuggestionIndex, load_suggestion_index
 
 # cSpell: disable
 
@@ -20,6 +45,12 @@ DEFAULT_RESULT_COUNT = 20
 RATIO_SPARSE = 50
 EMBEDDINGS_MODEL_ID = "solon_large_local"
 
+# Vector search backend: the configured EmbeddingsStore, or a local memory-mapped index (see 'ann_index.py')
+VectorBackend = Literal["embeddings_store", "mmap"]
+VECTOR_BACKEND: VectorBackend = "embeddings_store"
+MMAP_NPROBE = 0  # > 0 to use the IVF index, if built
+MODELS_RAM_BUDGET_MB = 4096  # memory for the loaded embeddings models namespaces, if not set in configuration
+
 
 class SearchMode(Enum):
     VECTOR = "Vector"
@@ -28,77 +59,358 @@ class SearchMode(Enum):
 
 
 @cache
-def get_sparse_retriever() -> Runnable:
-    retriever = (
-        EmbeddingsStore.create_from_config("default").get().as_retriever(search_kwargs={"k": DEFAULT_RESULT_COUNT})
+def _get_store() -> VectorStore:
+    return EmbeddingsStore.create_from_config("default").get()
+
+
+@cache
+def _store_collapsed() -> bool:
+    embeddings_id = global_config().get_str("embeddings.models.default")
+    return load_store_info(manifest_file("default", embeddings_id)).collapsed
+
+
+def is_collapsed(vectorstore: VectorStore | None = None) -> bool:
+    """True if a vector index (default: the configured store) holds one document per group of near-duplicates.
+
+    It's recorded when the index is built with '--collapse' (see 'loader.py').
+    """
+    if isinstance(vectorstore, MmapVectorStore):
+        return vectorstore.index.meta.collapsed
+    return _store_collapsed()
+
+
+@cache
+def get_model_manager() -> ModelManager:
+    """Manager of the per-embeddings-model namespaces, with the RAM budget 'mon_master.models_ram_budget_mb'."""
+    budget = global_config().get_str("mon_master.models_ram_budget_mb", default=None)
+    return ModelManager(
+        float(budget) if budget else MODELS_RAM_BUDGET_MB, loader=lambda model_id: load_namespace(model_id, MMAP_NPROBE)
     )
-    return retriever
+
+
+def get_sparse_retriever(
+    embeddings_id: str | None = None, backend: VectorBackend = VECTOR_BACKEND
+) -> VectorStoreRetriever:
+    """Vector retriever.  If an embeddings model is given, use its namespace (loaded by the model manager)."""
+    if embeddings_id is None and backend == "embeddings_store":
+        vectorstore = _get_store()
+    else:
+        vectorstore = get_model_manager().get(embeddings_id or EMBEDDINGS_MODEL_ID)
+    return vectorstore.as_retriever(search_kwargs={"k": DEFAULT_RESULT_COUNT})
+
+
+@lru_cache(maxsize=32)
+def _file_hash(file: Path, size: int, mtime_ns: int) -> str:
+    return file_sha256(file)[:16]
+
+
+def _file_version(file: Path) -> str:
+    """Hash of a file, re-computed only when it's modified, or '' if it does not exist."""
+    try:
+        stat = file.stat()
+    except FileNotFoundError:
+        return ""
+    return _file_hash(file, stat.st_size, stat.st_mtime_ns)
+
+
+def index_version(embeddings_id: str | None = None) -> str:
+    """Version of the indexes searches depend on, to key cached results.
+
+    It combines the hashes of the corpus JSONL file, of the BM25 index stamp, of the near-duplicate groups, and of
+    the description of the vector index of the embeddings model (as in 'get_sparse_retriever'): the manifest of
+    the configured vector store, or the meta file of the model namespace.  So results cached on disk are not
+    reused after one of them is rebuilt.
+    """
+    if embeddings_id is None and VECTOR_BACKEND == "embeddings_store":
+        manifest = manifest_file("default", global_config().get_str("embeddings.models.default"))
+        vector_files = [manifest, manifest.with_suffix(".json")]
+    else:
+        vector_files = [mmap_index_dir(embeddings_id or EMBEDDINGS_MODEL_ID) / META_FILE]
+    files = [FILES, bm25_index_dir() / STAMP_FILE, duplicate_groups_file(), *vector_files]
+    return hashlib.sha256(":".join(_file_version(file) for file in files).encode()).hexdigest()[:16]
 
 
 @cache
-def get_bm25_retriever():
-    stop_words = [
-        "master",
-        "mastère",
-        "formation",
-        "diplome",
-    ]
-    fn = get_spacy_preprocess_fn(model="fr_core_news_sm", more_stop_words=stop_words)  # noqa: F821
-    logger.info("create BM25 index")
-    docs_for_bm25 = list(load_objects_from_jsonl(FILES, Document))
-    docs = docs_for_bm25
-
-    retriever = BM25Retriever.from_documents(documents=docs, preprocess_func=fn, k=DEFAULT_RESULT_COUNT)
-    return retriever
+def get_bm25_retriever() -> BM25FastRetriever:
+    return load_bm25_index(FILES, k=DEFAULT_RESULT_COUNT)
 
 
-def get_ensemble_retriever(ratio_sparse: float) -> EnsembleRetriever:
-    return EnsembleRetriever(
-        retrievers=[get_bm25_retriever(), get_sparse_retriever()],
-        weights=[1.0 - ratio_sparse, ratio_sparse],
+def get_hybrid_retriever(embeddings_id: str | None = None) -> HybridRetriever:
+    """Hybrid retriever. Ratio and fusion method can be changed per call with 'model_copy'."""
+    return HybridRetriever(
+        keyword=get_bm25_retriever(),
+        vectorstore=get_sparse_retriever(embeddings_id).vectorstore,
+        k=DEFAULT_RESULT_COUNT,
     )
 
 
-def search(query: str, mode: SearchMode = SearchMode.VECTOR, ratio: int = RATIO_SPARSE) -> pd.DataFrame:
-    known_set: set[str] = set()
-    df = pd.DataFrame()
+def dedup_key(doc: Document) -> tuple[str, str]:
+    """Key identifying a formation in an establishment. Several documents (parcours) can share it."""
+    return doc.metadata["for_intitule"], doc.metadata["eta_uai"]
+
+
+def unique_docs(docs: list[Document]) -> list[Document]:
+    """Keep the first document of each (formation, establishment)."""
+    unique: dict[tuple[str, str], Document] = {}
+    for doc in docs:
+        unique.setdefault(dedup_key(doc), doc)
+    return list(unique.values())
+
+
+def invoke_with_k(retriever: BaseRetriever, query: str, k: int) -> list[Document]:
+    """Invoke a retriever, asking for 'k' results."""
+    if isinstance(retriever, VectorStoreRetriever):
+        return retriever.invoke(query, k=k)
+    if "k" in type(retriever).model_fields:
+        return retriever.model_copy(update={"k": k}).invoke(query)
+    config = {"configurable": {"k": k, "search_kwargs": {"k": k}}}
+    return retriever.invoke(query, config=config)  # type: ignore
+
+
+def retrieve_unique(
+    retriever: BaseRetriever, query: str, limit: int = DEFAULT_RESULT_COUNT, offset: int = 0, max_fetch: int = 2000
+) -> list[Document]:
+    """Return hits 'offset' to 'offset + limit' of a search, with one hit per (formation, establishment).
+
+    Candidates are fetched again with a larger 'k' until there are enough unique hits, or the retriever has
+    no more results.  The new 'k' is estimated from the duplicate ratio observed in the previous fetch.
+    """
+    wanted = offset + limit
+    fetch = min(max_fetch, 2 * wanted)
+    while True:
+        docs = invoke_with_k(retriever, query, fetch)
+        unique = unique_docs(docs)
+        if len(unique) >= wanted or len(docs) < fetch or fetch >= max_fetch:
+            break
+        estimate = int(fetch * wanted / max(len(unique), 1) * 1.2)
+        fetch = min(max_fetch, max(estimate, 2 * fetch))
+        logger.debug("{} unique hits out of {} - fetch {}", len(unique), len(docs), fetch)
+    return unique[offset:wanted]
+
+
+def results_to_df(docs: list[Document]) -> pd.DataFrame:
+    """Build the result table in one step, from columns."""
+    intitules, parcours, etas, inms, contents = [], [], [], [], []
+    for doc in docs:
+        intitule = doc.page_content.removeprefix("intitulé: ")
+        intitules.append(doc.metadata["for_intitule"])
+        parcours.append(intitule.partition('" : ')[2].replace("parcours: ", "=> "))
+        etas.append(doc.metadata.get("eta_name"))
+        inms.append(doc.metadata.get("source"))
+        contents.append(doc.page_content)
+    return pd.DataFrame(
+        {
+            "Intitulé formation:": intitules,
+            "Parcours": parcours,
+            "ETA": etas,
+            "INM(P)": inms,
+            "Content": contents,
+        }
+    )
+
+
+@cache
+def get_facet_index() -> FacetIndex:
+    return load_facet_index(FILES)
+
+
+@cache
+def get_spatial_index() -> SpatialIndex:
+    return load_spatial_index(FILES)
+
+
+@cache
+def get_document_store() -> DocumentStore:
+    """Random access to the corpus documents, by row or source (to hydrate results kept as ids)."""
+    return load_document_store(FILES)
+
+
+@cache
+def get_suggestion_index() -> SuggestionIndex:
+    return load_suggestion_index(FILES)
+
+
+@cache
+def get_duplicate_groups() -> DuplicateGroups:
+    return load_duplicate_groups(FILES, store=get_document_store())
+
+
+def matching_rows(filters: FacetFilters | None = None, near: GeoFilter | None = None) -> np.ndarray:
+    """Sorted rows of the corpus documents matching facet filters and proximity filter."""
+    rows = get_facet_index().match(filters or {})
+    if near:
+        rows = np.intersect1d(rows, get_spatial_index().match(near), assume_unique=True)
+    return rows
+
+
+def get_retriever(
+    mode: SearchMode,
+    ratio: float = RATIO_SPARSE,
+    filters: FacetFilters | None = None,
+    near: GeoFilter | None = None,
+    embeddings_id: str | None = None,
+) -> BaseRetriever:
+    """Retriever of a search mode.  Vector search uses the namespace of 'embeddings_id', if given."""
     if mode == SearchMode.VECTOR:
-        retriever = get_sparse_retriever()
+        retriever = get_sparse_retriever(embeddings_id)
     elif mode == SearchMode.KEYWORD:
         retriever = get_bm25_retriever()
     else:
-        retriever = get_ensemble_retriever(ratio_sparse=ratio)
+        retriever = get_hybrid_retriever(embeddings_id).model_copy(update={"ratio": normalize_ratio(ratio)})
+    if filters or near:
+        retriever = restrict_retriever(retriever, filters, near)
+    if mode != SearchMode.KEYWORD:
+        retriever = expand_duplicates(retriever, matching_rows(filters, near) if filters or near else None)
+    return retriever
 
-    #  quick and dirty hack to have enough results
-    count = DEFAULT_RESULT_COUNT * 2
 
-    config = {"configurable": {"k": count, "search_kwargs": {"k": count}}}
-    user_input = "query : " + query  # supposed to work well for Solon Embeddings
+def restrict_retriever(
+    retriever: BaseRetriever, filters: FacetFilters | None = None, near: GeoFilter | None = None
+) -> BaseRetriever:
+    """Copy of a search retriever where documents not matching the filters are excluded before scoring."""
+    index = get_facet_index()
+    rows = matching_rows(filters, near)
+    logger.debug("{} documents match filters {} {}", len(rows), filters or "", near or "")
 
-    result = retriever.invoke(user_input, config=config)  # type: ignore
+    def vector_kwargs(vectorstore: VectorStore) -> dict[str, Any]:
+        if is_collapsed(vectorstore):  # the vector index holds only the group representatives
+            groups = get_duplicate_groups()
+            return vector_search_kwargs(vectorstore, index, groups.representatives_of(rows), groups.representatives)
+        return vector_search_kwargs(vectorstore, index, rows, None)
 
-    for doc in result:
-        # obj = json.loads(doc.page_content)
-        intitule = doc.page_content.removeprefix("intitulé: ")
-        eta = doc.metadata.get("eta_name")
-        inm = doc.metadata.get("source")
-        for_intitule = doc.metadata["for_intitule"]
-
-        key = doc.metadata["for_intitule"] + doc.metadata["eta_uai"]
-        parcours = intitule.partition('" : ')[2]
-        parcours = parcours.replace("parcours: ", "=> ")
-        row = {
-            "Intitulé formation:": for_intitule,
-            "Parcours": parcours,
-            "ETA": eta,
-            "INM(P)": inm,
-            "Content": doc.page_content,
+    if isinstance(retriever, HybridRetriever):
+        update = {
+            "keyword": restrict_retriever(retriever.keyword, filters, near),
+            "vector_search_kwargs": vector_kwargs(retriever.vectorstore),
         }
-        if key not in known_set:
-            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-        known_set.add(key)
+        return retriever.model_copy(update=update)
+    if isinstance(retriever, VectorStoreRetriever | EmbeddedQueryRetriever):
+        kwargs = vector_kwargs(retriever.vectorstore)
+        return retriever.model_copy(update={"search_kwargs": retriever.search_kwargs | kwargs})
+    k = getattr(retriever, "k", DEFAULT_RESULT_COUNT)
+    return PrefilteredKeywordRetriever(keyword=retriever, index=index, rows=rows, k=k)
+
+
+def search(
+    query: str,
+    mode: SearchMode = SearchMode.VECTOR,
+    ratio: int = RATIO_SPARSE,
+    limit: int = DEFAULT_RESULT_COUNT,
+    offset: int = 0,
+    filters: FacetFilters | None = None,
+    near: GeoFilter | None = None,
+) -> pd.DataFrame:
+    if (filters or near) and len(matching_rows(filters, near)) == 0:
+        return results_to_df([])
+    retriever = get_retriever(mode, ratio, filters, near)
+    user_input = "query : " + query  # supposed to work well for Solon Embeddings
+    return results_to_df(retrieve_unique(retriever, user_input, limit=limit, offset=offset))
+
+
+class EmbeddedQueryRetriever(BaseRetriever):
+    """Vector search with a query embedding computed beforehand."""
+
+    vectorstore: VectorStore
+    embedding: list[float]
+    k: int = DEFAULT_RESULT_COUNT
+    search_kwargs: dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return self.vectorstore.similarity_search_by_vector(self.embedding, k=self.k, **self.search_kwargs)
+
 
-    return df
+class DuplicateExpandingRetriever(BaseRetriever):
+    """Search a vector index of near-duplicate group representatives, and return all the group members."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    rows: np.ndarray | None = None
+    k: int = DEFAULT_RESULT_COUNT
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return get_duplicate_groups().expand(invoke_with_k(self.retriever, query, self.k), self.rows)
+
+
+def expand_documents(
+    docs: list[Document], rows: np.ndarray | None = None, vectorstore: VectorStore | None = None
+) -> list[Document]:
+    """Replace near-duplicate group representatives by the group members (restricted to 'rows', if given).
+
+    Documents are those found in 'vectorstore' (default: the configured store).
+    """
+    return get_duplicate_groups().expand(docs, rows) if is_collapsed(vectorstore) else docs
+
+
+def expand_duplicates(retriever: BaseRetriever, rows: np.ndarray | None = None) -> BaseRetriever:
+    """Wrap a retriever searching a vector index, so it returns all near-duplicates (see 'dedup.py')."""
+    if is_collapsed(getattr(retriever, "vectorstore", None)):
+        return DuplicateExpandingRetriever(retriever=retriever, rows=rows)
+    return retriever
+
+
+def normalize_ratio(ratio: float) -> float:
+    """Accept ratio either in [0, 1] or in percent."""
+    return ratio / 100 if ratio > 1 else ratio
+
+
+def run_name(mode: SearchMode, ratio: float = RATIO_SPARSE) -> str:
+    """Name of a run, with the hybrid ratio in whole percents (ex: 'Hybrid_search_50_50')."""
+    if mode == SearchMode.HYBRID:
+        percent = round(normalize_ratio(ratio) * 100)
+        return f"Hybrid_search_{percent}_{100 - percent}"
+    return f"{mode.value}_search"
+
+
+def batch_search(
+    queries: list[str],
+    runs: list[tuple[SearchMode, int]],
+    limit: int = DEFAULT_RESULT_COUNT,
+    max_workers: int = 4,
+) -> Iterator[tuple[str, dict[str, list[Document]]]]:
+    """Run several search modes and hybrid ratios over a list of queries, in one pass.
+
+    Vector and keyword searches are made once per query, and run concurrently across queries; hybrid results are
+    fused from them for each ratio.  Queries are embedded with 'embed_query', as in interactive search (some
+    models embed queries and documents differently).  Yield, in query order,
+    the query and the documents found for each run (see 'run_name').
+    """
+    modes = {mode for mode, _ in runs}
+    need_vector = bool(modes - {SearchMode.KEYWORD})
+    need_keyword = bool(modes - {SearchMode.VECTOR})
+    inputs = ["query : " + q for q in queries]  # supposed to work well for Solon Embeddings
+
+    if need_vector:
+        vectorstore = get_sparse_retriever().vectorstore
+    if need_keyword:
+        bm25 = get_bm25_retriever()
+
+    def search_one(i: int) -> tuple[str, dict[str, list[Document]]]:
+        vector_docs, keyword_docs = [], []
+        if need_vector:
+            embedding = vectorstore.embeddings.embed_query(inputs[i])  # type: ignore
+            retriever = EmbeddedQueryRetriever(vectorstore=vectorstore, embedding=embedding)
+            vector_docs = retrieve_unique(expand_duplicates(retriever), inputs[i], limit=limit)
+        if need_keyword:
+            keyword_docs = retrieve_unique(bm25, inputs[i], limit=limit)
+        results = {}
+        for mode, ratio in runs:
+            if mode == SearchMode.VECTOR:
+                docs = vector_docs
+            elif mode == SearchMode.KEYWORD:
+                docs = keyword_docs
+            else:
+                r = normalize_ratio(ratio)
+                docs = weighted_rrf([keyword_docs, vector_docs], [1.0 - r, r], key=dedup_key)[:limit]
+            results[run_name(mode, ratio)] = docs
+        return queries[i], results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        yield from pool.map(search_one, range(len(queries)))
+
+
+def answer_line(doc: Document) -> str:
+    return f"{doc.metadata.get('eta_name')}: {doc.metadata['for_intitule']} ({doc.metadata.get('source')})"
 
 
 # cSpell: disable
@@ -106,23 +418,35 @@ def process_questions(
     queries: list[str], mode: SearchMode = SearchMode.VECTOR, ratio: int = RATIO_SPARSE
 ) -> list[dict]:
     result = []
-    for q in queries:
-        df = search(q, mode, ratio)
-        d = {"question": q}
-        i = 1
-        for answer in df.itertuples():
-            line = f"{answer[3]}: {answer[1]} ({answer[4]})"
-            d |= {i: line}
-            i += 1
-        result.append(d)
+    for q, answers in batch_search(queries, [(mode, ratio)]):
+        docs = answers[run_name(mode, ratio)]
+        result.append({"question": q} | {i: answer_line(doc) for i, doc in enumerate(docs, start=1)})
     return result
 
 
-def format_sheet(worksheet) -> None:
-    for column in worksheet.columns:
-        column_letter = column[0].column_letter  # Get the column letter
-        if column_letter > "A":
-            worksheet.column_dimensions[column_letter].width = 100
+def write_excel_report(
+    out_file: Path,
+    queries: list[str],
+    runs: list[tuple[SearchMode, int]],
+    limit: int = DEFAULT_RESULT_COUNT,
+    max_workers: int = 4,
+) -> None:
+    """Write one sheet per run, with a row per query. Rows are streamed to the file (write-only mode)."""
+    workbook = Workbook(write_only=True)
+    sheets = {}
+    for mode, ratio in runs:
+        sheet = workbook.create_sheet(run_name(mode, ratio))
+        sheet.freeze_panes = "B2"
+        for col in range(2, limit + 2):
+            sheet.column_dimensions[get_column_letter(col)].width = 100
+        sheet.append(["question", *range(1, limit + 1)])
+        sheets[run_name(mode, ratio)] = sheet
+
+    for count, (q, answers) in enumerate(batch_search(queries, runs, limit, max_workers), start=1):
+        for name, docs in answers.items():
+            sheets[name].append([q, *(answer_line(doc) for doc in docs)])
+        logger.debug("{}/{} queries processed", count, len(queries))
+    workbook.save(out_file)
 
 
 if __name__ == "__main__":
@@ -131,20 +455,5 @@ if __name__ == "__main__":
     OUT_FILE = REPO / "master_search_v0_5.xlsx"
 
     logger.info("write Exel file : {}", OUT_FILE)
-    with pd.ExcelWriter(OUT_FILE) as writer:
-        logger.info("Vector Search (solon_large_local)...")
-        d_vector = process_questions(EXAMPLE_QUERIES, SearchMode.VECTOR)
-        pd.DataFrame(d_vector).to_excel(writer, sheet_name="Vector_search", freeze_panes=(0, 2))
-        format_sheet(writer.sheets["Vector_search"])
-
-        # logger.info("Hybrid Search 50/50...")
-        # d_hybrid = process_questions(_questions, SearchMode.HYBRID, 50)
-        # sheet = "Hybrid_search_50_50"
-        # pd.DataFrame(d_hybrid).to_excel(writer, sheet_name=sheet, freeze_panes=(0, 2))
-        # format_sheet(writer.sheets[sheet])
-
-        # logger.info("Hybrid Search 70/30...")
-        # d_hybrid = process_questions(_questions, SearchMode.HYBRID, 70)
-        # sheet = "Hybrid_search_70_30"
-        # pd.DataFrame(d_hybrid).to_excel(writer, sheet_name=sheet, freeze_panes=(0, 2))
-        # format_sheet(writer.sheets[sheet])
+    runs = [(SearchMode.VECTOR, RATIO_SPARSE), (SearchMode.HYBRID, 50), (SearchMode.HYBRID, 70)]
+    write_excel_report(OUT_FILE, EXAMPLE_QUERIES, runs)
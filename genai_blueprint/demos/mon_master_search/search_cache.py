@@ -0,0 +1,144 @@
+"""Two-level cache for mon_master searches.
+
+- query embeddings, per embeddings model and normalized query
+- ranked candidates, per search mode, embeddings model, normalized query and index version
+
+Both are bounded LRU caches in memory, optionally backed by a (bounded) SQLite file, so they survive restarts
+and can be shared by several processes.
+"""
+
+# cSpell: disable
+
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from pathlib import Path
+from typing import Any, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookup: Unicode NFC, whitespace collapsed.
+
+    Case is kept: it changes the embedding of cased models (ex: for acronyms).
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", query)).strip()
+
+
+class _DiskTier:
+    """Pickled values in a SQLite table, evicting least recently used entries beyond 'max_entries'."""
+
+    def __init__(self, path: Path, table: str, max_entries: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL, used REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def _hash(key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key: Hashable) -> Any | None:
+        h = self._hash(key)
+        row = self.conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (h,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute(f"UPDATE {self.table} SET used = ? WHERE key = ?", (time.time(), h))
+        return pickle.loads(row[0])
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                (self._hash(key), pickle.dumps(value), time.time()),
+            )
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+class LruCache:
+    """Thread safe LRU cache, with an optional disk tier."""
+
+    def __init__(self, max_size: int, disk: _DiskTier | None = None) -> None:
+        self.max_size = max_size
+        self.disk = disk
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            value = self.disk.get(key) if self.disk else None
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+            if self.disk:
+                self.disk.put(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        value = self.get(key)
+        if value is None:
+            value = compute()  # not under lock : several threads may compute the same value
+            self.put(key, value)
+        return value
+
+
+class SearchCache:
+    """Query embeddings and ranked candidates caches.  Meant to be shared by all sessions of the app."""
+
+    def __init__(self, max_embeddings: int = 2048, max_results: int = 512, disk_file: Path | None = None) -> None:
+        emb_disk = _DiskTier(disk_file, "query_embeddings", 10 * max_embeddings) if disk_file else None
+        res_disk = _DiskTier(disk_file, "search_results", 10 * max_results) if disk_file else None
+        self.embeddings = LruCache(max_embeddings, emb_disk)
+        self.results = LruCache(max_results, res_disk)
+
+    def query_embedding(self, model_id: str, query: str, embed: Callable[[str], list[float]]) -> list[float]:
+        text = normalize_query(query)  # the text embedded is the one of the key
+        return self.embeddings.get_or_compute((model_id, text), lambda: embed(text))
+
+    def ranked(
+        self, mode: str, model_id: str, query: str, index_version: str, compute: Callable[[], T], **params: Any
+    ) -> T:
+        """Get or compute ranked candidates.  'params' (depth, ...) are part of the key."""
+        key = (mode, model_id, normalize_query(query), index_version, tuple(sorted(params.items())))
+        return self.results.get_or_compute(key, compute)
+
+    def log_stats(self) -> None:
+        for name, c in (("embeddings", self.embeddings), ("results", self.results)):
+            logger.debug("{} cache: {} hits, {} misses", name, c.hits, c.misses)
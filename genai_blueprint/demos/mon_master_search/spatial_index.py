@@ -0,0 +1,216 @@
+"""Spatial index over the sites of the formations, for proximity search.
+
+Sites ('geo' metadata, as "lat,lon") are bucketed in a grid of cells of CELL_DEG degrees, stored sorted by cell
+key, so the points in a range of cells are a contiguous slice found by binary search.  Radius queries scan only
+the cells overlapping the circle bounding box, and k-nearest queries grow the radius until enough documents
+are found.  Results are rows of the corpus JSONL file, as in the facet index, so they can be combined with
+facet filters and used with any search mode.
+
+Like the facet index, it's built offline (see 'loader.py create-spatial-index') and stamped with the corpus hash.
+"""
+
+# cSpell: disable
+
+import re
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.documents import Document
+from loguru import logger
+from pydantic import BaseModel, model_validator
+from unidecode import unidecode
+
+from genai_blueprint.demos.mon_master_search.bm25_index import IndexStamp, compute_stamp
+
+CELL_DEG = 0.25
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = np.pi * EARTH_RADIUS_KM / 180
+SPATIAL_FILE = "mon_master_sites.npz"
+
+_LON_CELLS = int(np.ceil(360 / CELL_DEG)) + 1
+
+
+class GeoFilter(BaseModel):
+    """Proximity filter: documents having a site within 'radius_km' of a point, and/or the 'k' nearest ones."""
+
+    lat: float
+    lon: float
+    radius_km: float | None = None
+    k: int | None = None
+
+    @model_validator(mode="after")
+    def _check(self) -> "GeoFilter":
+        if self.radius_km is None and self.k is None:
+            raise ValueError("either 'radius_km' or 'k' should be given")
+        return self
+
+
+def spatial_index_file() -> Path:
+    return Path(global_config().get_str("vector_store.path")) / SPATIAL_FILE
+
+
+def parse_geo(geo: str) -> tuple[float, float] | None:
+    """Parse a "lat,lon" position.  Return None if it's not valid."""
+    numbers = re.findall(r"-?\d+(?:\.\d+)?", geo)
+    if len(numbers) != 2:
+        return None
+    lat, lon = float(numbers[0]), float(numbers[1])
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def normalize_city(name: str) -> str:
+    return re.sub(r"[\s'-]+", " ", unidecode(name)).strip().lower()
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = np.radians(lat), np.radians(lon), np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _cell_keys(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat_cells = np.floor((np.asarray(lats) + 90) / CELL_DEG).astype(np.int64)
+    lon_cells = np.floor((np.asarray(lons) + 180) / CELL_DEG).astype(np.int64)
+    return lat_cells * _LON_CELLS + lon_cells
+
+
+class SpatialIndex:
+    """Sites positions, with the corpus row and the city of each, sorted by grid cell."""
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, rows: np.ndarray, cities: np.ndarray) -> None:
+        keys = _cell_keys(lats, lons)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.lats, self.lons, self.rows, self.cities = lats[order], lons[order], rows[order], cities[order]
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Document]) -> "SpatialIndex":
+        lats, lons, rows, cities = [], [], [], []
+        for row, doc in enumerate(docs):
+            villes = (doc.metadata.get("villes") or "").split(";")
+            for i, geo in enumerate((doc.metadata.get("geo") or "").split(";")):
+                if position := parse_geo(geo):
+                    lats.append(position[0])
+                    lons.append(position[1])
+                    rows.append(row)
+                    cities.append(normalize_city(villes[i]) if i < len(villes) else "")
+        return cls(
+            np.array(lats, dtype=np.float64),
+            np.array(lons, dtype=np.float64),
+            np.array(rows, dtype=np.int32),
+            np.array(cities, dtype=np.str_),
+        )
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Indices of the points in the cells overlapping the bounding box of a circle."""
+        dlat = radius_km / KM_PER_DEG
+        lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        cos_lat = np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+        dlon = 180.0 if cos_lat < 1e-6 else radius_km / (KM_PER_DEG * cos_lat)
+        if dlon >= 180:
+            lon_ranges = [(-180.0, 180.0)]
+        elif lon - dlon < -180:
+            lon_ranges = [(-180.0, lon + dlon), (lon - dlon + 360, 180.0)]
+        elif lon + dlon > 180:
+            lon_ranges = [(lon - dlon, 180.0), (-180.0, lon + dlon - 360)]
+        else:
+            lon_ranges = [(lon - dlon, lon + dlon)]
+
+        lat_cells = range(int((lat_min + 90) // CELL_DEG), int((lat_max + 90) // CELL_DEG) + 1)
+        slices = []
+        for lat_cell in lat_cells:
+            for low, high in lon_ranges:
+                first = lat_cell * _LON_CELLS + int((low + 180) // CELL_DEG)
+                last = lat_cell * _LON_CELLS + int((high + 180) // CELL_DEG)
+                start, end = np.searchsorted(self.keys, [first, last + 1])
+                if end > start:
+                    slices.append(np.arange(start, end))
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Sorted rows of the documents having a site within 'radius_km' of the point."""
+        points = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[points], self.lons[points])
+        return np.unique(self.rows[points[distances <= radius_km]])
+
+    def nearest(self, lat: float, lon: float, k: int) -> np.ndarray:
+        """Rows of the 'k' documents having the sites nearest to the point, nearest first."""
+        radius = 10.0
+        while True:
+            points = self._candidates(lat, lon, radius)
+            distances = haversine_km(lat, lon, self.lats[points], self.lons[points])
+            inside = distances <= radius
+            rows = self.rows[points[inside]]
+            if len(np.unique(rows)) >= k or radius >= np.pi * EARTH_RADIUS_KM:
+                break
+            radius *= 2
+        order = np.argsort(distances[inside], kind="stable")
+        _, first = np.unique(rows[order], return_index=True)  # nearest site of each document
+        return rows[order][np.sort(first)][:k]
+
+    def match(self, near: GeoFilter) -> np.ndarray:
+        """Sorted rows of the documents matching a proximity filter."""
+        rows = None
+        if near.radius_km is not None:
+            rows = self.within(near.lat, near.lon, near.radius_km)
+        if near.k is not None:
+            nearest = np.sort(self.nearest(near.lat, near.lon, near.k))
+            rows = nearest if rows is None else np.intersect1d(rows, nearest, assume_unique=True)
+        assert rows is not None
+        return rows
+
+    def locate(self, city: str) -> tuple[float, float] | None:
+        """Position of a city, as the mean position of the sites located in it.  None if there's none."""
+        found = self.cities == normalize_city(city)
+        if not found.any():
+            return None
+        return float(self.lats[found].mean()), float(self.lons[found].mean())
+
+    def save(self, file: Path, stamp: IndexStamp) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file.with_name(file.name + ".tmp.npz")
+        np.savez(
+            tmp_file,
+            lats=self.lats,
+            lons=self.lons,
+            rows=self.rows,
+            cities=self.cities,
+            stamp=np.array(stamp.model_dump_json()),
+        )
+        tmp_file.replace(file)
+
+    @classmethod
+    def load(cls, file: Path) -> tuple["SpatialIndex", IndexStamp]:
+        with np.load(file) as data:
+            index = cls(data["lats"], data["lons"], data["rows"], data["cities"])
+            return index, IndexStamp.model_validate_json(str(data["stamp"]))
+
+
+def build_spatial_index(source: Path, file: Path | None = None) -> SpatialIndex:
+    """Build the spatial index of the sites of the documents in the given JSONL file, and save it."""
+    from genai_blueprint.demos.mon_master_search.loader import iter_documents_jsonl
+
+    file = file or spatial_index_file()
+    stamp = compute_stamp(source, [])
+    index = SpatialIndex.from_documents(iter_documents_jsonl(source))
+    index.save(file, stamp)
+    logger.info("spatial index of {} sites written in {}", len(index.rows), file)
+    return index
+
+
+def load_spatial_index(source: Path, file: Path | None = None) -> SpatialIndex:
+    """Load the spatial index, or rebuild it if it's missing or outdated."""
+    file = file or spatial_index_file()
+    try:
+        index, previous = SpatialIndex.load(file)
+    except (OSError, ValueError, KeyError):
+        logger.info("spatial index missing or unreadable - build it")
+        return build_spatial_index(source, file)
+    if compute_stamp(source, [], previous).source_sha256 != previous.source_sha256:
+        logger.info("spatial index outdated - rebuild it")
+        return build_spatial_index(source, file)
+    return index
@@ -0,0 +1,198 @@
+"""Typeahead suggestions for the mon_master search box.
+
+Suggestions are the formation titles ('for_intitule'), parcours titles, disciplines and acronyms (with their
+expansion, from 'ACRONYMS') found in the corpus, weighted by their number of documents.  For prefix search, each
+suggestion is indexed by the normalized (accent-free, lower case) suffixes of its text starting at a word, in a
+sorted list: the suggestions completing a query are a contiguous range found by binary search, so 'data sc'
+finds 'Master Data Science' and 'miage' finds the MIAGE expansion.  Queries whose words are not contiguous in a
+suggestion fall back to the intersection of the suggestions matching each word.
+
+Like the facet index, it's built offline (see 'loader.py create-suggestion-index') and stamped with the corpus
+hash.  Lookups take well under a millisecond on the full corpus.
+"""
+
+# cSpell: disable
+
+import json
+import re
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from genai_tk.utils.config_mngr import global_config
+from langchain_core.documents import Document
+from loguru import logger
+from pydantic import BaseModel
+from unidecode import unidecode
+
+from genai_blueprint.demos.mon_master_search.bm25_index import IndexStamp, compute_stamp
+from genai_blueprint.demos.mon_master_search.doc_store import iter_documents
+from genai_blueprint.demos.mon_master_search.model_subset import ACRONYMS
+
+SUGGEST_FILE = "mon_master_suggestions.json"
+KEY_LENGTH = 32  # indexed length of the suffixes ; longer queries are checked on the full text
+MIN_WORD_PREFIX = 2
+LARGE_RANGE = 20_000
+
+SuggestionKind = Literal["formation", "parcours", "discipline", "acronyme"]
+
+
+class Suggestion(BaseModel):
+    text: str
+    kind: SuggestionKind
+    count: int
+
+
+def suggestion_index_file() -> Path:
+    return Path(global_config().get_str("vector_store.path")) / SUGGEST_FILE
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w]+", " ", unidecode(text).lower())).strip()
+
+
+def _content_items(doc: Document, field: str) -> list[str]:
+    """Items of a 'field: a; b' line of the document content, without acronym expansions added by the loader."""
+    for line in doc.page_content.splitlines():
+        if line.startswith(f"{field}: "):
+            items = [item.strip() for item in line.removeprefix(f"{field}: ").split(";") if item.strip()]
+            return [i for i in items if not any(i.startswith(f"{j} (") for j in items if j != i)]
+    return []
+
+
+def _range(keys: list[str], prefix: str) -> tuple[int, int]:
+    return bisect_left(keys, prefix), bisect_left(keys, prefix + "\uffff")
+
+
+class SuggestionIndex:
+    """Suggestions, with a sorted list of their word-starting normalized suffixes."""
+
+    def __init__(self, suggestions: list[Suggestion]) -> None:
+        self.suggestions = suggestions
+        self.normalized = [normalize(s.text) for s in suggestions]
+        self.counts = np.array([s.count for s in suggestions], dtype=np.int64)
+        keys = []
+        for i, text in enumerate(self.normalized):
+            starts = [0] + [m.end() for m in re.finditer(" ", text)]
+            keys.extend((text[start : start + KEY_LENGTH], i, start == 0) for start in starts)
+        keys.sort()
+        self.keys = [key for key, _, _ in keys]
+        self.ids = np.array([i for _, i, _ in keys], dtype=np.int32)
+        at_start = np.array([first for _, _, first in keys], dtype=bool)
+        # suggestions starting with the query come before those having another word starting with it
+        self.key_scores = self.counts[self.ids] + np.where(at_start, int(self.counts.max(initial=0)) + 1, 0)
+        self.by_score = np.argsort(-self.key_scores, kind="stable")
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Document]) -> "SuggestionIndex":
+        counters: dict[SuggestionKind, Counter[str]] = {
+            "formation": Counter(),
+            "parcours": Counter(),
+            "discipline": Counter(),
+            "acronyme": Counter(),
+        }
+        acronyms = re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(ACRONYMS, key=len, reverse=True))) + r")\b")
+        for doc in docs:
+            if title := doc.metadata.get("for_intitule"):
+                counters["formation"][title] += 1
+            counters["parcours"].update(set(_content_items(doc, "parcours")))
+            counters["discipline"].update(set(_content_items(doc, "disciplines")))
+            counters["acronyme"].update(set(acronyms.findall(doc.page_content)))
+        suggestions, seen = [], set()
+        for kind, counter in counters.items():
+            for text, count in counter.most_common():
+                if kind == "acronyme":
+                    text = f"{text} ({ACRONYMS[text]})"
+                if (key := (kind, normalize(text))) not in seen and key[1]:
+                    seen.add(key)
+                    suggestions.append(Suggestion(text=text, kind=kind, count=count))
+        return cls(suggestions)
+
+    def _positions(self, query: str) -> tuple[int, int] | np.ndarray:
+        """Positions in 'keys' of the word-starting suffixes beginning with the query: a range, or an array."""
+        lo, hi = _range(self.keys, query[:KEY_LENGTH])
+        if len(query) <= KEY_LENGTH:
+            return lo, hi
+        return np.array([p for p in range(lo, hi) if query in self.normalized[self.ids[p]]], dtype=np.int64)
+
+    def _top(self, positions: np.ndarray, k: int) -> list[int]:
+        """Ids of the best suggestions among key positions."""
+        order = positions[np.argsort(-self.key_scores[positions], kind="stable")]
+        ids = self.ids[order]
+        _, first = np.unique(ids, return_index=True)  # best key of each suggestion
+        return ids[np.sort(first)][:k].tolist()
+
+    def _top_in_range(self, lo: int, hi: int, k: int) -> list[int]:
+        if hi - lo <= LARGE_RANGE:
+            return self._top(np.arange(lo, hi), k)
+        # short queries match a large part of the keys: scan all keys, best first, until k are found
+        found: dict[int, None] = {}
+        for start in range(0, len(self.by_score), LARGE_RANGE):
+            chunk = self.by_score[start : start + LARGE_RANGE]
+            found.update(dict.fromkeys(self.ids[chunk[(chunk >= lo) & (chunk < hi)]].tolist()))
+            if len(found) >= k:
+                break
+        return list(found)[:k]
+
+    def _word_ids(self, word: str) -> np.ndarray:
+        positions = self._positions(word)
+        return np.unique(self.ids[positions[0] : positions[1]] if isinstance(positions, tuple) else self.ids[positions])
+
+    def suggest(self, query: str, k: int = 8) -> list[Suggestion]:
+        """Most frequent suggestions completing the query.  Those starting with it come first, by frequency."""
+        query = normalize(query)
+        if not query:
+            return []
+        positions = self._positions(query)
+        if isinstance(positions, tuple):
+            ids = self._top_in_range(*positions, k)
+        else:
+            ids = self._top(positions, k)
+        if not ids and " " in query:  # words in another order, or not contiguous
+            words = [w for w in query.split(" ") if len(w) >= MIN_WORD_PREFIX]
+            if words:
+                common = self._word_ids(words[0])
+                for word in words[1:]:
+                    common = np.intersect1d(common, self._word_ids(word), assume_unique=True)
+                ids = common[np.argsort(-self.counts[common], kind="stable")][:k].tolist()
+        return [self.suggestions[i] for i in ids]
+
+    def save(self, file: Path, stamp: IndexStamp) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file.with_name(file.name + ".tmp")
+        data = {"stamp": stamp.model_dump(), "suggestions": [s.model_dump() for s in self.suggestions]}
+        tmp_file.write_text(json.dumps(data, ensure_ascii=False))
+        tmp_file.replace(file)
+
+    @classmethod
+    def load(cls, file: Path) -> tuple["SuggestionIndex", IndexStamp]:
+        data = json.loads(file.read_text())
+        index = cls([Suggestion.model_validate(s) for s in data["suggestions"]])
+        return index, IndexStamp.model_validate(data["stamp"])
+
+
+def build_suggestion_index(source: Path, file: Path | None = None) -> SuggestionIndex:
+    """Build the suggestion index of the documents in the given JSONL file, and save it."""
+    file = file or suggestion_index_file()
+    stamp = compute_stamp(source, [])
+    index = SuggestionIndex.from_documents(iter_documents(source))
+    index.save(file, stamp)
+    logger.info("suggestion index of {} suggestions written in {}", len(index.suggestions), file)
+    return index
+
+
+def load_suggestion_index(source: Path, file: Path | None = None) -> SuggestionIndex:
+    """Load the suggestion index, or rebuild it if it's missing or outdated."""
+    file = file or suggestion_index_file()
+    try:
+        index, previous = SuggestionIndex.load(file)
+    except (OSError, ValueError, KeyError):
+        logger.info("suggestion index missing or unreadable - build it")
+        return build_suggestion_index(source, file)
+    if compute_stamp(source, [], previous).source_sha256 != previous.source_sha256:
+        logger.info("suggestion index outdated - rebuild it")
+        return build_suggestion_index(source, file)
+    return index
@@ -0,0 +1,136 @@
+"""spaCy text preprocessing (lemmatization and stop words removal) for BM25 keyword search.
+
+The pipeline runs with only the components needed for lemmas (parser and NER are disabled).  Corpus texts are
+processed in batches with 'nlp.pipe', in several processes, and their tokens are kept in a SQLite cache keyed by
+text hash and preprocessing version: rebuilding the BM25 index after a small corpus change only processes the
+new or modified texts.  Queries are processed one at a time, with an in-memory LRU cache.
+"""
+
+# cSpell: disable
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+PREPROCESS_VERSION = "lemma-v1"  # to change when 'tokens' changes
+DISABLED_COMPONENTS = ["parser", "ner", "senter"]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Persistent tokens of texts, keyed by text hash and preprocessing version."""
+
+    def __init__(self, path: Path, version: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.version = version
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens "
+                "(hash TEXT NOT NULL, version TEXT NOT NULL, tokens TEXT NOT NULL, PRIMARY KEY (hash, version))"
+            )
+
+    def get_many(self, hashes: Iterable[str]) -> dict[str, list[str]]:
+        hashes = list(hashes)
+        result = {}
+        for i in range(0, len(hashes), 500):  # stay below SQLite max number of parameters
+            chunk = hashes[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT hash, tokens FROM tokens WHERE version = ? AND hash IN ({placeholders})",
+                [self.version, *chunk],
+            )
+            result.update({h: json.loads(tokens) for h, tokens in rows})
+        return result
+
+    def put_many(self, tokens: dict[str, list[str]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)",
+                [(h, self.version, json.dumps(t, ensure_ascii=False)) for h, t in tokens.items()],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SpacyPreprocessor:
+    """Callable turning a text into lemmas, without stop words and punctuation.
+
+    Use 'preprocess_many' to process a corpus in batches: the tokens are then memorized, so calls on these texts
+    (ex: by 'BM25FastRetriever.from_documents') are lookups.
+    """
+
+    def __init__(self, model: str, stop_words: Iterable[str] = (), cache_file: Path | None = None) -> None:
+        self.model = model
+        self.stop_words = frozenset(w.lower() for w in stop_words)
+        self.cache_file = cache_file
+        self._nlp: Any = None
+        self._lock = threading.Lock()
+        self._memo: dict[str, list[str]] = {}
+        self._single = lru_cache(maxsize=4096)(self._process_one)
+
+    @property
+    def nlp(self) -> Any:
+        with self._lock:
+            if self._nlp is None:
+                import spacy
+
+                self._nlp = spacy.load(self.model, disable=DISABLED_COMPONENTS)
+            return self._nlp
+
+    @property
+    def version(self) -> str:
+        """Identify the model, its version, the stop words and the token selection."""
+        stop_words_hash = text_hash(json.dumps(sorted(self.stop_words)))[:12]
+        return f"{self.model}-{self.nlp.meta.get('version', '')}-{stop_words_hash}-{PREPROCESS_VERSION}"
+
+    def tokens(self, doc: Any) -> list[str]:
+        lemmas = (t.lemma_.lower() for t in doc if not (t.is_stop or t.is_punct or t.is_space))
+        return [lemma for lemma in lemmas if lemma.strip() and lemma not in self.stop_words]
+
+    def _process_one(self, text: str) -> list[str]:
+        return self.tokens(self.nlp(text))
+
+    def __call__(self, text: str) -> list[str]:
+        memo = self._memo.get(text_hash(text)) if self._memo else None
+        return memo if memo is not None else list(self._single(text))
+
+    def preprocess_many(self, texts: list[str], n_process: int = 1, batch_size: int = 256) -> list[list[str]]:
+        """Process texts in batches (in 'n_process' processes), using and feeding the persistent cache."""
+        hashes = [text_hash(t) for t in texts]
+        cache = TokenCache(self.cache_file, self.version) if self.cache_file else None
+        try:
+            known = cache.get_many(set(hashes)) if cache else {}
+            missing = {h: t for h, t in zip(hashes, texts, strict=True) if h not in known}
+            logger.info("preprocess {} texts ({} not in cache) with {} processes", len(texts), len(missing), n_process)
+            new_tokens, pending = {}, {}
+            docs = self.nlp.pipe(missing.values(), n_process=n_process, batch_size=batch_size)
+            for h, doc in zip(missing, docs, strict=True):
+                new_tokens[h] = pending[h] = self.tokens(doc)
+                if cache and len(pending) >= 10_000:  # store progressively, so an interrupted run is not lost
+                    cache.put_many(pending)
+                    pending.clear()
+            if cache:
+                cache.put_many(pending)
+        finally:
+            if cache:
+                cache.close()
+        known |= new_tokens
+        self._memo.update(known)
+        return [known[h] for h in hashes]
+
+    def clear_memo(self) -> None:
+        """Forget the tokens memorized by 'preprocess_many' (they stay in the persistent cache)."""
+        self._memo.clear()
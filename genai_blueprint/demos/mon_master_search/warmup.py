@@ -0,0 +1,126 @@
+"""Background warmup of the mon_master search models and indexes.
+
+A daemon thread loads the embeddings model and vector index, then the spaCy model and BM25 index, then the
+filter indexes, so searches do not wait for them.  Readiness is exposed per
+search mode, so the UI can enable modes as they become ready.  Load timings are logged.
+
+It's started at server start, since this module is listed in the 'ui.warmup' configuration list (remove it to
+opt out), or else when the page is first opened.
+"""
+
+# cSpell: disable
+
+import threading
+import time
+from collections.abc import Callable
+from functools import cache
+from typing import Literal
+
+from loguru import logger
+from pydantic import BaseModel
+
+from genai_blueprint.demos.mon_master_search import search as master_search
+from genai_blueprint.demos.mon_master_search.bm25_index import get_preprocessor, spacy_model_available
+from genai_blueprint.demos.mon_master_search.search import SearchMode
+
+TaskState = Literal["pending", "loading", "ready", "failed"]
+
+MODE_REQUIREMENTS: dict[SearchMode, tuple[str, ...]] = {
+    SearchMode.VECTOR: ("vector",),
+    SearchMode.KEYWORD: ("keyword",),
+    SearchMode.HYBRID: ("vector", "keyword"),
+}
+
+
+class TaskStatus(BaseModel):
+    state: TaskState = "pending"
+    seconds: float | None = None
+    error: str | None = None
+
+
+class Warmup:
+    """Run loading tasks, in order, in a background thread, and track their status."""
+
+    def __init__(self, tasks: dict[str, Callable[[], object]]) -> None:
+        self.tasks = tasks
+        self.status = {name: TaskStatus() for name in tasks}
+        self._done = {name: threading.Event() for name in tasks}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "Warmup":
+        """Start the warmup thread, if not already started."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mon_master_warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        total = time.perf_counter()
+        for name, task in self.tasks.items():
+            self.status[name] = TaskStatus(state="loading")
+            start = time.perf_counter()
+            try:
+                task()
+            except Exception as ex:
+                self.status[name] = TaskStatus(state="failed", seconds=time.perf_counter() - start, error=str(ex))
+                logger.warning("warmup: {} failed after {:.1f}s: {}", name, self.status[name].seconds, ex)
+            else:
+                self.status[name] = TaskStatus(state="ready", seconds=time.perf_counter() - start)
+                logger.info("warmup: {} ready in {:.1f}s", name, self.status[name].seconds)
+            self._done[name].set()
+        logger.info("warmup done in {:.1f}s", time.perf_counter() - total)
+
+    def mode_state(self, mode: SearchMode) -> TaskState:
+        states = {self.status[name].state for name in MODE_REQUIREMENTS[mode]}
+        for state in ("failed", "loading", "pending"):
+            if state in states:
+                return state  # type: ignore
+        return "ready"
+
+    def is_ready(self, mode: SearchMode) -> bool:
+        return self.mode_state(mode) == "ready"
+
+    def wait(self, mode: SearchMode, timeout: float | None = None) -> bool:
+        """Wait until the tasks needed by a mode are done.  Return True if the mode is ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in MODE_REQUIREMENTS[mode]:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._done[name].wait(remaining):
+                return False
+        return self.is_ready(mode)
+
+    @property
+    def finished(self) -> bool:
+        return all(event.is_set() for event in self._done.values())
+
+
+def _warm_vector() -> None:
+    vectorstore = master_search.get_sparse_retriever().vectorstore
+    vectorstore.embeddings.embed_query("query : warmup")  # type: ignore # loads the model weights
+
+
+def _warm_keyword() -> None:
+    if not spacy_model_available():
+        raise RuntimeError("spaCy model is not installed")
+    get_preprocessor()("warmup")
+    master_search.get_bm25_retriever()
+
+
+def _warm_filters() -> None:
+    master_search.get_facet_index()
+    master_search.get_spatial_index()
+    master_search.get_suggestion_index()
+    if master_search.is_collapsed():
+        master_search.get_duplicate_groups()
+
+
+@cache
+def get_warmup() -> Warmup:
+    return Warmup({"vector": _warm_vector, "keyword": _warm_keyword, "filters": _warm_filters})
+
+
+def start_warmup() -> Warmup:
+    """Start the background warmup (once per process) and return it."""
+    return get_warmup().start()
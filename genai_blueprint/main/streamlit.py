@@ -37,6 +37,25 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+
+@st.cache_resource(show_spinner=False)
+def _start_warmups() -> None:
+    """Call once per server the 'start_warmup()' function of the modules listed in 'ui.warmup'.
+
+    They load models and indexes in background, so pages don't wait for them on first use.
+    """
+    import importlib
+
+    for module_name in global_config().get_list("ui.warmup", []):
+        try:
+            importlib.import_module(module_name).start_warmup()
+            logger.info("background warmup started: {}", module_name)
+        except Exception as ex:
+            logger.error("cannot start warmup of {}: {}", module_name, ex)
+
+
+_start_warmups()
+
 # Initialize session state for authentication
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
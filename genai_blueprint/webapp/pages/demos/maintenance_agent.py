@@ -29,8 +29,8 @@ from langgraph.checkpoint.memory import MemorySaver
 from loguru import logger  # noqa: F401
 
 from genai_blueprint.demos.maintenance_agent.dummy_data import dummy_database
+from genai_blueprint.demos.maintenance_agent.procedures import DATA_PATH
 from genai_blueprint.demos.maintenance_agent.tools import (
-    DATA_PATH,
     PROCEDURES,
     create_maintenance_tools,
 )
@@ -93,7 +93,7 @@ if b_column[0].button("See Planning DB"):
         print(sql)
 
 if b_column[1].button("See Sensors Values DB"):
-    sql = """SELECT *  FROM "sensor_data" ;"""
+    sql = """SELECT * FROM "sensor_data" ORDER BY date DESC LIMIT 1000 ;"""
     df = pd.read_sql(sql, dummy_database())
     with st.expander("Sensor Values Database", expanded=True):
         st.write(sql)
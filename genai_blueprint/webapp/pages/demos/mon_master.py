@@ -2,21 +2,29 @@
 
 # cSpell: disable
 
+import math
 import timeit
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
-from langchain_classic.retrievers import EnsembleRetriever
+from langchain_core.documents import Document
 from langchain_core.runnables import Runnable
+from langchain_core.vectorstores import VectorStoreRetriever
 from streamlit import session_state as sss
 
 try:
-    import src.demos.mon_master_search.search as master_search
     from genai_tk.utils.config_mngr import global_config
 
+    import genai_blueprint.demos.mon_master_search.search as master_search
+    from genai_blueprint.demos.mon_master_search.facets import FacetFilters, FacetIndex
+    from genai_blueprint.demos.mon_master_search.hybrid import HybridRetriever
     from genai_blueprint.demos.mon_master_search.loader import add_accronym
+    from genai_blueprint.demos.mon_master_search.model_manager import available_namespaces
     from genai_blueprint.demos.mon_master_search.model_subset import EXAMPLE_QUERIES
+    from genai_blueprint.demos.mon_master_search.search_cache import SearchCache
+    from genai_blueprint.demos.mon_master_search.spatial_index import GeoFilter
+    from genai_blueprint.demos.mon_master_search.suggest import SuggestionIndex
+    from genai_blueprint.demos.mon_master_search.warmup import start_warmup
 except Exception as ex:
     st.error(f"Problem loading demo: {ex} ")
     st.stop()
@@ -26,6 +34,19 @@ LLM = "google_gemini3flash_google"
 
 DEFAULT_RESULT_COUNT = 100
 
+MODEL_CAPTIONS = {
+    "mistral_1024_edenai": "Mistral 1024",
+    "ada_002_edenai": "OpenAI Ada 002",
+    "camembert_large_local": "Large model for French",
+    "solon_large_local": "SOTA model for French",
+}
+
+FACET_LABELS = {
+    "modalite_enseignement": "Modalité d'enseignement",
+    "eta_name": "Établissement",
+    "licences_conseillees": "Licences conseillées",
+}
+
 ################################
 #  UI
 ################################
@@ -40,47 +61,48 @@ title_col1.title("Recherche Sémantique de Masters")
 title_col2.image(logo_eviden, width=250)
 
 
-# Check if spacy is available
-if "spacy_available" not in sss:
-    try:
-        master_search.get_bm25_retriever()
+# Models and indexes are loaded in background, since the first visit (or server start, see "ui.warmup"):
+# search modes are enabled when ready
+warmup = start_warmup()
+if warmup.status["keyword"].state == "failed":
+    st.warning(f"Keyword and Hybrid search modes are disabled: {warmup.status['keyword'].error}")
 
-        sss.spacy_available = True
-    except Exception:
-        sss.spacy_available = False
 
-if not sss.spacy_available:
-    st.warning("Spacy model is not installed. Keyword and Hybrid search modes are disabled..")
+@st.fragment(run_every=2)
+def _warmup_progress() -> None:
+    """Show loading progress, and rerun the page when a model or index becomes ready."""
+    states = {name: status.state for name, status in warmup.status.items()}
+    if states != sss.setdefault("warmup_states", states):
+        sss.warmup_states = states
+        st.rerun()
+    st.caption(" · ".join(f"{name}: {state}" for name, state in states.items()))
 
 
 with st.sidebar:
-    # Only show search method options if spacy is available
-    if sss.spacy_available:
-        search_method = st.radio("Select Search Method:", ["Vector", "Keyword", "Hybrid"], index=2)
+    ready_modes = [mode.value for mode in master_search.SearchMode if warmup.is_ready(mode)]
+    search_method = None
+    if ready_modes:
+        default_mode = "Hybrid" if "Hybrid" in ready_modes else ready_modes[0]
+        search_method = st.radio("Select Search Method:", ready_modes, index=ready_modes.index(default_mode))
         if search_method == "Hybrid":
             ratio_spinner = st.slider("Keyword  / Vector ratio", min_value=0.0, max_value=1.0, value=0.5, step=0.1)
     else:
-        search_method = "Vector"
+        st.info("Chargement des modèles...")
+    if not warmup.finished:
+        _warmup_progress()
 
+    # the default model uses the configured vector store, the others their precomputed namespace (if built)
     default_embeddings = global_config().get_str("embeddings.models.default")
+    namespaces = [model_id for model_id in available_namespaces() if model_id != default_embeddings]
     embeddings_model = st.radio(
         "Embedding Model:",
-        options=[
-            default_embeddings,
-            "mistral_1024_edenai",
-            "ada_002_edenai",
-            "camembert_large_local",
-            "solon_large_local",
-        ],
-        captions=[
-            "Default model",
-            "Mistral 1024",
-            "OpenAI Ada 002",
-            "Large model for French",
-            "SOTA model for French",
-        ],
+        options=[default_embeddings] + namespaces,
+        captions=["Default model"] + [MODEL_CAPTIONS.get(model_id, "") for model_id in namespaces],
         index=0,
     )
+    if metrics := master_search.get_model_manager().metrics:
+        with st.expander("Modèles chargés"):
+            st.dataframe([{"model": model_id} | m.model_dump() for model_id, m in metrics.items()], hide_index=True)
     result_count = int(
         st.number_input(
             "Nombre de parcours recherchés",
@@ -89,16 +111,65 @@ with st.sidebar:
             value=DEFAULT_RESULT_COUNT,
         )
     )
+    result_page = int(st.number_input("Page", min_value=1, value=1))
+
+
+@st.cache_resource(show_spinner="load facets...")
+def _get_facet_index() -> FacetIndex:
+    return master_search.get_facet_index()
+
+
+@st.cache_resource(show_spinner="load suggestions...")
+def _get_suggestion_index() -> SuggestionIndex:
+    return master_search.get_suggestion_index()
+
+
+with st.sidebar.expander("Filtres"):
+    facet_counts = _get_facet_index().facet_counts()
+    filters: FacetFilters = {}
+    for field, label in FACET_LABELS.items():
+        counts = facet_counts[field]
+        selected = st.multiselect(label, options=list(counts), format_func=lambda v, c=counts: f"{v} ({c[v]})")
+        if selected:
+            filters[field] = selected
+    near: GeoFilter | None = None
+    city = st.text_input("Près de (ville)")
+    radius_km = st.slider("Rayon (km)", min_value=5, max_value=300, value=50, step=5)
+    if city:
+        position = master_search.get_spatial_index().locate(city)
+        if position:
+            near = GeoFilter(lat=position[0], lon=position[1], radius_km=radius_km)
+        else:
+            st.warning(f"Pas de formation trouvée à '{city}'")
 
 example = st.selectbox("Examples:", EXAMPLE_QUERIES, index=None)
+
+# Typeahead : check that a term matches formations before running a full search
+suggestion = None
+typed = st.text_input("Intitulé, discipline ou sigle :", placeholder="ex: MIAGE, data science")
+if typed:
+    suggestions = _get_suggestion_index().suggest(typed, k=8)
+    if suggestions:
+        suggestion = st.pills(
+            "Suggestions:",
+            [s.text for s in suggestions],
+            format_func=lambda text, c={s.text: s.count for s in suggestions}: f"{text} ({c[text]})",
+        )
+    else:
+        st.caption(f"Aucune formation ne correspond à '{typed}'")
+
 with st.form(key="form"):
-    user_input = st.text_area(label="Recherche:", value=example or "", height=70)
+    user_input = st.text_area(label="Recherche:", value=suggestion or example or "", height=70)
     submit_clicked = st.form_submit_button("Rechercher")
 
 
-@st.cache_resource(show_spinner="Load vector store...")
-def _get_sparse_retriever(embeddings_model_id: str) -> Runnable:
-    return master_search.get_sparse_retriever(embeddings_model_id)
+def _get_sparse_retriever(embeddings_model_id: str) -> VectorStoreRetriever:
+    """Vector retriever of a model.  Models are loaded, and unloaded, by the model manager of 'search.py'."""
+    embeddings_id = None if embeddings_model_id == default_embeddings else embeddings_model_id
+    if embeddings_id and not master_search.get_model_manager().is_loaded(embeddings_id):
+        with st.spinner(f"load embeddings model {embeddings_id}..."):
+            return master_search.get_sparse_retriever(embeddings_id)
+    return master_search.get_sparse_retriever(embeddings_id)
 
 
 @st.cache_resource(show_spinner="index documents for keyword search...")
@@ -106,56 +177,108 @@ def _get_bm25_retriever() -> Runnable:
     return master_search.get_bm25_retriever()
 
 
-@st.cache_resource(show_spinner="load hybrid model...")
-def get_ensemble_retriever(embeddings_model_id: str, ratio_sparse: float) -> EnsembleRetriever:
-    return master_search.get_ensemble_retriever(embeddings_model_id, ratio_sparse)
+def _get_hybrid_retriever(embeddings_model_id: str) -> HybridRetriever:
+    return HybridRetriever(
+        keyword=_get_bm25_retriever(),
+        vectorstore=_get_sparse_retriever(embeddings_model_id).vectorstore,
+        k=master_search.DEFAULT_RESULT_COUNT,
+    )
+
+
+@st.cache_resource()
+def _get_search_cache() -> SearchCache:
+    """Query embeddings and search results cache, shared by all sessions."""
+    return SearchCache(disk_file=Path(global_config().get_str("vector_store.path")) / "mon_master_search_cache.db")
+
+
+def search_documents(
+    query: str,
+    mode: str,
+    embeddings_model_id: str,
+    limit: int,
+    offset: int,
+    filters: FacetFilters,
+    near: GeoFilter | None,
+) -> list[Document]:
+    """Search, using the cache.  Candidates are cached in blocks of 100 unique hits, shared between pages."""
+    restricted = bool(filters or near)
+    rows = master_search.matching_rows(filters, near) if restricted else None
+    if rows is not None and len(rows) == 0:
+        return []
+    cache = _get_search_cache()
+    depth = 100 * math.ceil((offset + limit) / 100)
+    version = master_search.index_version(None if embeddings_model_id == default_embeddings else embeddings_model_id)
+    filters_key = tuple(sorted((field, tuple(sorted(values))) for field, values in filters.items()))
+    near_key = near.model_dump_json() if near else ""
+    if mode == "Hybrid":
+        hybrid = _get_hybrid_retriever(embeddings_model_id)
+        if restricted:
+            hybrid = master_search.restrict_retriever(hybrid, filters, near)
+        candidates = cache.ranked(
+            mode,
+            embeddings_model_id,
+            query,
+            version,
+            lambda: hybrid.candidates(query, k=2 * depth),
+            depth=depth,
+            filters=filters_key,
+            near=near_key,
+        )
+        docs = candidates.fuse(ratio_spinner, key=master_search.dedup_key)
+        docs = master_search.expand_documents(docs, rows, hybrid.vectorstore)
+        return master_search.unique_docs(docs)[offset : offset + limit]
+
+    if mode == "Vector":
+        vectorstore = _get_sparse_retriever(embeddings_model_id).vectorstore
+        embedding = cache.query_embedding(embeddings_model_id, query, vectorstore.embeddings.embed_query)
+        retriever = master_search.EmbeddedQueryRetriever(vectorstore=vectorstore, embedding=embedding)
+        if restricted:
+            retriever = master_search.restrict_retriever(retriever, filters, near)
+        retriever = master_search.expand_duplicates(retriever, rows)
+    else:
+        retriever = _get_bm25_retriever()
+        embeddings_model_id = ""
+        if restricted:
+            retriever = master_search.restrict_retriever(retriever, filters, near)
+    ranked = cache.ranked(
+        mode,
+        embeddings_model_id,
+        query,
+        version,
+        lambda: master_search.retrieve_unique(retriever, query, limit=depth),
+        depth=depth,
+        filters=filters_key,
+        near=near_key,
+    )
+    return ranked[offset : offset + limit]
 
 
-df = pd.DataFrame()
-known_set: set[str] = set()
 if submit_clicked:
+    sss.last_query = "query : " + add_accronym(user_input)  # supposed to work well for Solon Embeddings
+
+# In Hybrid mode, results of the last query are re-ranked when the ratio slider moves
+if "last_query" in sss and search_method and (submit_clicked or search_method == "Hybrid"):
     assert embeddings_model is not None
+    offset = (result_page - 1) * result_count
+    start_time = timeit.default_timer()
     try:
-        if search_method == "Vector":
-            retriever = _get_sparse_retriever(embeddings_model)
-        elif search_method == "Keyword":
-            retriever = _get_bm25_retriever()
-        elif search_method == "Hybrid":
-            retriever = get_ensemble_retriever(embeddings_model, ratio_sparse=ratio_spinner)
+        docs = search_documents(
+            sss.last_query,
+            search_method,
+            embeddings_model,
+            limit=result_count,
+            offset=offset,
+            filters=filters,
+            near=near,
+        )
     except ImportError as e:
         st.error(f"Error: {str(e)}. Please ensure all required dependencies are installed.")
         st.stop()
-
-    #  quick and dirty hack to have enough results
-    count = result_count * 2
-
-    config = {"configurable": {"k": count, "search_kwargs": {"k": count}}}
-    user_input = "query : " + add_accronym(user_input)  # supposed to work well for Solon Embeddings
-
-    start_time = timeit.default_timer()
-    result = retriever.invoke(user_input, config=config)  # type: ignore
-    #    print(user_input, result)
     delta_t = timeit.default_timer() - start_time
-    for doc in result:
-        # obj = json.loads(doc.page_content)
-        intitule = doc.page_content.removeprefix("intitulé: ")
-        eta = doc.metadata.get("eta_name")
-        inm = doc.metadata.get("source")
-        for_intitule = doc.metadata["for_intitule"]
-        key = doc.metadata["for_intitule"] + doc.metadata["eta_uai"]
-        parcours = intitule.partition('" : ')[2]
-        parcours = parcours.replace("parcours: ", "=> ").replace("libelés:", " -- ")
-
-        row = {
-            "Intitulé formation:": for_intitule,
-            "Formation => Parcours -- libelés": parcours.lower(),
-            "ETA": eta,
-            "INM(P)": inm,
-            "Content": doc.page_content,
-        }
-        if key not in known_set:
-            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-        known_set.add(key)
+
+    df = master_search.results_to_df(docs)
+    df["Parcours"] = df["Parcours"].str.replace("libelés:", " -- ").str.lower()
+    df = df.rename(columns={"Parcours": "Formation => Parcours -- libelés"})
 
     st.dataframe(df)
     st.write(f"search duration : {delta_t:9.5f} s")
@@ -0,0 +1,90 @@
+"""Tests of the semantic answer cache of the maintenance procedure QA."""
+
+import numpy as np
+import pytest
+
+from genai_blueprint.demos.maintenance_agent import procedure_qa
+from genai_blueprint.demos.maintenance_agent.procedure_qa import SemanticAnswerCache
+
+
+def _vector(*values: float) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(procedure_qa.time, "monotonic", clock)
+    return clock
+
+
+def test_lookup_by_similarity() -> None:
+    cache = SemanticAnswerCache(threshold=0.95)
+    assert cache.lookup(_vector(1, 0, 0)) is None
+    cache.add(_vector(1, 0, 0), "pump")
+    cache.add(_vector(0, 1, 0), "valve")
+
+    answer, similarity = cache.lookup(_vector(1, 0.1, 0)) or ("", 0.0)
+    assert answer == "pump"
+    assert similarity == pytest.approx(0.995, abs=1e-3)
+    assert cache.lookup(_vector(1, 1, 0)) is None  # similarity 0.71
+    assert cache.stats.model_dump() == {"hits": 1, "misses": 2, "invalidations": 0}
+
+
+def test_answers_expire_after_ttl(clock: Clock) -> None:
+    cache = SemanticAnswerCache(ttl=60)
+    cache.add(_vector(1, 0), "old")
+    clock.now += 30
+    cache.add(_vector(0, 1), "new")
+    clock.now += 20
+    assert cache.lookup(_vector(1, 0)) == ("old", pytest.approx(1.0))
+
+    clock.now += 20  # 'old' is 70s old, 'new' 40s
+    assert cache.lookup(_vector(1, 0)) is None
+    assert cache.answers == ["new"]
+    assert cache.lookup(_vector(0, 1)) == ("new", pytest.approx(1.0))
+
+    clock.now += 60
+    assert cache.lookup(_vector(0, 1)) is None
+    assert cache.answers == []
+
+
+def test_zero_ttl_disables_hits(clock: Clock) -> None:
+    cache = SemanticAnswerCache(ttl=0)
+    cache.add(_vector(1, 0), "answer")
+    assert cache.lookup(_vector(1, 0)) is None
+    cache.add(_vector(1, 0), "answer")  # the cache can be filled again after it expired
+    assert cache.answers == ["answer"]
+
+
+def test_new_version_clears_the_cache() -> None:
+    cache = SemanticAnswerCache()
+    cache.check_version("v1:llm")
+    cache.add(_vector(1, 0), "answer")
+    cache.check_version("v1:llm")
+    assert cache.lookup(_vector(1, 0)) is not None
+
+    cache.check_version("v2:llm")
+    assert cache.lookup(_vector(1, 0)) is None
+    assert cache.stats.invalidations == 1
+    cache.check_version("v2:other_llm")  # nothing to clear
+    assert cache.stats.invalidations == 1
+
+
+def test_size_keeps_the_most_recent_answers() -> None:
+    cache = SemanticAnswerCache(size=2)
+    for i, vector in enumerate([_vector(1, 0, 0), _vector(0, 1, 0), _vector(0, 0, 1)]):
+        cache.add(vector, f"answer {i}")
+    assert cache.answers == ["answer 1", "answer 2"]
+    assert len(cache.vectors) == len(cache.created) == 2
+    assert cache.lookup(_vector(1, 0, 0)) is None
+    assert cache.lookup(_vector(0, 0, 1)) == ("answer 2", pytest.approx(1.0))
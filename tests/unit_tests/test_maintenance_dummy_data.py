@@ -0,0 +1,64 @@
+"""Tests of the synthetic plant data generation of the maintenance agent."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from genai_blueprint.demos.maintenance_agent.dummy_data import DEMO_WARNINGS, PlantDataConfig, generate_plant_data
+
+CONFIG = PlantDataConfig(
+    sensors=5, frequency="1h", days=2, end_date="2024-03-01 00:00:00", employees=3, tasks=10, noise=0.1
+)
+
+
+def _rows(file: Path, query: str) -> list[tuple]:
+    with sqlite3.connect(file) as conn:
+        return conn.execute(query).fetchall()
+
+
+def test_row_counts(tmp_path: Path) -> None:
+    file = tmp_path / "plant.db"
+    counts = generate_plant_data(CONFIG, f"sqlite:///{file}")
+    assert counts["sensor_data"] == (2 * 24 + 1) * 5
+    assert counts["tasks"] == 14 + 10  # demo tasks of the 2 demo employees, and the generated ones
+    assert counts["iot_warnings"] == len(DEMO_WARNINGS)
+    for table, count in counts.items():
+        assert _rows(file, f"SELECT COUNT(*) FROM {table}") == [(count,)]
+
+    assert _rows(file, "SELECT MIN(date), MAX(date), COUNT(DISTINCT sensor) FROM sensor_data") == [
+        ("2024-02-28 00:00:00", "2024-03-01 00:00:00", 5)
+    ]
+    assert len(_rows(file, "SELECT DISTINCT employee FROM tasks")) == 3
+    indexes = {name for (name,) in _rows(file, "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"ix_sensor_data_sensor_date", "ix_iot_warnings", "ix_tasks_employee"} <= indexes
+
+
+def test_chunked_load_gives_the_same_data(tmp_path: Path) -> None:
+    files = [tmp_path / "chunked.db", tmp_path / "whole.db"]
+    generate_plant_data(CONFIG.model_copy(update={"chunk_rows": 7}), f"sqlite:///{files[0]}")
+    generate_plant_data(CONFIG, f"sqlite:///{files[1]}")
+    for table in ("sensor_data", "iot_warnings", "tasks"):
+        chunked, whole = (_rows(file, f"SELECT * FROM {table}") for file in files)
+        assert chunked == whole
+
+
+def test_generation_replaces_the_tables(tmp_path: Path) -> None:
+    uri = f"sqlite:///{tmp_path / 'plant.db'}"
+    generate_plant_data(CONFIG, uri)
+    counts = generate_plant_data(CONFIG.model_copy(update={"sensors": 2, "tasks": 0}), uri)
+    assert counts["sensor_data"] == (2 * 24 + 1) * 2
+    assert _rows(tmp_path / "plant.db", "SELECT COUNT(*) FROM sensor_data") == [(counts["sensor_data"],)]
+
+
+@pytest.mark.parametrize("frequency", ["1M", "1ME", "W", "every hour"])
+def test_frequency_must_be_fixed(frequency: str) -> None:
+    with pytest.raises(ValidationError, match="frequency"):
+        PlantDataConfig(frequency=frequency)
+
+
+@pytest.mark.parametrize("field", ["sensors", "days", "chunk_rows"])
+def test_sizes_must_be_positive(field: str) -> None:
+    with pytest.raises(ValidationError, match=field):
+        PlantDataConfig(**{field: 0})
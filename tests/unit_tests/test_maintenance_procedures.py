@@ -0,0 +1,108 @@
+"""Tests of the incremental refresh of the maintenance procedure index."""
+
+import os
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.maintenance_agent import procedures
+from genai_blueprint.demos.maintenance_agent.procedures import ProcedureIndex, RefreshStats
+
+
+class DictStore:
+    """Embeddings store keeping the documents by id, and counting the embedded ones."""
+
+    def __init__(self) -> None:
+        self.docs: dict[str, Document] = {}
+        self.embedded = 0
+
+    def add_documents(self, docs: list[Document]) -> None:
+        self.embedded += len(docs)
+        self.docs.update({doc.id: doc for doc in docs if doc.id})
+
+    def get(self) -> "DictStore":
+        return self
+
+    def delete(self, ids: list[str]) -> None:
+        for chunk_id in ids:
+            del self.docs[chunk_id]
+
+    def document_count(self) -> int:
+        return len(self.docs)
+
+
+@pytest.fixture
+def store() -> DictStore:
+    return DictStore()
+
+
+@pytest.fixture
+def data_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(procedures, "CHUNK_SIZE", 20)
+    path = tmp_path / "procedures"
+    (path / "pumps").mkdir(parents=True)
+    (path / "pumps" / "p1.md").write_text("Stop the pump.\n\nClose the valve.\n\nReplace the seal.")
+    (path / "valves.txt").write_text("Check pressure.")
+    (path / "notes.pdf").write_text("not a procedure")
+    return path
+
+
+def _index(store: DictStore, data_path: Path) -> ProcedureIndex:
+    return ProcedureIndex(store, data_path.parent / "state.json", data_path)  # type: ignore
+
+
+def _sources(store: DictStore) -> dict[str, int]:
+    sources: dict[str, int] = {}
+    for doc in store.docs.values():
+        sources[doc.metadata["source"]] = sources.get(doc.metadata["source"], 0) + 1
+    return sources
+
+
+def test_first_refresh_adds_all_procedures(store: DictStore, data_path: Path) -> None:
+    stats = _index(store, data_path).refresh()
+    assert stats == RefreshStats(files=2, changed_files=2, added_chunks=4, deleted_chunks=0)
+    assert _sources(store) == {"pumps/p1.md": 3, "valves.txt": 1}
+
+
+def test_unchanged_files_are_skipped(store: DictStore, data_path: Path) -> None:
+    index = _index(store, data_path)
+    index.refresh()
+    version = index.version
+    assert index.refresh() == RefreshStats(files=2)
+
+    os.utime(data_path / "valves.txt", ns=(0, 10**18))  # touched, not modified
+    reloaded = _index(store, data_path)
+    assert reloaded.refresh() == RefreshStats(files=2)
+    assert reloaded.version == version
+    assert store.embedded == 4
+
+
+def test_modified_file_embeds_only_new_chunks(store: DictStore, data_path: Path) -> None:
+    index = _index(store, data_path)
+    index.refresh()
+    version = index.version
+    (data_path / "pumps" / "p1.md").write_text("Stop the pump.\n\nClose both valves.\n\nReplace the seal.")
+    stats = index.refresh()
+    assert stats == RefreshStats(files=2, changed_files=1, added_chunks=1, deleted_chunks=1)
+    assert store.embedded == 5
+    assert "Close both valves." in [doc.page_content for doc in store.docs.values()]
+    assert "Close the valve." not in [doc.page_content for doc in store.docs.values()]
+    assert index.version != version
+
+
+def test_removed_and_added_files(store: DictStore, data_path: Path) -> None:
+    index = _index(store, data_path)
+    index.refresh()
+    (data_path / "pumps" / "p1.md").unlink()
+    (data_path / "compressor.md").write_text("Purge the tank.")
+    stats = _index(store, data_path).refresh()
+    assert stats == RefreshStats(files=2, changed_files=1, added_chunks=1, deleted_chunks=3)
+    assert _sources(store) == {"compressor.md": 1, "valves.txt": 1}
+
+
+def test_empty_store_is_indexed_again(store: DictStore, data_path: Path) -> None:
+    _index(store, data_path).refresh()
+    empty = DictStore()
+    assert _index(empty, data_path).refresh().added_chunks == 4
+    assert _sources(empty) == _sources(store)
@@ -0,0 +1,120 @@
+"""Tests of the sensor time-series access of the maintenance agent."""
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from genai_blueprint.demos.maintenance_agent import sensors
+from genai_blueprint.demos.maintenance_agent.sensors import lttb, parse_time_range, sensor_summary
+
+
+def test_lttb_keeps_ends_and_peaks() -> None:
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[321], y[654] = 10.0, -10.0
+    keep = lttb(x, y, 20)
+    assert len(keep) == 20
+    assert keep[0] == 0 and keep[-1] == 999
+    assert {321, 654} <= set(keep.tolist())
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_without_downsampling() -> None:
+    x = np.arange(10, dtype=float)
+    assert lttb(x, x, 10).tolist() == list(range(10))
+    assert lttb(x, x, 50).tolist() == list(range(10))
+    assert lttb(x, x, 2).tolist() == list(range(10))
+
+
+def test_parse_time_range() -> None:
+    assert parse_time_range("2024-03-01", "2024-03-02") == (datetime(2024, 3, 1), datetime(2024, 3, 3))
+    assert parse_time_range("2024-03-01 08:00", "2024-03-01 12:30") == (
+        datetime(2024, 3, 1, 8),
+        datetime(2024, 3, 1, 12, 30),
+    )
+    # an explicit midnight end is exclusive, not the whole day
+    assert parse_time_range("2024-03-01", "2024-03-02 00:00")[1] == datetime(2024, 3, 2)
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "message"),
+    [
+        ("yesterday", "2024-03-02", "invalid start time"),
+        ("2024-03-01", "2024-13-45", "invalid end time"),
+        ("2024-03-01", "", "invalid end time"),
+        ("2024-03-02 10:00", "2024-03-02 09:00", "empty time range"),
+    ],
+)
+def test_parse_time_range_errors(start: str, end: str, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        parse_time_range(start, end)
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> str:
+    """SQLite database with a value per minute of 'temp' during 2024-03-01, and 3 values of 'pressure'."""
+    file = tmp_path / "sensors.db"
+    with sqlite3.connect(file) as conn:
+        conn.execute("CREATE TABLE sensor_data (date TEXT, sensor TEXT, value REAL, unit TEXT)")
+        dates = [f"2024-03-01 {m // 60:02d}:{m % 60:02d}:00" for m in range(1440)]
+        rows = [(date, "temp", 70.0 if m == 600 else 20.0, "°C") for m, date in enumerate(dates)]
+        rows += [(f"2024-03-01 0{h}:00:00", "pressure", float(h), "bar") for h in (1, 2, 3)]
+        conn.executemany("INSERT INTO sensor_data VALUES (?, ?, ?, ?)", rows)
+    return f"sqlite:///{file}"
+
+
+def test_summary_of_few_values(database: str) -> None:
+    summary = sensor_summary(database, ["pressure"], "2024-03-01", "2024-03-01")
+    assert summary.splitlines() == [
+        "pressure (bar): 3 values from 2024-03-01 01:00 to 2024-03-01 03:00; min 1, mean 2, max 3",
+        "  2024-03-01 01:00: 1",
+        "  2024-03-01 02:00: 2",
+        "  2024-03-01 03:00: 3",
+    ]
+
+
+def test_summary_is_downsampled(database: str) -> None:
+    lines = sensor_summary(database, ["temp"], "2024-03-01", "2024-03-01").splitlines()
+    assert lines[0] == "temp (°C): 1440 values from 2024-03-01 00:00 to 2024-03-01 23:59; min 20, mean 20.03, max 70"
+    assert lines[1] == f"  downsampled to {sensors.MAX_POINTS} points (date: value):"
+    assert len(lines) == 2 + sensors.MAX_POINTS
+    assert "  2024-03-01 10:00: 70" in lines
+
+
+def test_summary_is_aggregated(database: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sensors, "LTTB_MAX_ROWS", 100)
+    lines = sensor_summary(database, ["temp"], "2024-03-01", "2024-03-01").splitlines()
+    assert lines[1] == f"  in {sensors.MAX_POINTS} periods of 0 days 00:28:48 (start: min / mean / max):"
+    assert lines[2] == "  2024-03-01 00:00: 20 / 20 / 20"
+    assert "  2024-03-01 09:36: 20 / 21.72 / 70" in lines
+    assert len(lines) == 2 + sensors.MAX_POINTS
+
+
+def test_summary_of_unknown_sensor(database: str) -> None:
+    summary = sensor_summary(database, ["humidity"], "2024-03-01 10:00", "2024-03-01 11:00")
+    assert summary.splitlines()[0] == "humidity: no values between 2024-03-01 10:00:00 and 2024-03-01 11:00:00"
+    assert "known sensors: " in summary
+    assert {"temp", "pressure"} <= set(summary.splitlines()[1].removeprefix("known sensors: ").split(", "))
+
+
+def test_parquet_store_gives_the_same_summary(database: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("duckdb")
+    store = f"parquet://{tmp_path / 'parquet'}"
+    assert sensors.export_sensor_parquet(database, tmp_path / "parquet") == 1443
+    monkeypatch.setattr(sensors, "LTTB_MAX_ROWS", 100)
+    names = ["temp", "pressure", "humidity"]
+    assert sensor_summary(store, names, "2024-03-01", "2024-03-01") == sensor_summary(
+        database, names, "2024-03-01", "2024-03-01"
+    )
+
+
+def test_read_only_database(tmp_path: Path) -> None:
+    file = tmp_path / "readonly.db"
+    with sqlite3.connect(file) as conn:
+        conn.execute("CREATE TABLE sensor_data (date TEXT, sensor TEXT, value REAL, unit TEXT)")
+        conn.execute("INSERT INTO sensor_data VALUES ('2024-03-01 01:00:00', 'pressure', 1.0, 'bar')")
+    summary = sensor_summary(f"sqlite:///file:{file}?mode=ro&uri=true", ["pressure"], "2024-03-01", "2024-03-01")
+    assert summary.startswith("pressure (bar): 1 values")
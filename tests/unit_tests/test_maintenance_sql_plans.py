@@ -0,0 +1,107 @@
+"""Tests of the SQL plan cache of the maintenance planning questions."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from genai_blueprint.demos.maintenance_agent.sql_plans import SqlPlan, SqlPlanCache, extract_sql, read_only_engine
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> str:
+    file = tmp_path / "planning.db"
+    with sqlite3.connect(file) as conn:
+        conn.execute("CREATE TABLE tasks (id INTEGER, employee VARCHAR, procedure VARCHAR, start_date VARCHAR)")
+        conn.executemany(
+            "INSERT INTO tasks VALUES (?, ?, ?, ?)",
+            [
+                (1, "John Smith", "Pump inspection", "2024-05-02"),
+                (2, "John", "Valve replacement", "2024-05-03"),
+                (3, "Anne O'Brien", "Pump inspection", "2024-05-10"),
+            ],
+        )
+    return f"sqlite:///{file}"
+
+
+@pytest.fixture
+def plans(database: str, tmp_path: Path) -> SqlPlanCache:
+    cache = SqlPlanCache(database, tmp_path / "plans.json")
+    cache._check_schema()
+    return cache
+
+
+def test_normalize_extracts_values_and_dates(plans: SqlPlanCache) -> None:
+    template, params = plans.normalize("Tasks assigned to John Smith between 2024-05-02 and 2024-05-10 ?")
+    assert template == "tasks assigned to <tasks.employee> between <date> and <date>"
+    assert params == [("John Smith", "<tasks.employee>"), ("2024-05-02", "<date>"), ("2024-05-10", "<date>")]
+
+
+def test_normalize_prefers_longest_values(plans: SqlPlanCache) -> None:
+    assert plans.normalize("tasks of john smith") == ("tasks of <tasks.employee>", [("John Smith", "<tasks.employee>")])
+    assert plans.normalize("tasks of John") == ("tasks of <tasks.employee>", [("John", "<tasks.employee>")])
+    assert plans.normalize("tasks of Johnny") == ("tasks of johnny", [])
+
+
+def test_questions_of_a_template_share_it(plans: SqlPlanCache) -> None:
+    first, _ = plans.normalize("Who does the Pump inspection on 2024-05-02?")
+    second, params = plans.normalize("who does the valve replacement on 2024-06-01")
+    assert first == second == "who does the <tasks.procedure> on <date>"
+    assert params == [("Valve replacement", "<tasks.procedure>"), ("2024-06-01", "<date>")]
+
+
+def test_make_plan_binds_parameters() -> None:
+    params = [("Anne O'Brien", "<tasks.employee>"), ("2024-05-02", "<date>")]
+    sql = "SELECT id FROM tasks WHERE employee = 'Anne O''Brien' AND start_date >= '2024-05-02'"
+    assert SqlPlanCache._make_plan(sql, params) == SqlPlan(
+        sql="SELECT id FROM tasks WHERE employee = :p0 AND start_date >= :p1",
+        params=["<tasks.employee>", "<date>"],
+    )
+
+
+def test_make_plan_needs_each_value_once() -> None:
+    params = [("2024-05-02", "<date>")]
+    assert SqlPlanCache._make_plan("SELECT COUNT(*) FROM tasks", params) is None
+    twice = "SELECT id FROM tasks WHERE start_date >= '2024-05-02' OR end_date >= '2024-05-02'"
+    assert SqlPlanCache._make_plan(twice, params) is None
+    assert SqlPlanCache._make_plan("SELECT 1", []) == SqlPlan(sql="SELECT 1", params=[])
+
+
+def test_plans_are_reused_and_persisted(
+    plans: SqlPlanCache, database: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    generated = []
+
+    def generate_sql(question: str) -> str:
+        generated.append(question)
+        name = question.removeprefix("tasks of ")
+        return f"SELECT id FROM tasks WHERE employee = '{name}'"
+
+    monkeypatch.setattr(plans, "_generate_sql", generate_sql)
+    assert plans.answer("tasks of John Smith", fallback=str) == "[(1,)]"
+    assert plans.answer("tasks of John", fallback=str) == "[(2,)]"
+    assert generated == ["tasks of John Smith"]
+    assert plans.stats.model_dump() == {"hits": 1, "misses": 1, "fallbacks": 0}
+
+    reloaded = SqlPlanCache(database, tmp_path / "plans.json")
+    assert reloaded.answer("tasks of Anne O'Brien", fallback=str) == "[(3,)]"
+    assert reloaded.stats.hits == 1
+
+
+def test_failed_queries_use_the_fallback(plans: SqlPlanCache, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(plans, "_generate_sql", lambda question: "DELETE FROM tasks")
+    assert plans.answer("remove all tasks", fallback=lambda q: f"agent: {q}") == "agent: remove all tasks"
+    assert plans.stats.fallbacks == 1
+    assert plans.plans == {}
+
+
+def test_extract_sql() -> None:
+    assert extract_sql("```sql\nSELECT 1;\n```") == "SELECT 1"
+    assert extract_sql("  SELECT 1 ;") == "SELECT 1"
+
+
+def test_read_only_engine_needs_a_sqlite_file() -> None:
+    with pytest.raises(ValueError, match="SQLite database file"):
+        read_only_engine("sqlite:///:memory:")
+    with pytest.raises(ValueError, match="SQLite database file"):
+        read_only_engine("postgresql://localhost/planning")
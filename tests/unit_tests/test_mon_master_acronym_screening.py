@@ -0,0 +1,80 @@
+"""Tests of the screening of candidate acronyms, and of its verdict cache."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+pytest.importorskip("enchant", exc_type=ImportError)  # also raised when the enchant C library is missing
+
+from genai_blueprint.demos.mon_master_search import acronym_screening  # noqa: E402
+from genai_blueprint.demos.mon_master_search.acronym_screening import (  # noqa: E402
+    VerdictCache,
+    find_candidates,
+    screen_candidates,
+)
+
+
+class Dict:
+    """Dictionary knowing a few words, and recording the checked ones."""
+
+    WORDS = {"fr": {"MASTER", "DROIT"}, "en": {"DATA"}}
+    checked: list[str] = []
+
+    def __init__(self, lang: str) -> None:
+        self.words = self.WORDS[lang]
+
+    def check(self, word: str) -> bool:
+        self.checked.append(word)
+        return word in self.words
+
+
+@pytest.fixture
+def dictionaries(monkeypatch: pytest.MonkeyPatch) -> type[Dict]:
+    monkeypatch.setattr(acronym_screening.enchant, "Dict", Dict)
+    monkeypatch.setattr(acronym_screening, "dictionaries_version", lambda: "v1")
+    monkeypatch.setattr(Dict, "checked", [])
+    return Dict
+
+
+def test_verdict_cache_is_keyed_by_version(tmp_path: Path) -> None:
+    file = tmp_path / "cache" / "verdicts.db"
+    cache = VerdictCache(file, "v1")
+    cache.put_many({"MIAGE": True, "MASTER": False})
+    cache.put_many({"MIAGE": False})
+    cache.close()
+
+    cache = VerdictCache(file, "v1")
+    assert cache.get_many(["MIAGE", "MASTER", "UFR"]) == {"MIAGE": False, "MASTER": False}
+    assert VerdictCache(file, "v2").get_many(["MIAGE", "MASTER"]) == {}
+
+
+def test_verdict_cache_reads_many_tokens(tmp_path: Path) -> None:
+    cache = VerdictCache(tmp_path / "verdicts.db", "v1")
+    verdicts = {f"T{i}": i % 2 == 0 for i in range(1200)}  # more than the SQLite parameters in a query
+    cache.put_many(verdicts)
+    assert cache.get_many(verdicts) == verdicts
+
+
+def test_find_candidates_streams_documents() -> None:
+    def docs() -> Iterator[Document]:
+        yield Document(page_content="Master MIAGE en UFR de Droit (IA) et DATA")
+        yield Document(page_content="MIAGE, Bac+5, SHS")
+
+    assert find_candidates(docs()) == {"MIAGE", "UFR", "DATA", "SHS"}
+
+
+def test_only_new_candidates_are_screened(tmp_path: Path, dictionaries: type[Dict]) -> None:
+    file = tmp_path / "verdicts.db"
+    cache = VerdictCache(file, "v1")
+    cache.put_many({"MIAGE": True, "UFR": False})
+    cache.close()
+
+    assert screen_candidates({"MIAGE", "UFR", "MASTER", "DATA"}, file) == {"MIAGE"}
+    assert sorted(set(dictionaries.checked)) == ["DATA", "MASTER"]
+    assert VerdictCache(file, "v1").get_many(["MASTER", "DATA"]) == {"MASTER": False, "DATA": False}
+
+    dictionaries.checked.clear()
+    screen_candidates({"MIAGE", "MASTER"}, file)
+    assert dictionaries.checked == []
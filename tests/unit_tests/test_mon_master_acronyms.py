@@ -0,0 +1,53 @@
+"""Tests of the acronym expansion of formation titles and queries."""
+
+import pytest
+
+from genai_blueprint.demos.mon_master_search.acronyms import AcronymExpander
+
+ACRONYMS = {
+    "MIAGE": "Méthodes Informatiques Appliquées à la Gestion des Entreprises",
+    "IA": "Intelligence Artificielle",
+    "MEEF": "Métiers de l'Enseignement, de l'Éducation et de la Formation",
+    "Bac+5": "not an acronym",
+}
+
+
+@pytest.fixture
+def expander() -> AcronymExpander:
+    return AcronymExpander(ACRONYMS)
+
+
+def test_expands_known_acronyms_in_order(expander: AcronymExpander) -> None:
+    expanded = "master IA et MIAGE (Intelligence Artificielle) (Méthodes Informatiques Appliquées à la Gestion des "
+    assert expander.expand("master IA et MIAGE") == expanded + "Entreprises)"
+
+
+def test_leaves_unknown_and_partial_words(expander: AcronymExpander) -> None:
+    assert expander.expand("master MIAGES et XYZ") == "master MIAGES et XYZ"
+    assert expander.expand("master ia") == "master ia"
+
+
+def test_expands_a_repeated_acronym_once(expander: AcronymExpander) -> None:
+    assert expander.expand("IA et IA") == "IA et IA (Intelligence Artificielle)"
+
+
+def test_skips_acronym_with_expansion_word(expander: AcronymExpander) -> None:
+    assert expander.expand("IA : Intelligence") == "IA : Intelligence"
+
+
+def test_skips_acronym_defined_in_text(expander: AcronymExpander) -> None:
+    text = "Méthodes Informatiques Appliquées à la Gestion des Entreprises (MIAGE) et MIAGE"
+    assert expander.expand(text) == text
+
+
+def test_skips_acronym_in_parenthesis(expander: AcronymExpander) -> None:
+    assert expander.expand("master (IA)") == "master (IA)"
+
+
+def test_expand_many(expander: AcronymExpander) -> None:
+    expanded = "IA (Intelligence Artificielle)"
+    assert expander.expand_many(["IA", "x", "IA"]) == [expanded, "x", expanded]
+
+
+def test_no_known_acronym() -> None:
+    assert AcronymExpander({"x1": "y"}).expand("IA") == "IA"
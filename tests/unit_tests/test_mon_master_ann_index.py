@@ -0,0 +1,139 @@
+"""Tests of the memory-mapped vector index of mon_master search."""
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from genai_blueprint.demos.mon_master_search.ann_index import (
+    AnnIndex,
+    MmapVectorStore,
+    _dequantize,
+    _normalize,
+    _quantize,
+    _top_k,
+    build_ann_index,
+)
+
+
+class TableEmbeddings(Embeddings):
+    """Embeddings of texts holding the row of a fixed matrix."""
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.vectors[int(text)].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors[int(text)].tolist()
+
+
+def _build(vectors: np.ndarray, index_dir: Path, **kwargs: Any) -> AnnIndex:
+    docs = [Document(page_content=str(i), metadata={"source": f"s{i}"}) for i in range(len(vectors))]
+    build_ann_index(docs, TableEmbeddings(vectors), "table", index_dir, batch_size=16, **kwargs)
+    return AnnIndex(index_dir)
+
+
+def test_rebuild_does_not_disturb_an_open_index(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    index_dir = tmp_path / "index"
+    old = _build(rng.normal(size=(40, 8)), index_dir)
+    new = _build(rng.normal(size=(30, 8)), index_dir)
+
+    assert old.meta.count == 40 and new.meta.count == 30
+    assert old.document(39).metadata["source"] == "s39"  # still readable, from the replaced files
+    assert len(old.search(np.ones(8), k=5)[0]) == 5
+    assert [p.name for p in tmp_path.iterdir()] == ["index"]  # no temporary directory left
+
+
+def _clustered(count: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Random vectors around random centers, as embeddings of documents on a few topics."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return centers[rng.integers(clusters, size=count)] + 0.5 * rng.normal(size=(count, dim))
+
+
+def _brute_force(vectors: np.ndarray, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    scores = _normalize(queries) @ _normalize(vectors).T
+    top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return top, np.take_along_axis(scores, top, axis=1)
+
+
+def _recall(index: AnnIndex, vectors: np.ndarray, queries: np.ndarray, k: int, nprobe: int = 0) -> float:
+    expected, _ = _brute_force(vectors, queries, k)
+    hits = index.search(queries, k, nprobe=nprobe)
+    found = sum(len({row for row, _ in h} & set(e.tolist())) for h, e in zip(hits, expected, strict=True))
+    return found / expected.size
+
+
+def test_int8_quantization_uses_a_scale_per_row() -> None:
+    vectors = _normalize(np.random.default_rng(0).normal(size=(100, 384)))
+    quantized, scales = _quantize(vectors, "int8")
+    assert quantized.dtype == np.int8 and scales is not None
+    assert np.all(np.abs(quantized).max(axis=1) == 127)  # all the levels are used
+    restored = _dequantize(quantized, scales)
+    assert np.all(np.abs(restored - vectors) <= scales[:, None] / 2 + 1e-7)
+
+    assert np.allclose(_dequantize(quantized), quantized / 127.0)  # index built without scales
+    float16, no_scales = _quantize(vectors, "float16")
+    assert no_scales is None and np.allclose(_dequantize(float16), vectors, atol=1e-3)
+
+
+def test_top_k_is_sorted() -> None:
+    scores = np.array([[0.1, 0.9, 0.5, 0.7], [0.3, 0.2, 0.8, 0.1]])
+    ids = np.array([[10, 11, 12, 13], [20, 21, 22, 23]])
+    best, best_ids = _top_k(scores, ids, 2)
+    assert best_ids.tolist() == [[11, 13], [22, 20]]
+    assert best.tolist() == [[0.9, 0.7], [0.8, 0.3]]
+    assert _top_k(scores, ids, 10)[1].shape == (2, 4)
+
+
+@pytest.mark.parametrize(("dtype", "min_recall", "max_error"), [("float16", 1.0, 1e-3), ("int8", 0.95, 1e-2)])
+def test_exact_search_agrees_with_brute_force(tmp_path: Path, dtype: str, min_recall: float, max_error: float) -> None:
+    vectors = _clustered(500, 32, clusters=10)
+    queries = _clustered(20, 32, clusters=10, seed=1)
+    index = _build(vectors, tmp_path / "index", dtype=dtype)
+    assert _recall(index, vectors, queries, k=10) >= min_recall
+
+    _, expected_scores = _brute_force(vectors, queries, 10)
+    scores = np.array([[score for _, score in hits] for hits in index.search(queries, 10)])
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    assert np.abs(scores - expected_scores).max() < max_error
+
+
+def test_search_restricted_to_rows(tmp_path: Path) -> None:
+    vectors = _clustered(200, 16, clusters=5)
+    index = _build(vectors, tmp_path / "index", dtype="float16")
+    rows = np.arange(0, 200, 3)
+    expected, _ = _brute_force(vectors[rows], vectors[:5], 4)
+    hits = index.search(vectors[:5], 4, rows=rows)
+    assert [[row for row, _ in h] for h in hits] == rows[expected].tolist()
+    assert index.search(vectors[:1], 4, rows=np.array([7]))[0][0][0] == 7
+
+
+def test_ivf_search_recall(tmp_path: Path) -> None:
+    vectors = _clustered(3000, 32, clusters=40)
+    queries = _clustered(50, 32, clusters=40, seed=1)
+    index = _build(vectors, tmp_path / "index", dtype="int8", ivf_lists=16)
+    assert index.meta.ivf_lists == 16
+    assert _recall(index, vectors, queries, k=10, nprobe=4) >= 0.8
+    assert _recall(index, vectors, queries, k=10, nprobe=16) == _recall(index, vectors, queries, k=10)
+
+
+def test_vector_store(tmp_path: Path) -> None:
+    vectors = _clustered(50, 8, clusters=3)
+    _build(vectors, tmp_path / "index")
+    store = MmapVectorStore(tmp_path / "index", TableEmbeddings(vectors))
+    docs = store.similarity_search("7", k=3)
+    assert docs[0].metadata["source"] == "s7"
+    assert store.similarity_search_with_score("7", k=1)[0][1] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_empty_index(tmp_path: Path) -> None:
+    index = _build(np.zeros((0, 8)), tmp_path / "index")
+    assert index.meta.count == 0
+    assert index.search(np.ones((2, 8)), k=3) == [[], []]
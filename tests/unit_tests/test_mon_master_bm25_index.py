@@ -0,0 +1,111 @@
+"""Tests of the stamp and the rebuild of the BM25 index of mon_master search."""
+
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search import bm25_index
+from genai_blueprint.demos.mon_master_search.bm25_index import STAMP_FILE, _read_stamp, compute_stamp, load_bm25_index
+from genai_blueprint.demos.mon_master_search.doc_store import write_documents
+
+
+class Preprocessor:
+    def preprocess_many(self, texts: list[str], n_process: int = 1) -> None:
+        pass
+
+    def clear_memo(self) -> None:
+        pass
+
+
+class Retriever:
+    """BM25 retriever writing its documents in its cache directory, and recording how it was created."""
+
+    created: list[str] = []
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def from_documents(cls, documents: list[Document], cache_dir: Path, **kwargs: Any) -> "Retriever":
+        cls.created.append("build")
+        (cache_dir / "docs.txt").write_text("\n".join(doc.page_content for doc in documents))
+        return cls(cache_dir)
+
+    @classmethod
+    def from_cache(cls, cache_dir: Path, **kwargs: Any) -> "Retriever":
+        cls.created.append("load")
+        return cls(cache_dir)
+
+
+@pytest.fixture
+def source(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(bm25_index, "BM25FastRetriever", Retriever)
+    monkeypatch.setattr(bm25_index, "get_preprocessor", lambda stop_words: Preprocessor())
+    monkeypatch.setattr(Retriever, "created", [])
+    file = tmp_path / "masters.jsonl"
+    write_documents([Document(page_content="master MIAGE"), Document(page_content="master chimie")], file)
+    return file
+
+
+def test_stamp_reuses_the_hash_of_an_unchanged_file(tmp_path: Path) -> None:
+    file = tmp_path / "masters.jsonl"
+    file.write_text("master MIAGE")
+    stamp = compute_stamp(file, ["de", "la"])
+    assert compute_stamp(file, ["la", "de"]) == stamp  # stop words order doesn't matter
+    assert compute_stamp(file, ["de"]).stop_words_sha256 != stamp.stop_words_sha256
+
+    fake = stamp.model_copy(update={"source_sha256": "cached"})
+    assert compute_stamp(file, ["de", "la"], fake).source_sha256 == "cached"  # not re-hashed
+    os.utime(file, ns=(0, 0))
+    assert compute_stamp(file, ["de", "la"], fake).source_sha256 == stamp.source_sha256
+
+
+def test_index_is_built_once_then_loaded(source: Path, tmp_path: Path) -> None:
+    index_dir = tmp_path / "bm25"
+    load_bm25_index(source, index_dir)
+    retriever = load_bm25_index(source, index_dir)
+    assert Retriever.created == ["build", "load"]
+    assert retriever.cache_dir == index_dir
+    assert (index_dir / "docs.txt").read_text() == "master MIAGE\nmaster chimie"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bm25", "masters.jsonl"]  # no temporary directory left
+
+
+def test_touched_source_only_updates_the_stamp(source: Path, tmp_path: Path) -> None:
+    index_dir = tmp_path / "bm25"
+    load_bm25_index(source, index_dir)
+    os.utime(source, ns=(0, 0))
+    load_bm25_index(source, index_dir)
+    assert Retriever.created == ["build", "load"]
+    stamp = _read_stamp(index_dir)
+    assert stamp is not None and stamp.source_mtime_ns == 0
+    assert sorted(p.name for p in index_dir.iterdir()) == ["docs.txt", STAMP_FILE]
+
+
+def test_index_is_rebuilt_when_the_source_or_stop_words_change(source: Path, tmp_path: Path) -> None:
+    index_dir = tmp_path / "bm25"
+    load_bm25_index(source, index_dir)
+    write_documents([Document(page_content="master physique")], source)
+    load_bm25_index(source, index_dir)
+    assert (index_dir / "docs.txt").read_text() == "master physique"
+
+    load_bm25_index(source, index_dir, stop_words=["de"])
+    load_bm25_index(source, index_dir, stop_words=["de"])
+    assert Retriever.created == ["build", "build", "build", "load"]
+
+
+def test_partial_build_keeps_the_previous_index(source: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    index_dir = tmp_path / "bm25"
+    load_bm25_index(source, index_dir)
+    write_documents([Document(page_content="master physique")], source)
+
+    def fail(cls: type, **kwargs: Any) -> None:
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(Retriever, "from_documents", classmethod(fail))
+    with pytest.raises(RuntimeError):
+        load_bm25_index(source, index_dir)
+    assert (index_dir / "docs.txt").read_text() == "master MIAGE\nmaster chimie"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bm25", "masters.jsonl"]
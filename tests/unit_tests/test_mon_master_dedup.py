@@ -0,0 +1,70 @@
+"""Tests of the near-duplicate grouping of mon_master search."""
+
+import numpy as np
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search.dedup import DuplicateGroups, near_duplicate_groups
+
+TEXT = (
+    "Master Informatique parcours Méthodes Informatiques Appliquées à la Gestion des Entreprises. Disciplines : "
+    "informatique, gestion, systèmes d'information, bases de données, génie logiciel, réseaux, "
+    "management de projet, droit du numérique, comptabilité, contrôle de gestion, anglais professionnel, "
+    "stage en entreprise."
+)
+
+
+def _doc(text: str, title: str = "Informatique") -> Document:
+    return Document(page_content=text, metadata={"for_intitule": title})
+
+
+def test_exact_duplicates_are_grouped() -> None:
+    docs = [_doc(TEXT), _doc("Master Chimie, chimie organique et analytique."), _doc(TEXT)]
+    assert near_duplicate_groups(docs).tolist() == [0, 1, 0]
+
+
+def test_near_duplicates_are_grouped() -> None:
+    variant = TEXT.replace("stage en entreprise", "stage en entreprise ou en laboratoire")
+    docs = [_doc("Master Chimie, chimie organique et analytique."), _doc(TEXT), _doc(variant)]
+    assert near_duplicate_groups(docs).tolist() == [0, 1, 1]
+
+
+def test_different_documents_are_not_grouped() -> None:
+    other = "Master Informatique parcours Intelligence Artificielle : apprentissage, vision, langage, optimisation."
+    assert near_duplicate_groups([_doc(TEXT), _doc(other)]).tolist() == [0, 1]
+    assert near_duplicate_groups([_doc(TEXT), _doc(TEXT)], threshold=1.0).tolist() == [0, 0]
+
+
+def test_documents_of_different_titles_are_not_grouped() -> None:
+    assert near_duplicate_groups([_doc(TEXT, "Informatique"), _doc(TEXT, "MIAGE")]).tolist() == [0, 1]
+
+
+def test_groups_are_transitive_and_represented_by_the_first_row() -> None:
+    docs = [_doc("Master Chimie."), _doc(TEXT), _doc("Master Physique."), _doc(TEXT), _doc(TEXT)]
+    group_of = near_duplicate_groups(docs)
+    assert group_of.tolist() == [0, 1, 2, 1, 1]
+    assert near_duplicate_groups([]).tolist() == []
+
+
+class ListStore:
+    """Document store reading from a list."""
+
+    def __init__(self, docs: list[Document]) -> None:
+        self.docs = docs
+
+    def document(self, row: int) -> Document:
+        return self.docs[row]
+
+
+def test_collapse_and_expand() -> None:
+    docs = [_doc(f"doc {i}") for i in range(5)]
+    groups = DuplicateGroups(ListStore(docs), np.array([0, 1, 0, 1, 4]))  # type: ignore
+    assert groups.representatives.tolist() == [0, 1, 4]
+    assert groups.members(1).tolist() == [1, 3]
+    assert groups.representatives_of(np.array([2, 3, 4])).tolist() == [0, 1, 4]
+
+    collapsed = list(groups.collapse(docs))
+    assert [(d.metadata["row"], d.metadata["duplicates"]) for d in collapsed] == [(0, 2), (1, 2), (4, 1)]
+
+    hits = [collapsed[1], collapsed[0]]
+    assert [d.page_content for d in groups.expand(hits)] == ["doc 1", "doc 3", "doc 0", "doc 2"]
+    assert [d.page_content for d in groups.expand(hits, rows=np.array([2, 3]))] == ["doc 3", "doc 2"]
@@ -0,0 +1,71 @@
+"""Tests of the document store of mon_master search."""
+
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search.doc_store import (
+    FRAME_ROWS,
+    index_file,
+    iter_documents,
+    load_document_store,
+    write_documents,
+)
+
+COUNT = 2 * FRAME_ROWS + 10  # several zstd frames
+
+
+def _docs(count: int = COUNT) -> list[Document]:
+    return [
+        Document(page_content=f"Master {i} - Lyon\nparcours é{i}", metadata={"source": f"src{i % 100}", "row": i})
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(params=["corpus.jsonl", "corpus.jsonl.zst"])
+def corpus(request: pytest.FixtureRequest, tmp_path: Path) -> Path:
+    if request.param.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    return tmp_path / request.param
+
+
+def test_round_trip(corpus: Path) -> None:
+    docs = _docs()
+    assert write_documents(docs, corpus) == COUNT
+    assert list(iter_documents(corpus)) == docs
+
+    store = load_document_store(corpus)
+    assert index_file(corpus).exists()
+    assert len(store) == COUNT
+    assert list(store) == docs
+    for row in (0, FRAME_ROWS - 1, FRAME_ROWS, COUNT - 1, 3):
+        assert store.document(row) == docs[row]
+    assert store.documents([COUNT - 1, 0]) == [docs[-1], docs[0]]
+
+
+def test_access_by_source(corpus: Path) -> None:
+    write_documents(_docs(), corpus)
+    store = load_document_store(corpus)
+    assert store.rows_of("src7").tolist() == list(range(7, COUNT, 100))
+    assert store.get("src7") == _docs()[7]
+    assert store.get("unknown") is None
+    assert len(store.rows_of("unknown")) == 0
+
+
+def test_index_is_reloaded_then_rebuilt_when_the_file_changes(corpus: Path) -> None:
+    write_documents(_docs(), corpus)
+    load_document_store(corpus)
+    assert len(load_document_store(corpus)) == COUNT  # loaded from the sidecar index
+
+    write_documents(_docs(5), corpus)
+    store = load_document_store(corpus)
+    assert len(store) == 5
+    assert store.document(4) == _docs()[4]
+
+
+def test_empty_corpus(corpus: Path) -> None:
+    assert write_documents([], corpus) == 0
+    store = load_document_store(corpus)
+    assert len(store) == 0
+    assert list(store) == []
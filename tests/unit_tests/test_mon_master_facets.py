@@ -0,0 +1,66 @@
+"""Tests of the facet index of mon_master search."""
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search.facets import FacetIndex, matches
+
+
+def _doc(source: str, eta: str, modalites: str = "", licences: str = "") -> Document:
+    metadata = {"source": source, "eta_name": eta, "modalite_enseignement": modalites, "licences_conseillees": licences}
+    return Document(page_content=source, metadata=metadata)
+
+
+DOCS = [
+    _doc("s0", "Lyon 1", "présentiel", "Informatique;Mathématiques"),
+    _doc("s1", "Paris Cité", "présentiel;à distance", "Informatique"),
+    _doc("s2", "Lyon 1", "à distance", "Économie"),
+    _doc("s3", "Nantes"),
+]
+
+
+@pytest.fixture
+def index() -> FacetIndex:
+    return FacetIndex.from_documents(DOCS)
+
+
+def test_no_filter_matches_all_rows(index: FacetIndex) -> None:
+    assert index.match({}).tolist() == [0, 1, 2, 3]
+    assert index.match({"eta_name": []}).tolist() == [0, 1, 2, 3]
+
+
+def test_values_of_a_field_are_or_ed(index: FacetIndex) -> None:
+    assert index.match({"eta_name": ["Lyon 1", "Nantes"]}).tolist() == [0, 2, 3]
+
+
+def test_multi_valued_fields_are_split(index: FacetIndex) -> None:
+    assert index.match({"modalite_enseignement": ["à distance"]}).tolist() == [1, 2]
+    assert index.match({"licences_conseillees": ["Informatique", "Mathématiques"]}).tolist() == [0, 1]
+
+
+def test_fields_are_and_ed(index: FacetIndex) -> None:
+    rows = index.match({"eta_name": ["Lyon 1"], "modalite_enseignement": ["à distance"]})
+    assert rows.tolist() == [2]
+
+
+def test_unknown_value_matches_nothing(index: FacetIndex) -> None:
+    assert index.match({"eta_name": ["Bordeaux"]}).tolist() == []
+    assert index.match({"eta_name": ["Lyon 1"], "licences_conseillees": ["Droit"]}).tolist() == []
+
+
+def test_unknown_field_is_an_error(index: FacetIndex) -> None:
+    with pytest.raises(ValueError, match="unknown facet"):
+        index.match({"ville": ["Lyon"]})
+
+
+def test_match_agrees_with_document_filter(index: FacetIndex) -> None:
+    filters = {"eta_name": ["Lyon 1", "Paris Cité"], "licences_conseillees": ["Informatique"]}
+    expected = [row for row, doc in enumerate(DOCS) if matches(doc, filters)]
+    assert index.match(filters).tolist() == expected
+    assert index.sources_of(index.match(filters)) == {"s0", "s1"}
+
+
+def test_facet_counts_of_rows(index: FacetIndex) -> None:
+    assert index.facet_counts()["eta_name"] == {"Lyon 1": 2, "Nantes": 1, "Paris Cité": 1}
+    assert index.facet_counts(np.array([1, 2]))["modalite_enseignement"] == {"à distance": 2, "présentiel": 1}
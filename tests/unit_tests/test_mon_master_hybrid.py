@@ -0,0 +1,68 @@
+"""Tests of the score fusion of the hybrid (keyword + vector) retriever."""
+
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search.hybrid import HybridCandidates, weighted_rrf
+
+
+def _docs(*names: str) -> list[Document]:
+    return [Document(page_content=name) for name in names]
+
+
+def _names(docs: list[Document]) -> list[str]:
+    return [doc.page_content for doc in docs]
+
+
+def test_weighted_rrf_sums_reciprocal_ranks() -> None:
+    keyword, vector = _docs("a", "b", "c"), _docs("c", "d")
+    fused = weighted_rrf([keyword, vector], [0.5, 0.5])
+    # c: 1/63 + 1/61 > a: 1/61 > b: 1/62 = d: 1/62 (ties in first seen order)
+    assert _names(fused) == ["c", "a", "b", "d"]
+
+
+def test_weighted_rrf_constant() -> None:
+    fused = weighted_rrf([_docs("a", "b"), _docs("b", "c")], [0.6, 0.4], c=0)
+    assert _names(fused) == ["b", "a", "c"]  # b: 0.6/2 + 0.4/1 > a: 0.6/1 > c: 0.4/2
+
+
+def test_weighted_rrf_weights() -> None:
+    keyword, vector = _docs("a", "b"), _docs("b", "a")
+    assert _names(weighted_rrf([keyword, vector], [1.0, 0.0])) == ["a", "b"]
+    assert _names(weighted_rrf([keyword, vector], [0.0, 1.0])) == ["b", "a"]
+
+
+def test_weighted_rrf_key_merges_documents() -> None:
+    docs = [Document(page_content=f"p{i}", metadata={"group": i % 2}) for i in range(4)]
+    fused = weighted_rrf([docs], [1.0], key=lambda doc: doc.metadata["group"])
+    assert _names(fused) == ["p0", "p1"]  # first document of each key
+
+
+def test_weighted_rrf_checks_weights() -> None:
+    with pytest.raises(ValueError):
+        weighted_rrf([_docs("a")], [0.5, 0.5])
+
+
+@pytest.fixture
+def candidates() -> HybridCandidates:
+    keyword = list(zip(_docs("a", "b", "c"), [10.0, 5.0, 0.0], strict=True))
+    vector = list(zip(_docs("c", "b"), [0.9, 0.1], strict=True))
+    return HybridCandidates(keyword=keyword, vector=vector)
+
+
+def test_fuse_rrf_ratio(candidates: HybridCandidates) -> None:
+    assert _names(candidates.fuse(0.0)) == ["a", "b", "c"]
+    assert _names(candidates.fuse(1.0))[:2] == ["c", "b"]
+    assert sorted(_names(candidates.fuse(0.5))) == ["a", "b", "c"]
+
+
+def test_fuse_score_normalizes_each_leg(candidates: HybridCandidates) -> None:
+    # keyword: a=1, b=0.5, c=0 ; vector: c=1, b=0
+    assert _names(candidates.fuse(0.5, method="score")) == ["a", "c", "b"]
+    assert _names(candidates.fuse(0.8, method="score")) == ["c", "a", "b"]
+
+
+def test_fuse_score_keeps_best_hit_of_a_key() -> None:
+    keyword = list(zip(_docs("a", "a", "b"), [3.0, 2.0, 1.0], strict=True))
+    fused = HybridCandidates(keyword=keyword, vector=[]).fuse(0.0, method="score")
+    assert _names(fused) == ["a", "b"]
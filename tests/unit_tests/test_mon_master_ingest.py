@@ -0,0 +1,145 @@
+"""Tests of the incremental ingestion of mon_master documents in an embeddings store."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search.dedup import DuplicateGroups, near_duplicate_groups
+from genai_blueprint.demos.mon_master_search.ingest import EmbeddingsIngester, EmbeddingsManifest, IngestStats, doc_key
+
+
+class DictStore:
+    """Embeddings store keeping the documents by id, and counting the embedded ones."""
+
+    def __init__(self) -> None:
+        self.docs: dict[str, Document] = {}
+        self.embedded = 0
+
+    def add_documents(self, docs: list[Document]) -> None:
+        self.embedded += len(docs)
+        self.docs.update({doc.id: doc for doc in docs if doc.id})
+
+    def get(self) -> "DictStore":
+        return self
+
+    def delete(self, ids: list[str]) -> None:
+        for doc_id in ids:
+            del self.docs[doc_id]
+
+
+def _doc(source: str, content: str = "", title: str = "Informatique") -> Document:
+    text = content or f"Master {title} {source} : parcours, disciplines et débouchés du master {source}."
+    return Document(page_content=text, metadata={"source": source, "for_intitule": title})
+
+
+def _ingest(store: DictStore, manifest: Path, docs: list[Document]) -> IngestStats:
+    return EmbeddingsIngester(store, manifest, batch_size=2, max_workers=1).run(docs)  # type: ignore
+
+
+class ListStore(list):
+    """Document store reading from a list."""
+
+    def document(self, row: int) -> Document:
+        return self[row]
+
+
+def _collapse(docs: list[Document]) -> tuple[DuplicateGroups, list[Document]]:
+    groups = DuplicateGroups(ListStore(docs), near_duplicate_groups(docs))  # type: ignore
+    return groups, list(groups.collapse(docs))
+
+
+def test_collapsed_store_refresh_after_a_row_is_inserted(tmp_path: Path) -> None:
+    shared = "Master Informatique : parcours génie logiciel, réseaux, bases de données et systèmes d'information."
+    docs = [_doc("a", shared), _doc("b", shared), _doc("c", title="Chimie")]
+    store, manifest = DictStore(), tmp_path / "manifest.txt"
+    _ingest(store, manifest, _collapse(docs)[1])
+    assert sorted((d.metadata["source"], d.metadata["row"]) for d in store.docs.values()) == [("a", 0), ("c", 2)]
+
+    docs.insert(0, _doc("new", title="Physique"))
+    groups, collapsed = _collapse(docs)
+    _ingest(store, manifest, collapsed)
+    stored = sorted((d.metadata["source"], d.metadata["row"]) for d in store.docs.values())
+    assert stored == [("a", 1), ("c", 3), ("new", 0)]
+    hit = next(d for d in store.docs.values() if d.metadata["source"] == "a")
+    assert [d.metadata["source"] for d in groups.expand([hit])] == ["a", "b"]
+
+
+def test_collapse_toggled_on_an_existing_store(tmp_path: Path) -> None:
+    shared = "Master Informatique : parcours génie logiciel, réseaux, bases de données et systèmes d'information."
+    docs = [_doc("a", shared), _doc("b", shared), _doc("c", title="Chimie")]
+    store, manifest = DictStore(), tmp_path / "manifest.txt"
+    _ingest(store, manifest, docs)
+    assert all("row" not in d.metadata for d in store.docs.values())
+
+    _ingest(store, manifest, _collapse(docs)[1])
+    assert sorted((d.metadata["source"], d.metadata["row"]) for d in store.docs.values()) == [("a", 0), ("c", 2)]
+
+    _ingest(store, manifest, docs)
+    assert sorted(d.metadata["source"] for d in store.docs.values()) == ["a", "b", "c"]
+    assert all("row" not in d.metadata for d in store.docs.values())
+
+
+def test_manifest_diff(tmp_path: Path) -> None:
+    docs = [_doc(source) for source in "abcd"]
+    store, manifest = DictStore(), tmp_path / "manifest.txt"
+    assert _ingest(store, manifest, docs).added == 4
+
+    changed = _doc("b", "Master Informatique b : nouveau programme.")
+    stats = _ingest(store, manifest, [docs[0], changed, docs[2], docs[2]])  # 'd' deleted, 'c' given twice
+    assert stats.model_dump() == {"total": 4, "skipped": 3, "added": 1, "failed": 0, "deleted": 2}
+    assert store.embedded == 5
+    assert sorted(store.docs) == sorted(doc_key(d) for d in [docs[0], changed, docs[2]])
+    assert store.docs[doc_key(changed)].page_content == changed.page_content
+    assert EmbeddingsManifest(manifest).keys == set(store.docs)
+    assert len(manifest.read_text().splitlines()) == 3  # compacted
+
+
+class FailingStore(DictStore):
+    """Store failing to add the documents of some sources."""
+
+    def __init__(self, failing: set[str]) -> None:
+        super().__init__()
+        self.failing = failing
+
+    def add_documents(self, docs: list[Document]) -> None:
+        if any(doc.metadata["source"] in self.failing for doc in docs):
+            raise RuntimeError("embeddings API unavailable")
+        super().add_documents(docs)
+
+
+def test_failed_batches_are_retried_and_nothing_is_deleted(tmp_path: Path) -> None:
+    docs = [_doc(source) for source in "abcd"]
+    store, manifest = FailingStore({"c"}), tmp_path / "manifest.txt"
+    _ingest(store, manifest, docs)
+    stats = _ingest(store, manifest, docs[:1] + docs[2:])  # 'b' deleted while 'c' and 'd' fail
+    assert (stats.failed, stats.deleted) == (2, 0)
+    assert sorted(d.metadata["source"] for d in store.docs.values()) == ["a", "b"]
+
+    store.failing.clear()
+    store.embedded = 0
+    stats = _ingest(store, manifest, docs[:1] + docs[2:])
+    assert (stats.skipped, stats.added, stats.deleted) == (1, 2, 1)
+    assert store.embedded == 2
+    assert sorted(d.metadata["source"] for d in store.docs.values()) == ["a", "c", "d"]
+
+
+def test_interrupted_run_resumes(tmp_path: Path) -> None:
+    docs = [_doc(str(i)) for i in range(9)]
+
+    def interrupted() -> Iterator[Document]:
+        yield from docs
+        raise KeyboardInterrupt
+
+    store, manifest = DictStore(), tmp_path / "manifest.txt"
+    with pytest.raises(KeyboardInterrupt):
+        _ingest(store, manifest, interrupted())  # type: ignore
+    recorded = EmbeddingsManifest(manifest).keys
+    assert recorded and recorded <= set(store.docs)
+
+    store.embedded = 0
+    stats = _ingest(store, manifest, docs)
+    assert (stats.skipped, stats.added) == (len(recorded), 9 - len(recorded))
+    assert store.embedded == 9 - len(recorded)
+    assert len(store.docs) == 9
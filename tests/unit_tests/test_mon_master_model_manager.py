@@ -0,0 +1,140 @@
+"""Tests of the embeddings model manager of mon_master search."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from genai_blueprint.demos.mon_master_search.model_manager import ModelManager
+
+MB = 2**20
+
+
+class Tensor:
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+    def numel(self) -> int:
+        return self.size
+
+    def element_size(self) -> int:
+        return 1
+
+
+class Model:
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+    def parameters(self) -> list[Tensor]:
+        return [Tensor(self.size // 2), Tensor(self.size - self.size // 2)]
+
+
+class Embeddings:
+    def __init__(self, size: int) -> None:
+        self.client = Model(size)
+
+    def embed_query(self, text: str) -> list[float]:
+        return [0.0]
+
+
+class Store:
+    def __init__(self, size: int) -> None:
+        self.embeddings = Embeddings(size)
+
+
+class Loader:
+    """Load stores of given sizes (in MB), and record the loads."""
+
+    def __init__(self, sizes_mb: dict[str, float]) -> None:
+        self.sizes_mb = sizes_mb
+        self.loads: list[str] = []
+
+    def __call__(self, embeddings_id: str) -> Store:
+        self.loads.append(embeddings_id)
+        return Store(int(self.sizes_mb[embeddings_id] * MB))
+
+
+def test_load_then_hits() -> None:
+    loader = Loader({"a": 100})
+    manager = ModelManager(budget_mb=500, loader=loader)  # type: ignore
+    store = manager.get("a")
+    assert manager.get("a") is store
+    assert loader.loads == ["a"]
+    metrics = manager.metrics["a"]
+    assert (metrics.loads, metrics.hits, metrics.size_mb, metrics.loaded) == (1, 1, 100, True)
+    assert manager.loaded_bytes == 100 * MB
+
+
+def test_least_recently_used_is_evicted() -> None:
+    loader = Loader({"a": 100, "b": 100, "c": 100})
+    manager = ModelManager(budget_mb=250, loader=loader)  # type: ignore
+    manager.get("a")
+    manager.get("b")
+    manager.get("a")  # 'b' is now the least recently used
+    manager.get("c")
+    assert [manager.is_loaded(m) for m in "abc"] == [True, False, True]
+    assert manager.loaded_bytes == 200 * MB
+    assert (manager.metrics["b"].unloads, manager.metrics["b"].loaded) == (1, False)
+
+    manager.get("b")  # its size is known: room is made before loading it
+    assert [manager.is_loaded(m) for m in "abc"] == [False, True, True]
+    assert loader.loads == ["a", "b", "c", "b"]
+    assert manager.metrics["b"].loads == 2
+
+
+def test_model_larger_than_budget_stays_loaded_alone() -> None:
+    manager = ModelManager(budget_mb=150, loader=Loader({"small": 100, "large": 200}))  # type: ignore
+    manager.get("small")
+    manager.get("large")
+    assert not manager.is_loaded("small") and manager.is_loaded("large")
+    manager.unload_all()
+    assert manager.loaded_bytes == 0
+    assert manager.metrics["large"].unloads == 1
+
+
+def test_remote_models_take_no_budget() -> None:
+    class RemoteLoader(Loader):
+        def __call__(self, embeddings_id: str) -> Store:
+            store = super().__call__(embeddings_id)
+            del store.embeddings.client
+            return store
+
+    manager = ModelManager(budget_mb=1, loader=RemoteLoader({"a": 100, "b": 100}))  # type: ignore
+    manager.get("a")
+    manager.get("b")
+    assert manager.is_loaded("a") and manager.is_loaded("b")
+    assert manager.metrics["a"].size_mb == 0
+
+
+def test_hits_are_served_while_a_model_loads() -> None:
+    started, release = threading.Event(), threading.Event()
+
+    class SlowLoader(Loader):
+        def __call__(self, embeddings_id: str) -> Store:
+            if embeddings_id == "slow":
+                started.set()
+                assert release.wait(10)
+            return super().__call__(embeddings_id)
+
+    loader = SlowLoader({"fast": 10, "slow": 10})
+    manager = ModelManager(budget_mb=100, loader=loader)  # type: ignore
+    fast = manager.get("fast")
+    with ThreadPoolExecutor(2) as pool:
+        slow_loads = [pool.submit(manager.get, "slow") for _ in range(2)]
+        assert started.wait(10)
+        with ThreadPoolExecutor(1) as other:
+            assert other.submit(manager.get, "fast").result(timeout=2) is fast  # not blocked by the load
+        release.set()
+        assert slow_loads[0].result(timeout=10) is slow_loads[1].result(timeout=10)
+    assert loader.loads == ["fast", "slow"]  # loaded once
+    assert manager.metrics["slow"].hits == 1
+
+
+@pytest.mark.parametrize("budget_mb", [0, 50])
+def test_all_loads_are_counted(budget_mb: float) -> None:
+    manager = ModelManager(budget_mb=budget_mb, loader=Loader({"a": 100, "b": 100}))  # type: ignore
+    for embeddings_id in "abab":
+        manager.get(embeddings_id)
+    assert (manager.metrics["a"].loads, manager.metrics["a"].unloads) == (2, 2)
+    assert (manager.metrics["b"].loads, manager.metrics["b"].unloads) == (2, 1)
+    assert manager.loaded_bytes == 100 * MB
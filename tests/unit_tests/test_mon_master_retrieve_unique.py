@@ -0,0 +1,57 @@
+"""Tests of the dedup-aware retrieval of mon_master search."""
+
+import pytest
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+try:
+    from genai_blueprint.demos.mon_master_search.search import retrieve_unique, unique_docs
+except AssertionError:  # the corpus (external data) is not available
+    pytest.skip("mon_master corpus not found", allow_module_level=True)
+
+
+class ListRetriever(BaseRetriever):
+    """Return the first 'k' documents of a list, and record the requested 'k'."""
+
+    docs: list[Document]
+    k: int = 4
+    calls: list[int] = []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        self.calls.append(self.k)
+        return self.docs[: self.k]
+
+
+def _doc(formation: int, eta: int, parcours: int = 0) -> Document:
+    return Document(
+        page_content=f"formation {formation} parcours {parcours}",
+        metadata={"for_intitule": f"F{formation}", "eta_uai": f"E{eta}"},
+    )
+
+
+def _formations(docs: list[Document]) -> list[str]:
+    return [doc.metadata["for_intitule"] for doc in docs]
+
+
+def test_unique_docs_keeps_first_of_each_formation() -> None:
+    docs = [_doc(1, 1, 1), _doc(1, 1, 2), _doc(2, 1), _doc(1, 2)]
+    assert unique_docs(docs) == [docs[0], docs[2], docs[3]]
+
+
+def test_retrieve_unique_pages() -> None:
+    retriever = ListRetriever(docs=[_doc(i, 0, p) for i in range(10) for p in range(2)])
+    found = _formations(retrieve_unique(retriever, "q", limit=3, offset=2))
+    assert found == ["F2", "F3", "F4"]
+
+
+def test_retrieve_unique_fetches_more_when_duplicated() -> None:
+    retriever = ListRetriever(docs=[_doc(i, 0, p) for i in range(6) for p in range(5)])
+    docs = retrieve_unique(retriever, "q", limit=3)
+    assert _formations(docs) == ["F0", "F1", "F2"]
+    assert retriever.calls[0] == 6 and len(retriever.calls) > 1
+
+
+def test_retrieve_unique_stops_when_exhausted() -> None:
+    retriever = ListRetriever(docs=[_doc(i, 0, p) for i in range(4) for p in range(3)])
+    assert len(retrieve_unique(retriever, "q", limit=10)) == 4
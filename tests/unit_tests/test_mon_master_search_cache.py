@@ -0,0 +1,98 @@
+"""Tests of the search cache of mon_master search."""
+
+from pathlib import Path
+
+from genai_blueprint.demos.mon_master_search.search_cache import LruCache, SearchCache, _DiskTier, normalize_query
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  master   MIAGE\t\nLyon ") == "master MIAGE Lyon"
+    assert normalize_query("économie") == normalize_query("économie")  # NFC
+    assert normalize_query("MIAGE") != normalize_query("miage")  # case matters for cased embeddings models
+
+
+def test_lru_eviction_and_stats() -> None:
+    cache = LruCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # 'b' is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_get_or_compute_computes_once() -> None:
+    cache = LruCache(max_size=4)
+    calls = []
+
+    def compute() -> list[int]:
+        calls.append(1)
+        return [1, 2]
+
+    assert cache.get_or_compute(("k", 1), compute) == [1, 2]
+    assert cache.get_or_compute(("k", 1), compute) == [1, 2]
+    assert len(calls) == 1
+
+
+def test_disk_tier_survives_restarts(tmp_path: Path) -> None:
+    file = tmp_path / "cache.db"
+    LruCache(2, _DiskTier(file, "entries", max_entries=10)).put(("mode", "query"), [0.1, 0.2])
+
+    cache = LruCache(2, _DiskTier(file, "entries", max_entries=10))
+    assert cache.get(("mode", "query")) == [0.1, 0.2]
+    assert cache.hits == 1
+    assert cache.get(("mode", "other")) is None
+    assert LruCache(2, _DiskTier(file, "other_table", max_entries=10)).get(("mode", "query")) is None
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path: Path) -> None:
+    disk = _DiskTier(tmp_path / "cache.db", "entries", max_entries=2)
+    disk.put("a", 1)
+    disk.put("b", 2)
+    assert disk.get("a") == 1
+    disk.put("c", 3)
+    assert (disk.get("a"), disk.get("b"), disk.get("c")) == (1, None, 3)
+
+
+def test_memory_tier_is_filled_from_disk(tmp_path: Path) -> None:
+    disk = _DiskTier(tmp_path / "cache.db", "entries", max_entries=10)
+    disk.put("a", 1)
+    cache = LruCache(2, disk)
+    assert cache.get("a") == 1
+    disk.put("a", 2)
+    assert cache.get("a") == 1  # served from memory
+
+
+def test_query_embeddings_are_cached_per_model_and_normalized_query(tmp_path: Path) -> None:
+    cache = SearchCache(disk_file=tmp_path / "cache.db")
+    embedded: list[str] = []
+
+    def embed(text: str) -> list[float]:
+        embedded.append(text)
+        return [float(len(text))]
+
+    assert cache.query_embedding("m1", "  master  MIAGE ", embed) == [12.0]
+    assert cache.query_embedding("m1", "master MIAGE", embed) == [12.0]
+    cache.query_embedding("m1", "master miage", embed)
+    cache.query_embedding("m2", "master MIAGE", embed)
+    assert embedded == ["master MIAGE", "master miage", "master MIAGE"]
+
+
+def test_ranked_results_are_keyed_on_index_version_and_params(tmp_path: Path) -> None:
+    cache = SearchCache(disk_file=tmp_path / "cache.db")
+    computed: list[str] = []
+
+    def ranked(version: str, depth: int = 100) -> list[str]:
+        return cache.ranked(
+            "Vector", "m1", "data  science", version, lambda: computed.append(version) or [version], depth=depth
+        )
+
+    assert ranked("v1") == ["v1"]
+    assert ranked("v1") == ["v1"]
+    assert ranked("v2") == ["v2"]
+    assert ranked("v1", depth=200) == ["v1"]
+    assert computed == ["v1", "v2", "v1"]
+
+    restarted = SearchCache(disk_file=tmp_path / "cache.db")
+    assert restarted.ranked("Vector", "m1", "data science", "v2", lambda: ["recomputed"], depth=100) == ["v2"]
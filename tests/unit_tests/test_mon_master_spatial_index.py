@@ -0,0 +1,81 @@
+"""Tests of the spatial index of mon_master search."""
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search.spatial_index import GeoFilter, SpatialIndex, haversine_km, parse_geo
+
+LYON = (45.7578, 4.8320)
+VILLEURBANNE = (45.7719, 4.8902)
+PARIS = (48.8566, 2.3522)
+NOUMEA = (-22.2758, 166.4580)
+
+
+def _doc(sites: list[tuple[float, float]], villes: list[str]) -> Document:
+    geo = ";".join(f"{lat},{lon}" for lat, lon in sites)
+    return Document(page_content="", metadata={"geo": geo, "villes": ";".join(villes)})
+
+
+@pytest.fixture
+def index() -> SpatialIndex:
+    docs = [
+        _doc([LYON], ["Lyon"]),
+        _doc([PARIS, VILLEURBANNE], ["Paris", "Villeurbanne"]),
+        _doc([PARIS], ["Paris"]),
+        _doc([NOUMEA], ["Nouméa"]),
+        _doc([], []),
+    ]
+    return SpatialIndex.from_documents(docs)
+
+
+def test_parse_geo() -> None:
+    assert parse_geo("45.75, 4.83") == (45.75, 4.83)
+    assert parse_geo("-22.27,166.45") == (-22.27, 166.45)
+    assert parse_geo("") is None
+    assert parse_geo("95.0,4.8") is None
+
+
+def test_within_radius(index: SpatialIndex) -> None:
+    assert index.within(*LYON, radius_km=1).tolist() == [0]
+    assert index.within(*LYON, radius_km=10).tolist() == [0, 1]  # a site of document 1 is in Villeurbanne
+    assert index.within(*PARIS, radius_km=10).tolist() == [1, 2]
+    assert index.within(0.0, 0.0, radius_km=100).tolist() == []
+
+
+def test_nearest_first(index: SpatialIndex) -> None:
+    assert index.nearest(*VILLEURBANNE, k=2).tolist() == [1, 0]
+    assert index.nearest(*PARIS, k=3).tolist() == [1, 2, 0]
+    assert index.nearest(*LYON, k=10).tolist() == [0, 1, 2, 3]  # all documents having a site
+
+
+def test_match_combines_radius_and_k(index: SpatialIndex) -> None:
+    assert index.match(GeoFilter(lat=PARIS[0], lon=PARIS[1], radius_km=500)).tolist() == [0, 1, 2]
+    assert index.match(GeoFilter(lat=PARIS[0], lon=PARIS[1], radius_km=500, k=2)).tolist() == [1, 2]
+    with pytest.raises(ValueError):
+        GeoFilter(lat=0, lon=0)
+
+
+def test_locate_city(index: SpatialIndex) -> None:
+    assert index.locate("PARIS") == pytest.approx(PARIS)
+    assert index.locate("Noumea") == pytest.approx(NOUMEA)
+    assert index.locate("Marseille") is None
+
+
+def test_candidates_across_the_antimeridian() -> None:
+    lats = np.array([10.0, 10.0, 10.0])
+    lons = np.array([179.9, -179.9, 0.0])
+    index = SpatialIndex(lats, lons, np.array([0, 1, 2], dtype=np.int32), np.array(["", "", ""]))
+    for lon in (180.0, -180.0, 179.95, -179.95):
+        assert set(index.rows[index._candidates(10.0, lon, radius_km=50)].tolist()) == {0, 1}
+        assert index.within(10.0, lon, radius_km=50).tolist() == [0, 1]
+    assert index.nearest(10.0, 179.8, k=2).tolist() == [0, 1]
+
+
+def test_within_agrees_with_brute_force() -> None:
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(-89, 89, 2000), rng.uniform(-180, 180, 2000)
+    index = SpatialIndex(lats, lons, np.arange(2000, dtype=np.int32), np.full(2000, ""))
+    for lat, lon, radius in [(0, 179.5, 800), (45, -179.8, 1500), (88, 10, 600), (-60, 0, 3000)]:
+        expected = np.flatnonzero(haversine_km(lat, lon, lats, lons) <= radius)
+        assert index.within(lat, lon, radius).tolist() == expected.tolist()
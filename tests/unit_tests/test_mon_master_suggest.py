@@ -0,0 +1,81 @@
+"""Tests of the typeahead suggestions of mon_master search."""
+
+import pytest
+from langchain_core.documents import Document
+
+from genai_blueprint.demos.mon_master_search import suggest
+from genai_blueprint.demos.mon_master_search.suggest import Suggestion, SuggestionIndex
+
+
+def _suggestions(*items: tuple[str, int]) -> SuggestionIndex:
+    return SuggestionIndex([Suggestion(text=text, kind="formation", count=count) for text, count in items])
+
+
+def _texts(suggestions: list[Suggestion]) -> list[str]:
+    return [s.text for s in suggestions]
+
+
+@pytest.fixture
+def index() -> SuggestionIndex:
+    return _suggestions(
+        ("Master Data Science", 5),
+        ("Science des données", 3),
+        ("Économie et Science politique", 40),
+        ("Data Management", 10),
+        ("Chimie", 100),
+    )
+
+
+def test_prefix_of_any_word(index: SuggestionIndex) -> None:
+    assert _texts(index.suggest("data sc")) == ["Master Data Science"]
+    assert _texts(index.suggest("chim")) == ["Chimie"]
+    assert index.suggest("physique") == []
+    assert index.suggest("  ") == []
+
+
+def test_query_is_normalized(index: SuggestionIndex) -> None:
+    assert _texts(index.suggest("ECONOMIE")) == ["Économie et Science politique"]
+    assert _texts(index.suggest("donnees")) == ["Science des données"]
+
+
+def test_suggestions_starting_with_the_query_come_first(index: SuggestionIndex) -> None:
+    expected = ["Science des données", "Économie et Science politique", "Master Data Science"]
+    assert _texts(index.suggest("scien")) == expected
+    assert _texts(index.suggest("data")) == ["Data Management", "Master Data Science"]
+    assert _texts(index.suggest("scien", k=1)) == ["Science des données"]
+
+
+def test_words_in_another_order(index: SuggestionIndex) -> None:
+    assert _texts(index.suggest("science data")) == ["Master Data Science"]
+    assert _texts(index.suggest("politique eco")) == ["Économie et Science politique"]
+    assert index.suggest("data chimie") == []
+
+
+def test_long_queries(index: SuggestionIndex) -> None:
+    long_text = "Sciences et techniques des activités physiques et sportives : entraînement"
+    long_index = _suggestions((long_text, 1), ("Sciences et techniques des activités physiques et sportives", 2))
+    assert _texts(long_index.suggest(long_text)) == [long_text]
+
+
+def test_large_ranges_give_the_same_suggestions(index: SuggestionIndex, monkeypatch: pytest.MonkeyPatch) -> None:
+    expected = [index.suggest(query, k=3) for query in ("s", "d", "e")]
+    monkeypatch.setattr(suggest, "LARGE_RANGE", 2)
+    assert [index.suggest(query, k=3) for query in ("s", "d", "e")] == expected
+
+
+def test_from_documents() -> None:
+    docs = [
+        Document(
+            page_content="parcours: Big Data; IA\ndisciplines: Informatique; Gestion\nMIAGE",
+            metadata={"for_intitule": "Master MIAGE"},
+        ),
+        Document(
+            page_content="parcours: Big Data\ndisciplines: Informatique",
+            metadata={"for_intitule": "Informatique"},
+        ),
+    ]
+    counts = {(s.kind, s.text): s.count for s in SuggestionIndex.from_documents(docs).suggestions}
+    assert counts[("formation", "Master MIAGE")] == 1
+    assert counts[("parcours", "Big Data")] == 2
+    assert counts[("discipline", "Informatique")] == 2
+    assert counts[("acronyme", "MIAGE (Méthodes Informatiques Appliquées à la Gestion des Entreprises)")] == 1
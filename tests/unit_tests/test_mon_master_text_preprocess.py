@@ -0,0 +1,104 @@
+"""Tests of the spaCy preprocessing of the BM25 index, and of its token cache."""
+
+import re
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from genai_blueprint.demos.mon_master_search.text_preprocess import SpacyPreprocessor, TokenCache, text_hash
+
+TEXTS = [
+    "Le master Informatique forme des ingénieurs en génie logiciel.",
+    "Les étudiants du parcours Data Science apprennent l'apprentissage automatique !",
+    "Master Droit des affaires : contrats, fiscalité et droit des sociétés.",
+]
+
+
+class Token:
+    def __init__(self, text: str) -> None:
+        self.lemma_ = text.removesuffix("s")
+        self.is_stop = text.lower() in {"le", "les", "des", "du", "en", "et"}
+        self.is_punct = not text.isalnum()
+        self.is_space = False
+
+
+class Nlp:
+    """Pipeline splitting words and punctuation, with singulars as lemmas, and counting the processed texts."""
+
+    meta = {"version": "1.0"}
+
+    def __init__(self) -> None:
+        self.processed: list[str] = []
+
+    def __call__(self, text: str) -> list[Token]:
+        self.processed.append(text)
+        return [Token(word) for word in re.findall(r"\w+|[^\w\s]", text)]
+
+    def pipe(self, texts: Any, n_process: int = 1, batch_size: int = 256) -> Any:
+        return (self(text) for text in texts)
+
+
+def _preprocessor(cache_file: Path, stop_words: tuple[str, ...] = ()) -> SpacyPreprocessor:
+    preprocessor = SpacyPreprocessor("fake", stop_words, cache_file=cache_file)
+    preprocessor._nlp = Nlp()
+    return preprocessor
+
+
+def test_token_cache_is_keyed_by_version(tmp_path: Path) -> None:
+    file = tmp_path / "cache" / "tokens.db"
+    cache = TokenCache(file, "v1")
+    cache.put_many({"h1": ["master", "économie"], "h2": []})
+    cache.close()
+
+    assert TokenCache(file, "v1").get_many(["h1", "h2", "h3"]) == {"h1": ["master", "économie"], "h2": []}
+    assert TokenCache(file, "v2").get_many(["h1"]) == {}
+    tokens = {f"h{i}": [str(i)] for i in range(1200)}  # more than the SQLite parameters in a query
+    TokenCache(file, "v3").put_many(tokens)
+    assert TokenCache(file, "v3").get_many(tokens) == tokens
+
+
+def test_batch_and_single_processing_agree(tmp_path: Path) -> None:
+    batch = _preprocessor(tmp_path / "tokens.db", stop_words=("Master",))
+    single = _preprocessor(tmp_path / "other.db", stop_words=("Master",))
+    assert batch.preprocess_many(TEXTS) == [single(text) for text in TEXTS]
+    assert batch(TEXTS[0]) == ["informatique", "forme", "ingénieur", "génie", "logiciel"]
+    assert batch._nlp.processed == TEXTS  # calls on preprocessed texts are lookups
+
+
+def test_cached_texts_are_not_processed_again(tmp_path: Path) -> None:
+    file = tmp_path / "tokens.db"
+    first = _preprocessor(file)
+    expected = first.preprocess_many(TEXTS[:2])
+
+    second = _preprocessor(file)
+    assert second.preprocess_many(TEXTS) == expected + [first(TEXTS[2])]
+    assert second._nlp.processed == TEXTS[2:]
+
+    second.clear_memo()
+    second(TEXTS[0])
+    assert second._nlp.processed == TEXTS[2:] + TEXTS[:1]  # the memo is cleared, not the cache
+    hashes = {text_hash(t) for t in TEXTS}
+    assert TokenCache(file, second.version).get_many(hashes).keys() == hashes
+
+
+def test_stop_words_change_invalidates_the_cache(tmp_path: Path) -> None:
+    file = tmp_path / "tokens.db"
+    _preprocessor(file).preprocess_many(TEXTS)
+    other = _preprocessor(file, stop_words=("master",))
+    tokens = other.preprocess_many(TEXTS)
+    assert other._nlp.processed == TEXTS
+    assert "master" not in tokens[2]
+
+
+def test_parity_with_the_genai_tk_preprocessing(tmp_path: Path) -> None:
+    spacy = pytest.importorskip("spacy")
+    if not spacy.util.is_package("fr_core_news_sm"):
+        pytest.skip("spaCy model fr_core_news_sm is not installed")
+    bm25s_retriever = pytest.importorskip("genai_tk.extra.retrievers.bm25s_retriever")
+
+    stop_words = ["master", "parcours"]
+    old = bm25s_retriever.get_spacy_preprocess_fn(model="fr_core_news_sm", more_stop_words=stop_words)
+    new = SpacyPreprocessor("fr_core_news_sm", stop_words, cache_file=tmp_path / "tokens.db")
+    assert new.preprocess_many(TEXTS) == [old(text) for text in TEXTS]
+    assert [new(text) for text in TEXTS] == [old(text) for text in TEXTS]